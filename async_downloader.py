@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+非同步照片下載引擎
+
+整個執行期間只使用一個在背景執行緒中持續運作的 asyncio 事件迴圈與一個 aiohttp
+連線池，各相簿的下載都交給同一個事件迴圈處理，連線可以跨相簿重用。
+只有寫入硬碟（超過記憶體上限的大檔案、保留未完成的下載）與驗證照片的步驟交給
+執行緒處理，其餘暫存區操作直接在事件迴圈中執行。
+重試、驗證與下載歷史的處理方式與 PhotoDownloader._download_photo 相同。
+
+需要安裝 aiohttp；未安裝時 PhotoDownloader 會改用多執行緒引擎。
+"""
+
+import os
+import time
+import queue
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+from config import Config
+from utils import log_message
+from download_stage import StagedDownload, IncompleteDownloadError, partial_path
+from rate_limiter import AdaptiveRateLimiter, get_rate_limiter
+
+try:
+    import aiohttp
+    ASYNC_ENGINE_AVAILABLE = True
+except ImportError:
+    aiohttp = None
+    ASYNC_ENGINE_AVAILABLE = False
+
+class AsyncDownloadEngine:
+    """asyncio 下載引擎，與 PhotoDownloader 共用驗證與歷史記錄邏輯
+    
+    事件迴圈與連線池在第一次下載時建立，直到 close() 才關閉。
+    """
+    
+    # 寫入暫存檔時累積到此大小才交給執行緒，減少執行緒切換次數
+    WRITE_BUFFER_SIZE = 256 * 1024
+    
+    def __init__(self, downloader):
+        self.downloader = downloader
+        self.concurrency = downloader.max_workers
+        self.max_per_host = downloader.max_per_host
+        self._loop = None
+        self._thread = None
+        self._session = None
+        self._semaphore = None
+    
+    def _ensure_loop(self):
+        """啟動背景事件迴圈執行緒"""
+        if self._loop is not None:
+            return
+        self._loop = asyncio.new_event_loop()
+        # 寫入硬碟與驗證照片的執行緒數與同時下載數相同，完成的照片不需排隊等待驗證
+        self._loop.set_default_executor(
+            ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="async-download-io")
+        )
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="async-download", daemon=True
+        )
+        self._thread.start()
+    
+    def _get_session(self):
+        """取得共用的 aiohttp 會話（只在事件迴圈中呼叫）"""
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.max_per_host)
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=30)
+            headers = dict(self.downloader.session.headers) if self.downloader.session else {}
+            # aiohttp 會自行處理連線與壓縮標頭
+            for header in ('Connection', 'Accept-Encoding'):
+                headers.pop(header, None)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers)
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._session
+    
+    def download(self, tasks: List[Tuple[str, str, str]], pbar) -> int:
+        """下載所有照片，回傳成功張數
+        
+        下載在背景事件迴圈中進行，完成的結果依序送回呼叫端執行緒更新進度與統計。
+        """
+        if not ASYNC_ENGINE_AVAILABLE:
+            raise RuntimeError("非同步下載引擎需要安裝 aiohttp")
+        self._ensure_loop()
+        
+        results = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(self._download_all(tasks, results), self._loop)
+        success_count = 0
+        received = 0
+        try:
+            while received < len(tasks):
+                try:
+                    filename, success = results.get(timeout=0.5)
+                except queue.Empty:
+                    if future.done() and results.empty():
+                        # 事件迴圈中的工作意外結束，取出其例外
+                        future.result()
+                        break
+                    continue
+                
+                received += 1
+                if success:
+                    success_count += 1
+                self.downloader._record_photo_result(success, filename, pbar)
+        except BaseException:
+            # 呼叫端中斷（例如 Ctrl+C）時取消這個相簿仍在進行的下載
+            future.cancel()
+            raise
+        
+        return success_count
+    
+    async def _download_all(self, tasks: List[Tuple[str, str, str]], results: queue.Queue):
+        """在共用的事件迴圈中並行下載，每張照片完成時把結果放入 results"""
+        session = self._get_session()
+        
+        async def run_task(url: str, filepath: str, filename: str):
+            success = False
+            try:
+                async with self._semaphore:
+                    success = await self._download_photo(session, url, filepath, filename)
+            except Exception as e:
+                log_message(f"非同步下載發生錯誤 {filename}: {e}", "ERROR")
+            finally:
+                results.put((filename, success))
+        
+        await asyncio.gather(*(run_task(url, filepath, filename) for url, filepath, filename in tasks))
+    
+    def close(self):
+        """關閉連線池並停止事件迴圈；進行中的下載會被取消並保留暫存檔"""
+        if self._loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(timeout=30)
+        except Exception as e:
+            log_message(f"關閉非同步下載引擎時發生錯誤: {e}", "WARNING")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.run_until_complete(self._loop.shutdown_default_executor())
+        self._loop.close()
+        self._loop = None
+        self._thread = None
+    
+    async def _shutdown(self):
+        """取消仍在進行的下載並關閉會話"""
+        current = asyncio.current_task()
+        pending = [task for task in asyncio.all_tasks() if task is not current]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+    
+    @staticmethod
+    def _fits_in_memory(stage: StagedDownload, size: int) -> bool:
+        """資料寫入後仍在記憶體緩衝區中，不需要寫入硬碟"""
+        return not stage.part_file and stage.buffer.tell() + size <= stage.max_memory
+    
+    async def _close_stage(self, stage: StagedDownload):
+        """釋放暫存區；還有未完成的內容時需要寫入暫存檔，交給執行緒處理"""
+        if stage.part_file or stage.buffer.getbuffer().nbytes:
+            await asyncio.get_running_loop().run_in_executor(None, stage.close)
+        else:
+            stage.close()
+    
+    async def _download_photo(self, session, url: str, filepath: str, filename: str) -> bool:
+        """下載單張照片（非同步版本的 PhotoDownloader._download_photo）"""
+        loop = asyncio.get_running_loop()
+        retries = 0
+        limiter = get_rate_limiter(url)
+        
+        if os.path.exists(partial_path(filepath, url)):
+            # 續傳前需要讀取暫存檔計算雜湊值
+            stage = await loop.run_in_executor(None, StagedDownload, filepath, url)
+        else:
+            stage = StagedDownload(filepath, url)
+        try:
+            while retries < Config.MAX_RETRIES:
+                try:
+                    # 上次執行已完整下載但尚未移到最終路徑
+                    if stage.is_complete:
+                        return await loop.run_in_executor(
+                            None, self.downloader._finalize_download, url, stage, filename
+                        )
+                    
+                    await limiter.acquire_async()
+                    request_start = time.monotonic()
+                    async with session.get(url, headers=stage.range_headers()) as response:
+                        if AdaptiveRateLimiter.is_throttle_status(response.status):
+                            limiter.record_failure(
+                                AdaptiveRateLimiter.parse_retry_after(response.headers.get('retry-after'))
+                            )
+                        else:
+                            limiter.record_success(time.monotonic() - request_start)
+                        
+                        if response.status == 416 and stage.size:
+                            # 續傳範圍無效，重新下載完整檔案
+                            stage.reset()
+                            continue
+                        response.raise_for_status()
+                        
+                        if not stage.begin_response(response.status, response.headers):
+                            continue
+                        
+                        if self.downloader._check_response_headers(
+                            url, filename,
+                            response.headers.get('content-type', ''),
+                            response.headers.get('content-length') if response.status == 200 else None
+                        ) is None:
+                            stage.discard()
+                            return False
+                        
+                        # 下載到暫存區；記憶體緩衝區直接寫入，寫入暫存檔時才累積後交給執行緒
+                        buffer = bytearray()
+                        try:
+                            async for chunk in response.content.iter_any():
+                                if not buffer and self._fits_in_memory(stage, len(chunk)):
+                                    stage.write(chunk)
+                                    continue
+                                buffer.extend(chunk)
+                                if len(buffer) >= self.WRITE_BUFFER_SIZE:
+                                    await loop.run_in_executor(None, stage.write, bytes(buffer))
+                                    buffer.clear()
+                        finally:
+                            # 連線中斷時也保留已收到的資料，供續傳使用
+                            if buffer:
+                                await loop.run_in_executor(None, stage.write, bytes(buffer))
+                        stage.ensure_complete()
+                    
+                    return await loop.run_in_executor(
+                        None, self.downloader._finalize_download, url, stage, filename
+                    )
+                
+                except (aiohttp.ClientError, asyncio.TimeoutError, IncompleteDownloadError) as e:
+                    retries += 1
+                    status_code = None
+                    if isinstance(e, aiohttp.ClientResponseError):
+                        status_code = e.status
+                    else:
+                        # 連線中斷或逾時也視為伺服器壓力訊號
+                        limiter.record_failure()
+                    if status_code is not None and not AdaptiveRateLimiter.is_retryable_status(status_code):
+                        log_message(f"下載失敗（HTTP {status_code}），不再重試: {filename}", "ERROR")
+                        return False
+                    if retries < Config.MAX_RETRIES:
+                        log_message(f"下載失敗，重試 {retries}/{Config.MAX_RETRIES}: {e}", "WARNING")
+                        # 429 的等待時間由限速器（Retry-After 與降速）決定，其他錯誤以指數退避
+                        if status_code != 429:
+                            await asyncio.sleep(AdaptiveRateLimiter.retry_delay(retries))
+                    else:
+                        log_message(f"下載失敗，已達最大重試次數: {filename}", "ERROR")
+                        return False
+                
+                except Exception as e:
+                    log_message(f"下載過程發生未預期錯誤: {e}", "ERROR")
+                    return False
+            
+            return False
+        
+        finally:
+            await self._close_stage(stage)
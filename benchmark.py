@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+效能測試工具
+
+在本機模擬環境中量測各項下載與處理流程的效能，方便依部署環境選擇設定。
+
+使用方法:
+    python benchmark.py engines                         # 比較多執行緒與非同步下載引擎
+    python benchmark.py engines --photos 500 --workers 64 --latency 50
+    python benchmark.py roundtrips                      # 比較擷取頁面資料所需的 WebDriver 往返次數
+    python benchmark.py history --records 100000 1000000  # 比較下載前過濾已下載 URL 的查詢方式
+    python benchmark.py startup --records 100000          # 量測下載歷史的載入時間
+    python benchmark.py memory --records 500000           # 比較下載歷史載入後占用的記憶體
+"""
+
+import os
+import io
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from PIL import Image
+from tqdm import tqdm
+from config import Config
+from utils import calculate_download_speed
+from rate_limiter import reset_rate_limiters
+from page_parser import extract_album_bricks, extract_photo_links
+
+class MockS3Handler(BaseHTTPRequestHandler):
+    """模擬 S3 照片伺服器，依檔名產生固定內容的 JPEG"""
+    
+    protocol_version = "HTTP/1.1"
+    
+    def do_GET(self):
+        data = self.server.get_image(self.path)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def log_message(self, format, *args):
+        pass
+
+class MockS3Server(ThreadingHTTPServer):
+    """在背景執行緒運行的模擬 S3 伺服器"""
+    
+    daemon_threads = True
+    
+    def __init__(self, image_size: int, latency: float):
+        super().__init__(("127.0.0.1", 0), MockS3Handler)
+        self.image_size = image_size
+        self.latency = latency
+        self._images = {}
+        self._lock = threading.Lock()
+    
+    def get_image(self, path: str) -> bytes:
+        """取得（或產生）路徑對應的圖片"""
+        with self._lock:
+            if path not in self._images:
+                seed = sum(path.encode()) % 256
+                img = Image.effect_noise((self.image_size, self.image_size), 64 + seed % 64).convert("RGB")
+                buffer = io.BytesIO()
+                img.save(buffer, "JPEG", quality=90)
+                self._images[path] = buffer.getvalue()
+            return self._images[path]
+    
+    def start(self) -> str:
+        """啟動伺服器並回傳基底網址"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        host, port = self.server_address
+        return f"http://{host}:{port}"
+
+def run_engine(engine: str, base_url: str, photos: int, workers: int) -> dict:
+    """以指定引擎下載一批照片並回傳統計"""
+    from downloader import PhotoDownloader
+    
+    work_dir = tempfile.mkdtemp(prefix=f"bench_{engine}_")
+    try:
+        Config.BASE_DOWNLOAD_PATH = work_dir
+        Config.DOWNLOAD_HISTORY_FILE = os.path.join(work_dir, "download_history.json")
+        
+        reset_rate_limiters()
+        downloader = PhotoDownloader(max_workers=workers, engine=engine)
+        downloader.init_session()
+        
+        tasks = []
+        for i in range(photos):
+            url = f"{base_url}/image_as0_albumId1_{i:032x}.jpg"
+            filename = f"2025-01-01_{i + 1:03d}.jpg"
+            tasks.append((url, os.path.join(work_dir, filename), filename))
+        
+        start = time.perf_counter()
+        with tqdm(total=len(tasks), disable=True) as pbar:
+            success = downloader._download_photos_concurrently(tasks, pbar)
+        duration = time.perf_counter() - start
+        downloader.close()
+        
+        return {
+            "engine": downloader.engine,
+            "success": success,
+            "duration": duration,
+            "total_size": downloader.download_stats["total_size"],
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def benchmark_engines(args: argparse.Namespace):
+    """比較多執行緒與非同步下載引擎"""
+    # 限速器的初始與最高速率（預設幾乎不限速，只比較引擎本身）
+    Config.DOWNLOAD_RATE_INITIAL = args.max_rate
+    Config.DOWNLOAD_RATE_MAX = args.max_rate
+    server = MockS3Server(args.image_size, args.latency / 1000.0)
+    base_url = server.start()
+    
+    print("=" * 60)
+    print("下載引擎效能比較")
+    print("=" * 60)
+    print(f"照片數: {args.photos}, 同時下載數: {args.workers}, 模擬延遲: {args.latency} ms")
+    
+    # 先產生所有圖片，避免第一個引擎承擔產生成本
+    for i in range(args.photos):
+        server.get_image(f"/image_as0_albumId1_{i:032x}.jpg")
+    
+    results = []
+    for engine in ("threaded", "async"):
+        for _ in range(args.rounds):
+            results.append(run_engine(engine, base_url, args.photos, args.workers))
+    server.shutdown()
+    
+    print("-" * 60)
+    for result in results:
+        print(f"{result['engine']:>9}: {result['success']}/{args.photos} 張, "
+              f"{result['duration']:.2f} 秒, "
+              f"{args.photos / result['duration']:.1f} 張/秒, "
+              f"{calculate_download_speed(result['total_size'], result['duration'])}")
+    print("=" * 60)
+
+class CountingElement:
+    """模擬 WebElement，每次讀取屬性都算一次 WebDriver 往返"""
+    
+    def __init__(self, driver: "CountingDriver", attributes: dict):
+        self.driver = driver
+        self.attributes = attributes
+    
+    def get_attribute(self, name: str):
+        self.driver.round_trip()
+        return self.attributes.get(name)
+
+class CountingDriver:
+    """模擬 chromedriver，記錄 WebDriver 往返次數並模擬每次往返的延遲"""
+    
+    def __init__(self, html: str, call_latency: float):
+        self.html = html
+        self.call_latency = call_latency
+        self.calls = 0
+    
+    def round_trip(self):
+        self.calls += 1
+        if self.call_latency:
+            time.sleep(self.call_latency)
+    
+    def find_element(self, by, value):
+        self.round_trip()
+        return CountingElement(self, {})
+    
+    def find_elements(self, by, value):
+        self.round_trip()
+        if value == ".brick2":
+            return [CountingElement(self, {"outerHTML": html}) for html in extract_album_bricks(self.html)]
+        links = extract_photo_links(self.html)
+        if value == "a.photo-gallery.albumbgphoto":
+            return [CountingElement(self, {"href": href}) for href in links.gallery_links]
+        if value == "a.albumbgphoto":
+            return [CountingElement(self, {"href": href}) for href in links.album_links]
+        return [CountingElement(self, {"src": src, "data-src": data_src}) for src, data_src in links.images]
+    
+    def execute_script(self, script, *args):
+        from browser_handler import BrowserHandler
+        self.round_trip()
+        if script == BrowserHandler.ALBUM_BRICKS_SCRIPT:
+            return extract_album_bricks(self.html)
+        if script == BrowserHandler.PHOTO_LINKS_SCRIPT:
+            links = extract_photo_links(self.html)
+            return {"gallery": links.gallery_links, "album": links.album_links,
+                    "images": [list(image) for image in links.images]}
+        raise ValueError("未知的腳本")
+
+def legacy_albums_from_page(driver: CountingDriver) -> list:
+    """改版前的相簿擷取方式：等待容器後逐一讀取每個磚塊的 outerHTML"""
+    driver.find_element("id", "freebrick2")
+    return [element.get_attribute("outerHTML") for element in driver.find_elements("css selector", ".brick2")]
+
+def legacy_photos_from_page(driver: CountingDriver) -> list:
+    """改版前的照片擷取方式：逐一讀取每個連結的 href"""
+    return [link.get_attribute("href") for link in driver.find_elements("css selector", "a.photo-gallery.albumbgphoto")]
+
+def build_test_pages(albums: int, photos: int) -> tuple:
+    """產生模擬的相簿列表頁與相簿照片頁"""
+    bricks = "".join(
+        f'<div class="brick2"><a href="/Activity/School-Album-Detail?albumId={1600000 + i}" '
+        f'title="相簿名稱:測試相簿 {i}"><img src="/thumb{i}.jpg"></a></div>'
+        for i in range(albums)
+    )
+    album_page = f'<html><body><div id="freebrick2">{bricks}</div></body></html>'
+    anchors = "".join(
+        f'<a class="photo-gallery albumbgphoto" '
+        f'href="https://isai-prod-v2.s3.hicloud.net.tw/image_as0_albumId1_{i:032x}.jpg"></a>'
+        for i in range(photos)
+    )
+    photo_page = f"<html><body>{anchors}</body></html>"
+    return album_page, photo_page
+
+def benchmark_roundtrips(args: argparse.Namespace):
+    """比較逐一讀取元素屬性與單次 execute_script 的 WebDriver 往返次數"""
+    import utils
+    import browser_handler
+    from browser_handler import BrowserHandler
+    
+    # 只比較往返次數，關閉解析過程的日誌
+    utils.log_message = browser_handler.log_message = lambda *a, **k: None
+    album_page, photo_page = build_test_pages(args.albums, args.photos)
+    latency = args.call_latency / 1000.0
+    handler = BrowserHandler()
+    
+    cases = [
+        ("相簿列表", album_page, legacy_albums_from_page,
+         lambda: handler._get_albums_from_current_page("校園相簿")),
+        ("照片分頁", photo_page, legacy_photos_from_page,
+         lambda: handler._get_photos_from_current_page()),
+    ]
+    
+    print("=" * 60)
+    print("WebDriver 往返次數比較")
+    print("=" * 60)
+    print(f"每頁相簿數: {args.albums}, 每頁照片數: {args.photos}, 模擬每次往返延遲: {args.call_latency} ms")
+    print("-" * 60)
+    for name, html, legacy, current in cases:
+        driver = CountingDriver(html, latency)
+        start = time.perf_counter()
+        legacy_count = len(legacy(driver))
+        legacy_time = time.perf_counter() - start
+        legacy_calls = driver.calls
+        
+        handler.driver = driver = CountingDriver(html, latency)
+        start = time.perf_counter()
+        current_count = len(current())
+        current_time = time.perf_counter() - start
+        
+        print(f"{name}: 改版前 {legacy_calls} 次往返 ({legacy_time * 1000:.1f} ms, {legacy_count} 筆) -> "
+              f"目前 {driver.calls} 次往返 ({current_time * 1000:.1f} ms, {current_count} 筆)")
+    print("=" * 60)
+
+def synthetic_photo_url(i: int, signature: str = "a") -> str:
+    """產生與網站相同格式的 S3 照片網址"""
+    return (f"https://isai-prod-v2.s3.hicloud.net.tw/image_as0_sid1456_uid605772_albumId{1600000 + i // 200}_"
+            f"{i:032x}.jpg?X-Amz-Signature={signature}")
+
+def build_history_records(records: int) -> dict:
+    """產生指定筆數、格式與實際下載歷史相同的 downloads 記錄"""
+    downloads = {}
+    for i in range(records):
+        url = synthetic_photo_url(i)
+        filename = f"2025-01-01_{i % 1000:03d}.jpg"
+        downloads[f"{filename}|{url}"] = {
+            "url": url,
+            "filename": filename,
+            "filepath": f"/Volumes/T7 Shield/加米相簿/校園相簿/相簿{i // 200}/{filename}",
+            "file_size": 350000,
+            "download_time": "2025-01-01T00:00:00",
+            "file_hash": f"{i:032x}"
+        }
+    return downloads
+
+def build_download_records(records: int) -> dict:
+    """產生指定筆數的 DownloadRecord，可直接放入 DownloadHistoryManager"""
+    from utils import DownloadRecord
+    return {key: DownloadRecord.from_dict(key, record) for key, record in build_history_records(records).items()}
+
+def legacy_history_snapshot(downloads: dict) -> dict:
+    """改版前寫出的歷史檔：雜湊值索引的每個項目都複製一份 file_key、路徑、檔名與網址"""
+    hash_index = {}
+    for file_key, record in downloads.items():
+        hash_index.setdefault(record["file_hash"], []).append({
+            "file_key": file_key,
+            "filepath": record["filepath"],
+            "filename": record["filename"],
+            "url": record["url"]
+        })
+    return {"downloads": downloads, "hash_index": hash_index}
+
+def legacy_filter_known_urls(history_manager, urls: list) -> list:
+    """改版前的作法：每個 URL 逐筆掃描所有下載記錄"""
+    unknown = []
+    for url in urls:
+        with history_manager.lock:
+            if not any(record.get("url") == url for record in history_manager.history["downloads"].values()):
+                unknown.append(url)
+    return unknown
+
+def benchmark_history(args: argparse.Namespace):
+    """比較逐筆掃描與遠端物件索引在不同歷史記錄數量下的過濾時間"""
+    from utils import DownloadHistoryManager
+    
+    work_dir = tempfile.mkdtemp(prefix="bench_history_")
+    try:
+        print("=" * 60)
+        print("下載前過濾已下載 URL 的效能比較")
+        print("=" * 60)
+        print(f"每次過濾 {args.candidates} 個網址（一半已下載）")
+        print("-" * 60)
+        for records in args.records:
+            manager = DownloadHistoryManager(os.path.join(work_dir, "history.json"))
+            manager.history["downloads"] = build_download_records(records)
+            
+            start = time.perf_counter()
+            manager._build_hash_index()
+            manager._build_remote_index()
+            build_time = time.perf_counter() - start
+            
+            # 已下載的網址取自歷史記錄後段（逐筆掃描的最差情況），簽章不同以模擬每次產生的新網址
+            known = [synthetic_photo_url(records - 1 - i, "b") for i in range(args.candidates // 2)]
+            unknown = [synthetic_photo_url(records + i) for i in range(args.candidates - len(known))]
+            candidates = known + unknown
+            
+            start = time.perf_counter()
+            indexed = manager.filter_known_urls(candidates)
+            indexed_time = time.perf_counter() - start
+            
+            # 改版前以完整網址比對，簽章相同時才會命中
+            legacy_candidates = [synthetic_photo_url(records - 1 - i) for i in range(len(known))] + unknown
+            start = time.perf_counter()
+            legacy = legacy_filter_known_urls(manager, legacy_candidates)
+            legacy_time = time.perf_counter() - start
+            
+            assert len(indexed) == len(legacy) == len(unknown)
+            print(f"{records:>9,} 筆記錄: 建立索引 {build_time:.2f} 秒 | "
+                  f"逐筆掃描 {legacy_time * 1000:.1f} ms -> 索引查詢 {indexed_time * 1000:.3f} ms "
+                  f"({legacy_time / max(indexed_time, 1e-9):,.0f} 倍)")
+        print("=" * 60)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def benchmark_startup(args: argparse.Namespace):
+    """量測建構 DownloadHistoryManager 與第一次查詢（載入下載歷史）所需的時間"""
+    import json
+    from utils import DownloadHistoryManager
+    
+    work_dir = tempfile.mkdtemp(prefix="bench_startup_")
+    try:
+        history_file = os.path.join(work_dir, "history.json")
+        # 舊版寫出的快照：只有下載記錄與雜湊值索引，沒有保存遠端物件索引
+        with open(history_file, 'w', encoding='utf-8') as f:
+            json.dump(legacy_history_snapshot(build_history_records(args.records)), f, ensure_ascii=False, indent=2)
+        size_mb = os.path.getsize(history_file) / (1024 * 1024)
+        probe = [synthetic_photo_url(args.records - 1, "b")]
+        
+        def measure():
+            start = time.perf_counter()
+            manager = DownloadHistoryManager(history_file)
+            construct_time = time.perf_counter() - start
+            start = time.perf_counter()
+            manager.filter_known_urls(probe)
+            return manager, construct_time, time.perf_counter() - start
+        
+        # 第一次載入舊格式快照需要重建索引，之後寫出的快照保存了索引
+        manager, _, legacy_first = measure()
+        manager.compact()
+        _, construct_time, first_query = measure()
+        
+        print("=" * 60)
+        print(f"下載歷史載入時間（{args.records:,} 筆記錄，快照 {size_mb:.1f} MB）")
+        print("=" * 60)
+        print(f"建構 DownloadHistoryManager: {construct_time * 1000:.3f} ms（不載入）")
+        print(f"第一次查詢（舊格式快照，重建索引）: {legacy_first:.2f} 秒")
+        print(f"第一次查詢（沿用已保存的索引）: {first_query:.2f} 秒")
+        print("=" * 60)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def benchmark_memory(args: argparse.Namespace):
+    """比較改版前（dict 記錄、雜湊值索引複製欄位）與目前的記錄格式載入後占用的記憶體"""
+    import gc
+    import json
+    import tracemalloc
+    from utils import DownloadHistoryManager
+    
+    def traced(load):
+        """回傳載入結果、載入後仍占用的記憶體與載入過程的峰值（MB）"""
+        gc.collect()
+        tracemalloc.start()
+        result = load()
+        gc.collect()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return result, current / (1024 * 1024), peak / (1024 * 1024)
+    
+    work_dir = tempfile.mkdtemp(prefix="bench_memory_")
+    try:
+        history_file = os.path.join(work_dir, "history.json")
+        with open(history_file, 'w', encoding='utf-8') as f:
+            json.dump(legacy_history_snapshot(build_history_records(args.records)), f, ensure_ascii=False)
+        
+        def load_legacy():
+            """改版前的載入方式：json.load 後記錄與雜湊值索引都是 dict"""
+            with open(history_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        
+        legacy, legacy_current, legacy_peak = traced(load_legacy)
+        del legacy
+        
+        # 以目前的格式寫出快照（含索引）後重新載入
+        DownloadHistoryManager(history_file).compact()
+        
+        def load_current():
+            """目前的載入方式：記錄為 DownloadRecord，索引引用記錄"""
+            manager = DownloadHistoryManager(history_file)
+            manager.history
+            return manager
+        
+        manager, current, peak = traced(load_current)
+        del manager
+        
+        print("=" * 60)
+        print(f"下載歷史記憶體占用（{args.records:,} 筆記錄）")
+        print("=" * 60)
+        print(f"改版前（dict 記錄，雜湊值索引複製欄位，不含遠端物件索引）: {legacy_current:,.0f} MB"
+              f"（載入峰值 {legacy_peak:,.0f} MB）")
+        print(f"目前（DownloadRecord，索引引用記錄，含遠端物件索引）: {current:,.0f} MB"
+              f"（載入峰值 {peak:,.0f} MB）")
+        print(f"減少 {(1 - current / legacy_current) * 100:.0f}%")
+        print("=" * 60)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def main():
+    """主函數"""
+    parser = argparse.ArgumentParser(description="效能測試工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    engines = subparsers.add_parser("engines", help="比較多執行緒與非同步下載引擎")
+    engines.add_argument("--photos", type=int, default=200, help="照片數量 (預設: 200)")
+    engines.add_argument("--workers", type=int, default=32, help="同時下載數 (預設: 32)")
+    engines.add_argument("--latency", type=float, default=20, help="模擬伺服器延遲毫秒數 (預設: 20)")
+    engines.add_argument("--image-size", type=int, default=800, help="模擬圖片邊長像素 (預設: 800)")
+    engines.add_argument("--max-rate", type=float, default=100000, help="每秒最多請求數 (預設: 100000)")
+    engines.add_argument("--rounds", type=int, default=1, help="每個引擎執行次數 (預設: 1)")
+    engines.set_defaults(func=benchmark_engines)
+    
+    roundtrips = subparsers.add_parser("roundtrips", help="比較擷取頁面資料所需的 WebDriver 往返次數")
+    roundtrips.add_argument("--albums", type=int, default=20, help="每頁相簿數 (預設: 20)")
+    roundtrips.add_argument("--photos", type=int, default=40, help="每頁照片數 (預設: 40)")
+    roundtrips.add_argument("--call-latency", type=float, default=3, help="模擬每次往返的延遲毫秒數 (預設: 3)")
+    roundtrips.set_defaults(func=benchmark_roundtrips)
+    
+    history = subparsers.add_parser("history", help="比較下載前過濾已下載 URL 的查詢方式")
+    history.add_argument("--records", type=int, nargs="+", default=[100000, 1000000],
+                         help="下載歷史記錄筆數，可指定多個 (預設: 100000 1000000)")
+    history.add_argument("--candidates", type=int, default=40, help="每次過濾的網址數 (預設: 40)")
+    history.set_defaults(func=benchmark_history)
+    
+    startup = subparsers.add_parser("startup", help="量測下載歷史的載入時間")
+    startup.add_argument("--records", type=int, default=100000, help="下載歷史記錄筆數 (預設: 100000)")
+    startup.set_defaults(func=benchmark_startup)
+    
+    memory = subparsers.add_parser("memory", help="比較下載歷史載入後占用的記憶體")
+    memory.add_argument("--records", type=int, default=500000, help="下載歷史記錄筆數 (預設: 500000)")
+    memory.set_defaults(func=benchmark_memory)
+    
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
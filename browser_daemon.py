@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+常駐瀏覽器
+
+在背景維持一個已登入的 Chrome，main.py --daemon 會以 debuggerAddress 連接這個
+瀏覽器，不必每次都重新啟動 Chrome 與登入。遠端除錯連接埠由 chromedriver 隨機選擇
+（不使用固定的 9222），連接位址只記錄在權限為 0600 的狀態檔中。
+每次使用時會更新租約檔的時間，超過 BROWSER_DAEMON_IDLE_TIMEOUT 秒沒有人使用就自動關閉。
+常駐期間會定期確認登入狀態，失效時自動重新登入，瀏覽器當掉時會重新啟動；
+連接中的程序持有使用鎖（共享鎖），檢查與重新登入要取得獨佔鎖，不會在使用中切換頁面。
+
+使用方法:
+    python browser_daemon.py start   # 在背景啟動常駐瀏覽器
+    python browser_daemon.py status  # 查看狀態
+    python browser_daemon.py stop    # 關閉常駐瀏覽器
+    python browser_daemon.py run     # 在前景執行（start 會以此模式啟動背景程序）
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import argparse
+import threading
+import subprocess
+from typing import Dict, Any, Optional, IO
+from config import Config
+from utils import log_message
+
+try:
+    import fcntl
+except ImportError:  # Windows 沒有 flock，使用鎖時不做任何鎖定
+    fcntl = None
+
+def _state_path() -> str:
+    """狀態檔路徑（預設在下載歷史旁）"""
+    default_path = os.path.join(os.path.dirname(os.path.abspath(Config.DOWNLOAD_HISTORY_FILE)),
+                                "browser_daemon.json")
+    return getattr(Config, 'BROWSER_DAEMON_STATE_FILE', default_path)
+
+def _lease_path() -> str:
+    """租約檔路徑，修改時間即為最後一次使用的時間"""
+    return f"{_state_path()}.lease"
+
+def _lock_path() -> str:
+    """使用鎖檔案路徑"""
+    return f"{_state_path()}.lock"
+
+def _open_private(path: str, flags: int) -> int:
+    """開啟（必要時建立）只有目前使用者可讀寫的檔案"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd = os.open(path, flags | os.O_CREAT, 0o600)
+    os.fchmod(fd, 0o600)
+    return fd
+
+def acquire_lock(shared: bool = True, blocking: bool = True) -> Optional[IO]:
+    """取得常駐瀏覽器的使用鎖
+    
+    連接的程序在使用期間持有共享鎖；常駐程序檢查或重新登入時取得獨佔鎖。
+    
+    Returns:
+        IO: 鎖檔案，以 release_lock 釋放；blocking 為 False 且鎖被占用時回傳 None
+    """
+    try:
+        lock_file = os.fdopen(_open_private(_lock_path(), os.O_RDWR), 'r+')
+    except OSError as e:
+        log_message(f"無法開啟常駐瀏覽器的使用鎖: {e}", "WARNING")
+        return None
+    if fcntl is None:
+        return lock_file
+    
+    operation = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+    if not blocking:
+        operation |= fcntl.LOCK_NB
+    try:
+        fcntl.flock(lock_file.fileno(), operation)
+        return lock_file
+    except OSError:
+        lock_file.close()
+        return None
+
+def release_lock(lock_file: Optional[IO]):
+    """釋放 acquire_lock 取得的鎖"""
+    if lock_file is not None:
+        lock_file.close()
+
+def _load_state() -> Optional[Dict[str, Any]]:
+    """讀取狀態檔（不檢查程序是否仍在執行）"""
+    try:
+        with open(_state_path(), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_state(state: Dict[str, Any]):
+    """寫入狀態檔（權限 0600：連接位址可以直接操作已登入的瀏覽器）"""
+    path = _state_path()
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with os.fdopen(_open_private(temp_path, os.O_WRONLY | os.O_TRUNC), 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(temp_path, path)
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    """程序是否仍在執行"""
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+def _address_open(address: str) -> bool:
+    """連接位址（host:port）是否有程式在監聽"""
+    host, _, port = address.rpartition(":")
+    try:
+        with socket.create_connection((host, int(port)), timeout=0.5):
+            return True
+    except OSError:
+        return False
+
+def read_state() -> Optional[Dict[str, Any]]:
+    """取得可連接的常駐瀏覽器狀態；不存在或已失效時回傳 None"""
+    state = _load_state()
+    if not state or state.get("status") != "ready":
+        return None
+    if not _pid_alive(state.get("pid")) or not _address_open(state.get("debugger_address", "")):
+        return None
+    return state
+
+def touch_lease():
+    """更新最後使用時間，避免常駐瀏覽器在使用中被關閉"""
+    path = _lease_path()
+    try:
+        os.close(_open_private(path, os.O_WRONLY))
+        os.utime(path, None)
+    except OSError:
+        pass
+
+def start_daemon() -> int:
+    """在背景啟動常駐瀏覽器程序，回傳 PID"""
+    log_path = os.path.join(os.path.dirname(_state_path()), "browser_daemon.log")
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    with open(log_path, 'a', encoding='utf-8') as log_file:
+        process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "run"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdin=subprocess.DEVNULL,
+            stdout=log_file,
+            stderr=subprocess.STDOUT,
+            start_new_session=True  # 不隨呼叫端結束
+        )
+    log_message(f"已在背景啟動常駐瀏覽器 (PID {process.pid})，記錄檔: {log_path}")
+    return process.pid
+
+def ensure_daemon(timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """取得常駐瀏覽器，不存在時（BROWSER_DAEMON_AUTOSTART 為 True）在背景啟動並等待就緒"""
+    state = read_state()
+    if state:
+        return state
+    
+    pending = _load_state()
+    if not (pending and pending.get("status") == "starting" and _pid_alive(pending.get("pid"))):
+        if not getattr(Config, 'BROWSER_DAEMON_AUTOSTART', True):
+            return None
+        start_daemon()
+    
+    timeout = timeout or getattr(Config, 'BROWSER_DAEMON_START_TIMEOUT', 90)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        state = read_state()
+        if state:
+            return state
+        pending = _load_state()
+        if pending and pending.get("status") == "failed":
+            break
+        time.sleep(0.5)
+    
+    log_message("常駐瀏覽器未能在時間內就緒", "WARNING")
+    return None
+
+def stop_daemon() -> bool:
+    """要求常駐瀏覽器關閉"""
+    state = _load_state()
+    if not state or not _pid_alive(state.get("pid")):
+        return False
+    os.kill(state["pid"], signal.SIGTERM)
+    return True
+
+class BrowserDaemon:
+    """維持一個已登入、可供其他程序連接的瀏覽器"""
+    
+    def __init__(self):
+        self.idle_timeout = getattr(Config, 'BROWSER_DAEMON_IDLE_TIMEOUT', 30 * 60)
+        self.check_interval = getattr(Config, 'BROWSER_DAEMON_CHECK_INTERVAL', 60)
+        self.handler = None
+        self.stop_event = threading.Event()
+    
+    def _start_browser(self) -> bool:
+        """啟動瀏覽器並登入"""
+        # browser_handler 會匯入本模組以連接常駐瀏覽器，因此在這裡才匯入
+        from browser_handler import BrowserHandler
+        
+        self.handler = BrowserHandler()
+        if self.handler.init_browser() and self.handler.login():
+            return True
+        self.handler.close()
+        self.handler = None
+        return False
+    
+    def _idle_seconds(self) -> float:
+        """距離最後一次使用經過的秒數"""
+        try:
+            return time.time() - os.path.getmtime(_lease_path())
+        except OSError:
+            return 0.0
+    
+    def _acquire_idle_shutdown(self) -> Optional[IO]:
+        """閒置逾時且沒有程序正在使用瀏覽器時取得獨佔鎖
+        
+        租約只在導覽頁面時更新，長時間處理同一頁面的程序仍持有共享鎖；
+        有程序持有鎖時不關閉。回傳的鎖需持有到瀏覽器關閉為止，避免其他程序在關閉途中連接。
+        
+        Returns:
+            IO: 可以關閉時回傳獨佔鎖；尚未逾時或仍在使用中時回傳 None
+        """
+        if self._idle_seconds() <= self.idle_timeout:
+            return None
+        lock_file = acquire_lock(shared=False, blocking=False)
+        if lock_file is None:
+            log_message("常駐瀏覽器已閒置逾時但仍在使用中，暫不關閉")
+        return lock_file
+    
+    def _debugger_address(self) -> Optional[str]:
+        """chromedriver 啟動 Chrome 時隨機選擇的遠端除錯位址"""
+        options = self.handler.driver.capabilities.get("goog:chromeOptions", {})
+        return options.get("debuggerAddress")
+    
+    def _check_browser(self, state: Dict[str, Any]):
+        """確認瀏覽器仍可操作且仍在登入狀態
+        
+        只在取得獨佔鎖時檢查；有程序正在使用瀏覽器時略過，避免切換它正在操作的頁面。
+        """
+        lock_file = acquire_lock(shared=False, blocking=False)
+        if lock_file is None:
+            log_message("常駐瀏覽器使用中，略過這次檢查")
+            return
+        try:
+            self._check_browser_locked(state)
+        finally:
+            release_lock(lock_file)
+    
+    def _check_browser_locked(self, state: Dict[str, Any]):
+        """確認瀏覽器狀態（呼叫端需持有獨佔鎖）"""
+        if not self.handler.is_alive():
+            log_message("常駐瀏覽器已失效，重新啟動...", "WARNING")
+            self.handler.close()
+            if not self._start_browser():
+                log_message("重新啟動瀏覽器失敗", "ERROR")
+                self.stop_event.set()
+                return
+            # 重新啟動後連接埠不同
+            state["debugger_address"] = self._debugger_address()
+            _write_state(state)
+            return
+        
+        if not self.handler.browser_session_valid():
+            log_message("登入狀態已失效，重新登入...")
+            if self.handler._login():
+                self.handler._save_session()
+            else:
+                log_message("重新登入失敗，將在下次檢查時重試", "WARNING")
+    
+    def run(self) -> int:
+        """啟動瀏覽器並持續維護，直到閒置逾時或收到結束訊號"""
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: self.stop_event.set())
+        
+        state = {"pid": os.getpid(), "status": "starting", "started_at": time.time()}
+        _write_state(state)
+        shutdown_lock = None
+        try:
+            if not self._start_browser():
+                state["status"] = "failed"
+                _write_state(state)
+                return 1
+            
+            touch_lease()
+            state.update(status="ready", debugger_address=self._debugger_address())
+            _write_state(state)
+            log_message(f"常駐瀏覽器已就緒，閒置 {self.idle_timeout} 秒後自動關閉")
+            
+            while not self.stop_event.wait(self.check_interval):
+                shutdown_lock = self._acquire_idle_shutdown()
+                if shutdown_lock is not None:
+                    log_message("常駐瀏覽器閒置逾時，自動關閉")
+                    break
+                self._check_browser(state)
+            return 0
+        
+        finally:
+            if self.handler:
+                self.handler.close()
+            current = _load_state()
+            if current and current.get("pid") == os.getpid() and current.get("status") != "failed":
+                os.remove(_state_path())
+            release_lock(shutdown_lock)
+
+def main():
+    """主函數"""
+    parser = argparse.ArgumentParser(description="常駐瀏覽器（供 main.py --daemon 連接）")
+    parser.add_argument("command", choices=["start", "stop", "status", "run"], help="要執行的動作")
+    args = parser.parse_args()
+    
+    if args.command == "run":
+        sys.exit(BrowserDaemon().run())
+    
+    if args.command == "start":
+        state = ensure_daemon()
+        if not state:
+            sys.exit(1)
+        print(f"常駐瀏覽器已就緒: {state['debugger_address']} (PID {state['pid']})")
+    elif args.command == "stop":
+        if stop_daemon():
+            print("已要求常駐瀏覽器關閉")
+        else:
+            print("常駐瀏覽器未在執行")
+    else:
+        state = read_state()
+        if state:
+            idle = time.time() - os.path.getmtime(_lease_path()) if os.path.exists(_lease_path()) else 0
+            print(f"常駐瀏覽器執行中: {state['debugger_address']} (PID {state['pid']})，已閒置 {idle:.0f} 秒")
+        else:
+            print("常駐瀏覽器未在執行")
+
+if __name__ == "__main__":
+    main()
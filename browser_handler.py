@@ -1,5 +1,7 @@
 import time
 import re
+import json
+import requests
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional, Tuple
 from selenium import webdriver
@@ -9,22 +11,98 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
-from webdriver_manager.chrome import ChromeDriverManager
 from config import Config
-from utils import log_message, DateUtils
+from utils import log_message, DateUtils, format_file_size
+from rate_limiter import get_rate_limiter
+from session_cache import SessionCache, apply_cookies, probe_session
+from page_parser import PageLinks
+from scrape_cache import CrawlState, get_album_cache
+from driver_resolver import DriverResolver
+from browser_daemon import ensure_daemon, touch_lease, acquire_lock, release_lock
 
 class BrowserHandler:
     """瀏覽器操作處理器"""
     
-    def __init__(self):
+    PHOTO_LINK_SELECTOR = "a.photo-gallery.albumbgphoto"
+    
+    # 一次取回所有相簿磚塊的 HTML
+    ALBUM_BRICKS_SCRIPT = """
+        return Array.from(document.querySelectorAll('.brick2'), function (e) { return e.outerHTML; });
+    """
+    
+    # 一次取回照片連結的所有候選來源（與 get_attribute 相同：href/src 為絕對網址）
+    PHOTO_LINKS_SCRIPT = """
+        function hrefs(selector) {
+            return Array.from(document.querySelectorAll(selector), function (a) { return a.href; })
+                .filter(function (href) { return href; });
+        }
+        return {
+            gallery: hrefs('a.photo-gallery.albumbgphoto'),
+            album: hrefs('a.albumbgphoto'),
+            images: Array.from(document.querySelectorAll('img'), function (img) {
+                return [img.src || null, img.getAttribute('data-src')];
+            })
+        };
+    """
+    
+    # 指定的元素出現即視為就緒；否則要等 readyState 為 complete，
+    # 且一段時間內沒有新的網路請求（network idle）。
+    # 傳輸量不用 Resource Timing 的 transferSize 計算：跨來源資源（S3 上的照片）
+    # 沒有 Timing-Allow-Origin 標頭時一律為 0，改由 CDP 事件統計（_read_page_transfer）
+    PAGE_READY_SCRIPT = """
+        var selector = arguments[0], idleMs = arguments[1];
+        function ready(reason) { return {reason: reason}; }
+        if (selector && document.querySelector(selector)) return ready('element');
+        if (document.readyState !== 'complete') return null;
+        var count = performance.getEntriesByType('resource').length;
+        var now = performance.now();
+        var probe = window.__pageReadyProbe;
+        if (!probe || probe.count !== count) {
+            window.__pageReadyProbe = {count: count, since: now};
+            return null;
+        }
+        return now - probe.since >= idleMs ? ready('network-idle') : null;
+    """
+    
+    # 擷取資料只需要 HTML，不下載圖片、影音、字型與樣式表
+    # （CDP 的萬用字元要比對整個網址，帶查詢字串的網址如 S3 簽章網址需另外列出）
+    BLOCKED_RESOURCE_PATTERNS = [
+        pattern
+        for extension in ("jpg", "jpeg", "png", "gif", "webp", "svg", "ico", "bmp",
+                          "mp4", "webm", "mp3", "woff", "woff2", "ttf", "otf", "eot", "css")
+        for pattern in (f"*.{extension}", f"*.{extension}?*")
+    ]
+    
+    def __init__(self, use_daemon: bool = False):
+        """
+        Args:
+            use_daemon: 連接常駐瀏覽器（browser_daemon.py）而不啟動新的 Chrome
+        """
         self.driver = None
         self.wait = None
+        self.use_daemon = use_daemon
+        self.attached = False
+        # 連接常駐瀏覽器期間持有的使用鎖
+        self.daemon_lock = None
+        self.session_cache = SessionCache()
+        self.crawl_state = CrawlState()
+        # 為 True 時忽略 high-water mark，擷取所有相簿列表分頁
+        self.full_crawl = False
+        self.startup_timings = {}
+        self.page_wait_stats = {"pages": 0, "waited": 0.0, "replaced": 0.0, "timeouts": 0,
+                                "measured_pages": 0, "bytes": 0}
+        # 是否啟用 performance log 以統計頁面的實際傳輸量
+        self.measure_transfer = getattr(Config, 'MEASURE_PAGE_TRANSFER', True)
     
     def init_browser(self) -> bool:
         """初始化瀏覽器"""
         try:
             log_message("正在初始化瀏覽器...")
             
+            block_resources = getattr(Config, 'BLOCK_PAGE_RESOURCES', True)
+            if self.use_daemon and self._attach_to_daemon(block_resources):
+                return True
+            
             # 設定 Chrome 選項
             chrome_options = Options()
             for option in Config.get_chrome_options():
@@ -37,14 +115,30 @@ class BrowserHandler:
                 "download.directory_upgrade": True,
                 "safebrowsing.enabled": True
             }
+            if block_resources:
+                # 不載入圖片（縮圖對擷取連結沒有用處）
+                prefs["profile.managed_default_content_settings.images"] = 2
             chrome_options.add_experimental_option("prefs", prefs)
+            self._enable_transfer_log(chrome_options)
+            
+            # 初始化 WebDriver（驅動路徑有快取，不必每次都連網查詢版本）
+            resolver = DriverResolver()
+            driver_path = resolver.resolve()
+            service = Service(driver_path) if driver_path else Service()
             
-            # 初始化 WebDriver
-            service = Service(ChromeDriverManager().install())
+            launch_started = time.perf_counter()
             self.driver = webdriver.Chrome(service=service, options=chrome_options)
-            self.driver.implicitly_wait(Config.IMPLICIT_WAIT)
+            launched = time.perf_counter()
+            # 頁面載入改由 _wait_for_page 明確等待，隱式等待會讓找不到元素的查詢白等數秒
+            self.driver.implicitly_wait(0)
             self.wait = WebDriverWait(self.driver, Config.BROWSER_TIMEOUT)
+            if block_resources:
+                self._block_page_resources()
             
+            self.startup_timings = dict(resolver.timings,
+                                        chrome_launch=launched - launch_started,
+                                        setup=time.perf_counter() - launched)
+            self._log_startup_timings()
             log_message("瀏覽器初始化成功")
             return True
             
@@ -52,18 +146,132 @@ class BrowserHandler:
             log_message(f"瀏覽器初始化失敗: {e}", "ERROR")
             return False
     
+    def _attach_to_daemon(self, block_resources: bool) -> bool:
+        """連接常駐瀏覽器；無法使用時回傳 False，改為啟動新的瀏覽器"""
+        started = time.perf_counter()
+        state = ensure_daemon()
+        if not state:
+            log_message("無法使用常駐瀏覽器，改為啟動新的瀏覽器", "WARNING")
+            return False
+        
+        # 使用期間持有共享鎖，常駐程序不會在此時檢查或重新登入
+        self.daemon_lock = acquire_lock(shared=True)
+        try:
+            driver_path = DriverResolver().resolve()
+            options = Options()
+            options.add_experimental_option("debuggerAddress", state["debugger_address"])
+            self._enable_transfer_log(options)
+            self.driver = webdriver.Chrome(service=Service(driver_path) if driver_path else Service(),
+                                           options=options)
+        except WebDriverException as e:
+            log_message(f"連接常駐瀏覽器失敗，改為啟動新的瀏覽器: {e}", "WARNING")
+            self.driver = None
+            release_lock(self.daemon_lock)
+            self.daemon_lock = None
+            return False
+        
+        self.driver.implicitly_wait(0)
+        self.wait = WebDriverWait(self.driver, Config.BROWSER_TIMEOUT)
+        if block_resources:
+            self._block_page_resources()
+        self.attached = True
+        touch_lease()
+        log_message(f"已連接常駐瀏覽器 {state['debugger_address']}，耗時 {time.perf_counter() - started:.2f} 秒")
+        return True
+    
+    def _log_startup_timings(self):
+        """輸出瀏覽器啟動各階段的耗時"""
+        labels = [("chrome_version", "偵測 Chrome 版本"), ("driver_download", "下載/查詢驅動"),
+                  ("driver_resolve", "解析驅動合計"), ("chrome_launch", "啟動 Chrome"), ("setup", "瀏覽器設定")]
+        phases = [f"{label} {self.startup_timings[key]:.2f} 秒" for key, label in labels if key in self.startup_timings]
+        total = (self.startup_timings.get("driver_resolve", 0) + self.startup_timings.get("chrome_launch", 0)
+                 + self.startup_timings.get("setup", 0))
+        log_message(f"瀏覽器啟動耗時 {total:.2f} 秒：{'、'.join(phases)}")
+    
     def login(self) -> bool:
-        """登入網站"""
+        """登入網站；快取的登入狀態仍有效時直接沿用"""
+        if self.attached and self.browser_session_valid():
+            log_message("常駐瀏覽器仍在登入狀態，略過登入流程")
+            return True
+        
+        if self._restore_cached_session():
+            log_message("沿用快取的登入狀態，略過登入流程")
+            return True
+        
+        if not self._login():
+            return False
+        
+        self._save_session()
+        return True
+    
+    def _restore_cached_session(self) -> bool:
+        """將仍有效的快取登入狀態載入瀏覽器"""
+        cached = self.session_cache.load()
+        if not cached:
+            return False
+        
+        # 先以輕量的 HTTP 請求確認，避免為了失效的 Cookie 載入頁面
+        if not self._probe_cookies(cached["cookies"], cached.get("user_agent")):
+            log_message("快取的登入狀態已失效，重新登入")
+            self.session_cache.clear()
+            return False
+        
+        try:
+            for cookie in cached["cookies"]:
+                params = {
+                    "name": cookie["name"],
+                    "value": cookie["value"],
+                    "domain": cookie.get("domain", ""),
+                    "path": cookie.get("path", "/"),
+                    "secure": cookie.get("secure", False),
+                    "httpOnly": cookie.get("httpOnly", False)
+                }
+                if cookie.get("expiry"):
+                    params["expires"] = cookie["expiry"]
+                # 不需先前往網站頁面即可設定 Cookie
+                self.driver.execute_cdp_cmd("Network.setCookie", params)
+            return True
+        except Exception as e:
+            log_message(f"載入快取的登入狀態失敗: {e}", "WARNING")
+            return False
+    
+    def _probe_cookies(self, cookies: List[Dict[str, Any]], user_agent: Optional[str] = None) -> bool:
+        """以 HTTP 請求確認 Cookie 是否仍在登入狀態"""
+        probe = requests.Session()
+        probe.headers['User-Agent'] = user_agent or Config.USER_AGENT
+        apply_cookies(probe, cookies)
+        try:
+            return probe_session(probe)
+        finally:
+            probe.close()
+    
+    def browser_session_valid(self) -> bool:
+        """瀏覽器目前的 Cookie 是否仍在登入狀態（不切換頁面）"""
+        try:
+            cookies = self.export_cookies()
+            return bool(cookies) and self._probe_cookies(cookies, self.get_user_agent())
+        except WebDriverException:
+            return False
+    
+    def _save_session(self):
+        """快取登入狀態供下次執行使用"""
+        try:
+            self.session_cache.save(self.export_cookies(), self.get_user_agent())
+        except Exception as e:
+            log_message(f"無法快取登入狀態: {e}", "WARNING")
+    
+    def _login(self) -> bool:
+        """以登入表單登入網站"""
         try:
             log_message("正在登入網站...")
             
             # 前往登入頁面
             log_message(f"正在前往登入頁面: {Config.LOGIN_URL}")
-            self.driver.get(Config.LOGIN_URL)
+            self._get_page(Config.LOGIN_URL)
             
-            # 等待頁面完全載入
+            # 等待登入表單出現
             log_message("等待頁面載入...")
-            time.sleep(2)
+            self._wait_for_page("input[type='text']", replaced_sleep=2)
             
             # 列印目前頁面標題和URL以便除錯
             current_url = self.driver.current_url
@@ -119,7 +327,7 @@ class BrowserHandler:
             
             # 等待登入完成，檢查是否跳轉到相簿頁面
             log_message("等待登入完成...")
-            time.sleep(2)
+            self._wait_for_condition(lambda driver: "activity" in driver.current_url.lower(), replaced_sleep=2)
             
             final_url = self.driver.current_url
             log_message(f"登入後頁面: {final_url}")
@@ -141,6 +349,145 @@ class BrowserHandler:
             self._save_page_source_for_debug()
             return False
     
+    def _get_page(self, url: str):
+        """前往指定頁面，請求速率由網站共用的限速器控制"""
+        limiter = get_rate_limiter(url, "page")
+        limiter.acquire()
+        if self.attached:
+            touch_lease()
+        start_time = time.monotonic()
+        try:
+            self.driver.get(url)
+        except WebDriverException:
+            limiter.record_failure()
+            raise
+        limiter.record_success(time.monotonic() - start_time)
+    
+    def _block_page_resources(self):
+        """透過 CDP 封鎖擷取資料用不到的資源"""
+        patterns = getattr(Config, 'BLOCKED_RESOURCE_PATTERNS', self.BLOCKED_RESOURCE_PATTERNS)
+        try:
+            self.driver.execute_cdp_cmd("Network.enable", {})
+            self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+            log_message("已封鎖頁面中的圖片、影音、字型與樣式表")
+        except Exception as e:
+            log_message(f"無法封鎖頁面資源，將載入完整頁面: {e}", "WARNING")
+    
+    def _enable_transfer_log(self, options: Options):
+        """開啟 performance log，讓 chromedriver 保留 CDP 的 Network 事件供統計傳輸量"""
+        if self.measure_transfer:
+            options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    
+    def _read_page_transfer(self) -> Dict[str, int]:
+        """統計上次讀取後所有請求的實際傳輸量
+        
+        加總 CDP Network.loadingFinished 事件的 encodedDataLength（實際收到的位元組數，
+        包含跨來源資源）；未開啟 performance log 時回傳空的 dict。
+        """
+        if not self.measure_transfer:
+            return {}
+        try:
+            entries = self.driver.get_log("performance")
+        except WebDriverException:
+            return {}
+        
+        received = resources = 0
+        for entry in entries:
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, TypeError, ValueError):
+                continue
+            if message.get("method") == "Network.loadingFinished":
+                received += message.get("params", {}).get("encodedDataLength", 0)
+                resources += 1
+        return {"bytes": int(received), "resources": resources}
+    
+    def _wait_for_page(self, selector: Optional[str] = None, replaced_sleep: float = 0.0,
+                       previous_page=None) -> Optional[Dict[str, Any]]:
+        """等待頁面就緒，取代固定秒數的等待
+        
+        Args:
+            selector: 出現即代表頁面內容已載入的 CSS 選擇器
+            replaced_sleep: 原本固定等待的秒數，用於統計節省的時間
+            previous_page: 點擊換頁前的 <html> 元素，會先等它失效以免讀到舊頁面
+        
+        Returns:
+            Dict: 就緒原因與頁面傳輸量；逾時為 None
+        """
+        idle_ms = getattr(Config, 'PAGE_NETWORK_IDLE', 0.3) * 1000
+        
+        def page_ready(driver):
+            if previous_page is not None and not EC.staleness_of(previous_page)(driver):
+                return False
+            ready = driver.execute_script(self.PAGE_READY_SCRIPT, selector, idle_ms)
+            if ready:
+                ready.update(self._read_page_transfer())
+            return ready
+        
+        return self._wait_for_condition(page_ready, replaced_sleep)
+    
+    def _wait_for_condition(self, condition, replaced_sleep: float = 0.0) -> Any:
+        """在 PAGE_READY_TIMEOUT 內等待條件成立，並記錄等待時間
+        
+        Returns:
+            條件的回傳值；逾時為 None
+        """
+        timeout = getattr(Config, 'PAGE_READY_TIMEOUT', 5)
+        start_time = time.monotonic()
+        result = None
+        try:
+            result = WebDriverWait(self.driver, timeout, poll_frequency=0.05).until(condition)
+        except TimeoutException:
+            pass
+        waited = time.monotonic() - start_time
+        
+        stats = self.page_wait_stats
+        stats["pages"] += 1
+        stats["waited"] += waited
+        stats["replaced"] += replaced_sleep
+        if result is None:
+            stats["timeouts"] += 1
+            log_message(f"等待頁面就緒逾時（{timeout} 秒），繼續處理", "WARNING")
+            return None
+        
+        message = f"頁面就緒，等待 {waited:.2f} 秒（原固定等待 {replaced_sleep:g} 秒）"
+        if isinstance(result, dict) and "bytes" in result:
+            stats["measured_pages"] += 1
+            stats["bytes"] += result["bytes"]
+            message += f"，傳輸 {format_file_size(result['bytes'])}（{result['resources']} 個資源）"
+        log_message(message)
+        return result
+    
+    def log_page_wait_summary(self):
+        """輸出頁面等待時間統計"""
+        stats = self.page_wait_stats
+        if not stats["pages"]:
+            return
+        log_message(f"頁面等待統計: {stats['pages']} 次，共等待 {stats['waited']:.1f} 秒，"
+                    f"平均 {stats['waited'] / stats['pages']:.2f} 秒，"
+                    f"較固定等待節省 {stats['replaced'] - stats['waited']:.1f} 秒，逾時 {stats['timeouts']} 次")
+        if stats["measured_pages"]:
+            log_message(f"頁面傳輸統計: 共 {format_file_size(stats['bytes'])}，"
+                        f"平均每頁 {format_file_size(stats['bytes'] // stats['measured_pages'])}")
+    
+    def is_alive(self) -> bool:
+        """檢查瀏覽器是否仍可操作"""
+        if not self.driver:
+            return False
+        try:
+            self.driver.execute_script("return 1")
+            return True
+        except WebDriverException:
+            return False
+    
+    def export_cookies(self) -> List[Dict[str, Any]]:
+        """匯出目前瀏覽器的登入 Cookie，供 HTTP 會話沿用"""
+        return self.driver.get_cookies()
+    
+    def get_user_agent(self) -> str:
+        """取得瀏覽器實際使用的 User-Agent"""
+        return self.driver.execute_script("return navigator.userAgent")
+    
     def _save_page_source_for_debug(self):
         """儲存頁面原始碼用於除錯"""
         try:
@@ -159,6 +506,7 @@ class BrowserHandler:
             log_message(f"正在取得{album_type}列表...")
             
             all_albums = []
+            first_page_albums = []
             page_number = 1
             max_album_pages = 5  # 相簿列表最大頁數（增加到5頁）
             
@@ -170,23 +518,23 @@ class BrowserHandler:
                     page_url = f"{base_url}?PageIndex={page_number}"
                 
                 log_message(f"正在處理{album_type}第 {page_number} 頁: {page_url}")
-                self.driver.get(page_url)
-                time.sleep(1)  # 減少等待時間
-                
-                # 檢查瀏覽器會話
-                try:
-                    self.driver.current_url
-                except Exception as e:
-                    log_message(f"瀏覽器會話無效: {e}", "ERROR")
+                page_albums = self._load_albums_page(page_url, album_type)
+                if page_albums is None:
                     break
                 
-                # 取得當前頁面的相簿，傳入相簿類型用於生成正確的連結
-                page_albums = self._get_albums_from_current_page(album_type)
-                
                 if not page_albums:
                     log_message(f"{album_type}第 {page_number} 頁沒有相簿，結束分頁處理")
                     break
                 
+                if page_number == 1:
+                    first_page_albums = page_albums
+                
+                # 新相簿只會出現在前面，整頁都是已知相簿時後面的分頁不必再擷取
+                if not self.full_crawl and self.crawl_state.is_known_page(album_type, page_number, page_albums):
+                    log_message(f"{album_type}第 {page_number} 頁的相簿都已擷取過，停止分頁處理（使用 --full-crawl 可擷取所有分頁）")
+                    all_albums.extend(page_albums)
+                    break
+                
                 # 如果相簿數量少於10個，可能已經是最後一頁
                 if len(page_albums) < 10:
                     log_message(f"{album_type}第 {page_number} 頁只有 {len(page_albums)} 個相簿，可能是最後一頁")
@@ -198,6 +546,9 @@ class BrowserHandler:
                 
                 page_number += 1
             
+            # 相簿都處理完畢後才由下載管理器寫入擷取狀態
+            self.crawl_state.stage(album_type, first_page_albums, all_albums)
+            
             log_message(f"成功取得 {len(all_albums)} 個{album_type}")
             return all_albums
             
@@ -205,6 +556,25 @@ class BrowserHandler:
             log_message(f"取得{album_type}列表失敗: {e}", "ERROR")
             return []
     
+    def _load_albums_page(self, page_url: str, album_type: str) -> Optional[List[Dict[str, Any]]]:
+        """載入相簿列表頁面並解析相簿
+        
+        Returns:
+            List: 頁面中的相簿；會話失效時回傳 None
+        """
+        self._get_page(page_url)
+        self._wait_for_page("#freebrick2 .brick2", replaced_sleep=1)
+        
+        # 檢查瀏覽器會話
+        try:
+            self.driver.current_url
+        except Exception as e:
+            log_message(f"瀏覽器會話無效: {e}", "ERROR")
+            return None
+        
+        # 取得當前頁面的相簿，傳入相簿類型用於生成正確的連結
+        return self._get_albums_from_current_page(album_type)
+    
     def _get_albums_from_current_page(self, album_type: str = "校園相簿") -> List[Dict[str, Any]]:
         """從當前頁面取得相簿列表（超級簡化版）"""
         albums = []
@@ -218,103 +588,105 @@ class BrowserHandler:
                 EC.presence_of_element_located((By.ID, "freebrick2"))
             )
             
-            # 取得所有磚塊元素
-            album_elements = self.driver.find_elements(By.CSS_SELECTOR, ".brick2")
-            log_message(f"找到 {len(album_elements)} 個相簿磚塊")
-            
-            # 根據相簿類型決定URL模式
-            url_pattern = "School-Album-Detail" if album_type == "校園相簿" else "Class-Album-Detail"
+            # 一次 execute_script 取回所有磚塊的 HTML，避免每個元素各一次 WebDriver 往返
+            element_htmls = self.driver.execute_script(self.ALBUM_BRICKS_SCRIPT)
+            log_message(f"找到 {len(element_htmls)} 個相簿磚塊")
+            albums = self._parse_album_bricks(element_htmls, album_type)
             
-            # 批量提取所有資訊，避免多次DOM查詢
-            for i, element in enumerate(album_elements):
-                try:
-                    # 一次性提取所有需要的屬性
-                    element_html = element.get_attribute("outerHTML")
+        except Exception as e:
+            log_message(f"從當前頁面取得相簿時發生錯誤: {e}", "ERROR")
+        
+        return albums
+    
+    def _parse_album_bricks(self, element_htmls: List[str], album_type: str) -> List[Dict[str, Any]]:
+        """從相簿磚塊的 HTML 解析相簿資訊"""
+        albums = []
+        
+        # 根據相簿類型決定URL模式
+        url_pattern = "School-Album-Detail" if album_type == "校園相簿" else "Class-Album-Detail"
+        
+        for i, element_html in enumerate(element_htmls):
+            try:
+                # 簡單的字符串解析，避免複雜的DOM查詢
+                title = ""
+                link = ""
+                is_new = False
+                
+                # 從HTML中提取標題
+                if "相簿名稱:" in element_html:
+                    title_start = element_html.find("相簿名稱:") + 5
+                    # 尋找結束位置，可能是換行符或HTML標籤
+                    possible_ends = []
+                    for end_marker in ["\\n", "<", "\n", "相簿說明:"]:
+                        pos = element_html.find(end_marker, title_start)
+                        if pos != -1:
+                            possible_ends.append(pos)
                     
-                    # 簡單的字符串解析，避免複雜的DOM查詢
-                    title = ""
-                    link = ""
-                    is_new = False
+                    if possible_ends:
+                        title_end = min(possible_ends)
+                        title = element_html[title_start:title_end].strip()
+                        # 清理HTML實體和多餘的符號
+                        title = title.replace("&quot;", '"').replace("&amp;", "&").replace("&lt;", "<").replace("&gt;", ">")
+                        if title.endswith('"'):
+                            title = title[:-1]
+                
+                # 從HTML中提取連結
+                if "albumId=" in element_html:
+                    link_start = element_html.find("albumId=")
+                    link_end = element_html.find('"', link_start)
+                    if link_end > link_start:
+                        link_part = element_html[link_start:link_end]
+                        # 解碼HTML實體
+                        link_part = link_part.replace("&amp;", "&").replace("&quot;", '"').replace("&lt;", "<").replace("&gt;", ">")
+                        # 根據相簿類型生成正確的連結
+                        link = f"https://williamkindergarten.topschool.tw/Activity/{url_pattern}?{link_part}"
+                
+                # 檢查是否為新相簿
+                is_new = "topnews" in element_html
+                
+                # 如果沒有找到標題，使用備用方案
+                if not title and link:
+                    if "albumId=" in link:
+                        try:
+                            album_id = link.split("albumId=")[1].split("&")[0]
+                            title = f"相簿_{album_id}"
+                        except:
+                            title = f"未知相簿_{i+1}"
+                    else:
+                        title = f"未知相簿_{i+1}"
+                
+                if title and link:
+                    # 快速提取相簿ID
+                    album_id = None
+                    if "albumId=" in link:
+                        try:
+                            album_id = int(link.split("albumId=")[1].split("&")[0])
+                        except (ValueError, IndexError):
+                            pass
                     
-                    # 從HTML中提取標題
-                    if "相簿名稱:" in element_html:
-                        title_start = element_html.find("相簿名稱:") + 5
-                        # 尋找結束位置，可能是換行符或HTML標籤
-                        possible_ends = []
-                        for end_marker in ["\\n", "<", "\n", "相簿說明:"]:
-                            pos = element_html.find(end_marker, title_start)
-                            if pos != -1:
-                                possible_ends.append(pos)
-                        
-                        if possible_ends:
-                            title_end = min(possible_ends)
-                            title = element_html[title_start:title_end].strip()
-                            # 清理HTML實體和多餘的符號
-                            title = title.replace("&quot;", '"').replace("&amp;", "&").replace("&lt;", "<").replace("&gt;", ">")
-                            if title.endswith('"'):
-                                title = title[:-1]
+                    # 簡化的日期推斷
+                    estimated_date = self._estimate_album_date(len(albums), album_id, is_new)
                     
-                    # 從HTML中提取連結
-                    if "albumId=" in element_html:
-                        link_start = element_html.find("albumId=")
-                        link_end = element_html.find('"', link_start)
-                        if link_end > link_start:
-                            link_part = element_html[link_start:link_end]
-                            # 解碼HTML實體
-                            link_part = link_part.replace("&amp;", "&").replace("&quot;", '"').replace("&lt;", "<").replace("&gt;", ">")
-                            # 根據相簿類型生成正確的連結
-                            link = f"https://williamkindergarten.topschool.tw/Activity/{url_pattern}?{link_part}"
+                    album_info = {
+                        "title": title,
+                        "date": estimated_date,
+                        "link": link,
+                        "date_text": title,
+                        "album_id": album_id,
+                        "page_order": len(albums),
+                        "is_new": is_new
+                    }
+                    albums.append(album_info)
                     
-                    # 檢查是否為新相簿
-                    is_new = "topnews" in element_html
+                    # 只記錄NEW相簿，減少日誌
+                    if is_new:
+                        log_message(f"解析{album_type}: {title[:30]}... [NEW]")
                     
-                    # 如果沒有找到標題，使用備用方案
-                    if not title and link:
-                        if "albumId=" in link:
-                            try:
-                                album_id = link.split("albumId=")[1].split("&")[0]
-                                title = f"相簿_{album_id}"
-                            except:
-                                title = f"未知相簿_{i+1}"
-                        else:
-                            title = f"未知相簿_{i+1}"
-                    
-                    if title and link:
-                        # 快速提取相簿ID
-                        album_id = None
-                        if "albumId=" in link:
-                            try:
-                                album_id = int(link.split("albumId=")[1].split("&")[0])
-                            except (ValueError, IndexError):
-                                pass
-                        
-                        # 簡化的日期推斷
-                        estimated_date = self._estimate_album_date(len(albums), album_id, is_new)
-                        
-                        album_info = {
-                            "title": title,
-                            "date": estimated_date,
-                            "link": link,
-                            "date_text": title,
-                            "album_id": album_id,
-                            "page_order": len(albums),
-                            "is_new": is_new
-                        }
-                        albums.append(album_info)
-                        
-                        # 只記錄NEW相簿，減少日誌
-                        if is_new:
-                            log_message(f"解析{album_type}: {title[:30]}... [NEW]")
-                        
-                except Exception as e:
-                    log_message(f"解析相簿 {i+1} 失敗: {e}", "WARNING")
-                    continue
-            
-            log_message(f"成功解析 {len(albums)} 個{album_type}")
-            
-        except Exception as e:
-            log_message(f"從當前頁面取得相簿時發生錯誤: {e}", "ERROR")
+            except Exception as e:
+                log_message(f"解析相簿 {i+1} 失敗: {e}", "WARNING")
+                continue
         
+        log_message(f"成功解析 {len(albums)} 個{album_type}")
         return albums
     
     def _find_album_title(self, element) -> Optional[Any]:
@@ -431,8 +803,8 @@ class BrowserHandler:
         try:
             log_message("正在取得相簿照片...")
             
-            self.driver.get(album_url)
-            time.sleep(2)
+            self._get_page(album_url)
+            self._wait_for_page(self.PHOTO_LINK_SELECTOR, replaced_sleep=2)
             
             all_photo_urls = []
             page_number = 1
@@ -458,67 +830,50 @@ class BrowserHandler:
                 
                 page_number += 1
             
-            # 移除重複的 URL
-            all_photo_urls = list(set(all_photo_urls))
-            
-            # 過濾掉明顯的縮圖或無效連結
-            filtered_urls = []
-            for url in all_photo_urls:
-                if self._is_full_size_photo_url(url):
-                    filtered_urls.append(url)
-            
-            log_message(f"總共處理 {page_number-1} 頁，成功取得 {len(filtered_urls)} 張照片連結")
-            
-            # 如果啟用重複過濾且提供了歷史管理器，進行批量重複檢測
-            if filter_duplicates and history_manager:
-                filtered_urls = self._filter_duplicate_photos(filtered_urls, history_manager)
-            
-            return filtered_urls
+            return self._finalize_photo_list(all_photo_urls, page_number - 1, history_manager, filter_duplicates,
+                                             album_url)
             
         except Exception as e:
             log_message(f"取得相簿照片失敗: {e}", "ERROR")
             return []
     
+    def _finalize_photo_list(self, all_photo_urls: List[str], page_count: int,
+                             history_manager=None, filter_duplicates: bool = True,
+                             album_url: Optional[str] = None) -> List[str]:
+        """整理所有分頁收集到的照片連結：去除重複、縮圖與已下載的照片"""
+        # 移除重複的 URL（保留第一次出現的位置，維持各頁排序後的順序）
+        all_photo_urls = list(dict.fromkeys(all_photo_urls))
+        
+        # 過濾掉明顯的縮圖或無效連結
+        filtered_urls = []
+        for url in all_photo_urls:
+            if self._is_full_size_photo_url(url):
+                filtered_urls.append(url)
+        
+        log_message(f"總共處理 {page_count} 頁，成功取得 {len(filtered_urls)} 張照片連結")
+        
+        # 記錄完整的照片清單，供下次判斷相簿是否已完整下載
+        if album_url:
+            album_cache = get_album_cache()
+            album_cache.record(album_cache.album_id_from_url(album_url), filtered_urls, page_count)
+        
+        # 如果啟用重複過濾且提供了歷史管理器，進行批量重複檢測
+        if filter_duplicates and history_manager:
+            filtered_urls = self._filter_duplicate_photos(filtered_urls, history_manager)
+        
+        return filtered_urls
+    
     def _filter_duplicate_photos(self, photo_urls: List[str], history_manager) -> List[str]:
         """批量檢查並過濾重複照片"""
         try:
             log_message("正在進行批量重複檢測...")
             
-            filtered_urls = []
-            duplicate_count = 0
-            duplicate_info = {}
-            
-            for i, url in enumerate(photo_urls, 1):
-                # 檢查 URL 雜湊值重複（主要檢測機制）
-                url_hash = history_manager.get_url_hash_from_url(url)
-                if url_hash:
-                    is_duplicate, existing_files = history_manager.is_hash_downloaded(url_hash)
-                    if is_duplicate:
-                        duplicate_count += 1
-                        duplicate_info[url] = {
-                            "hash": url_hash[:8],
-                            "existing_file": existing_files[0]['filename'],
-                            "existing_path": existing_files[0]['filepath']
-                        }
-                        continue
-                
-                # 檢查是否有相同的 URL 已經在下載記錄中（不同檔名）
-                url_already_downloaded = False
-                for file_key, record in history_manager.history["downloads"].items():
-                    if record.get("url") == url:
-                        duplicate_count += 1
-                        duplicate_info[url] = f"URL已下載: {record.get('filename', 'unknown')}"
-                        url_already_downloaded = True
-                        break
-                
-                if url_already_downloaded:
-                    continue
-                
-                # 非重複的照片
-                filtered_urls.append(url)
+            # 以遠端物件索引（S3 物件名稱或正規化 URL）批次查詢，與歷史記錄數量無關
+            filtered_urls = history_manager.filter_known_urls(photo_urls)
             
             original_count = len(photo_urls)
             filtered_count = len(filtered_urls)
+            duplicate_count = original_count - filtered_count
             
             log_message(f"批量重複檢測完成:")
             log_message(f"  原始照片數: {original_count}")
@@ -589,57 +944,44 @@ class BrowserHandler:
         return True
     
     def _get_photos_from_current_page(self) -> List[str]:
-        """從當前頁面取得照片連結"""
-        photo_urls = []
-        
+        """從當前頁面取得照片連結（一次 execute_script 取回所有候選連結）"""
         try:
-            # 根據實際結構，尋找相簿詳細頁面中的照片連結
-            # 照片在 <a class="photo-gallery albumbgphoto" href="原圖URL"> 中
-            photo_links = self.driver.find_elements(By.CSS_SELECTOR, "a.photo-gallery.albumbgphoto")
-            
-            if photo_links:
-                log_message(f"找到 {len(photo_links)} 個photo-gallery連結")
-                for link in photo_links:
-                    href = link.get_attribute("href")
-                    if href and self._is_valid_photo_url(href):
-                        photo_urls.append(href)
-            
-            # 如果沒找到photo-gallery連結，嘗試其他選擇器
-            if not photo_urls:
-                log_message("未找到photo-gallery連結，嘗試其他方法...")
-                
-                # 嘗試找 albumbgphoto 連結
-                album_links = self.driver.find_elements(By.CSS_SELECTOR, "a.albumbgphoto")
-                for link in album_links:
-                    href = link.get_attribute("href")
-                    if href and self._is_valid_photo_url(href):
-                        photo_urls.append(href)
-                
-                # 如果還是沒找到，嘗試直接找圖片元素
-                if not photo_urls:
-                    log_message("嘗試直接搜尋圖片元素...")
-                    img_elements = self.driver.find_elements(By.CSS_SELECTOR, "img")
-                    
-                    for img in img_elements:
-                        # 取得圖片 URL
-                        src = img.get_attribute("src")
-                        data_src = img.get_attribute("data-src")
-                        
-                        # 優先使用 data-src，否則使用 src
-                        photo_url = data_src if data_src else src
-                        
-                        if photo_url and self._is_valid_photo_url(photo_url):
-                            # 如果是縮圖，嘗試轉換為原圖
-                            original_url = self._get_original_photo_url(photo_url)
-                            photo_urls.append(original_url)
-            
-            # 對照片URL進行自然排序，確保與網站顯示順序一致
-            photo_urls = self._sort_photo_urls(photo_urls)
-            
+            data = self.driver.execute_script(self.PHOTO_LINKS_SCRIPT)
+            links = PageLinks()
+            links.gallery_links = data["gallery"]
+            links.album_links = data["album"]
+            links.images = [tuple(image) for image in data["images"]]
+            return self._photo_urls_from_links(links)
+        
         except Exception as e:
             log_message(f"從當前頁面取得照片時發生錯誤: {e}", "WARNING")
+            return []
+    
+    def _photo_urls_from_links(self, links: PageLinks) -> List[str]:
+        """依優先順序從頁面連結中選出照片連結並排序"""
+        # 根據實際結構，相簿詳細頁面中的照片在 <a class="photo-gallery albumbgphoto" href="原圖URL"> 中
+        photo_urls = []
+        if links.gallery_links:
+            log_message(f"找到 {len(links.gallery_links)} 個photo-gallery連結")
+            photo_urls = [href for href in links.gallery_links if self._is_valid_photo_url(href)]
+        
+        # 如果沒找到photo-gallery連結，嘗試其他選擇器
+        if not photo_urls:
+            log_message("未找到photo-gallery連結，嘗試其他方法...")
+            photo_urls = [href for href in links.album_links if self._is_valid_photo_url(href)]
+        
+        # 如果還是沒找到，嘗試直接找圖片元素
+        if not photo_urls:
+            log_message("嘗試直接搜尋圖片元素...")
+            for src, data_src in links.images:
+                # 優先使用 data-src，否則使用 src
+                photo_url = data_src if data_src else src
+                if photo_url and self._is_valid_photo_url(photo_url):
+                    # 如果是縮圖，嘗試轉換為原圖
+                    photo_urls.append(self._get_original_photo_url(photo_url))
         
-        return photo_urls
+        # 對照片URL進行自然排序，確保與網站顯示順序一致
+        return self._sort_photo_urls(photo_urls)
     
     def _load_next_page(self) -> bool:
         """載入下一頁或更多照片"""
@@ -655,11 +997,11 @@ class BrowserHandler:
                     next_page_url = current_url.replace(f"pageIndex={current_page}", f"pageIndex={current_page + 1}")
                     
                     log_message(f"嘗試訪問下一頁URL: pageIndex={current_page + 1}")
-                    self.driver.get(next_page_url)
-                    time.sleep(2)
+                    self._get_page(next_page_url)
+                    self._wait_for_page(self.PHOTO_LINK_SELECTOR, replaced_sleep=2)
                     
                     # 檢查新頁面是否有照片
-                    page_photos = self.driver.find_elements(By.CSS_SELECTOR, "a.photo-gallery.albumbgphoto")
+                    page_photos = self.driver.find_elements(By.CSS_SELECTOR, self.PHOTO_LINK_SELECTOR)
                     if page_photos:
                         log_message(f"成功載入第 {current_page + 1} 頁，找到 {len(page_photos)} 張照片")
                         return True
@@ -690,15 +1032,22 @@ class BrowserHandler:
                             # 檢查是否是下一頁連結
                             if href and ("pageindex=" in href.lower() or "page=" in href.lower()):
                                 log_message(f"找到分頁連結: {href}")
+                                previous_page = self.driver.find_element(By.TAG_NAME, "html")
                                 button.click()
-                                time.sleep(2)
+                                self._wait_for_page(self.PHOTO_LINK_SELECTOR, replaced_sleep=2,
+                                                    previous_page=previous_page)
                                 return True
                             
                             # 檢查是否是載入更多按鈕
                             if any(keyword in text for keyword in ["more", "更多", "next", "下一"]):
                                 log_message(f"找到載入更多按鈕: {text}")
+                                photo_count = len(self.driver.find_elements(By.CSS_SELECTOR, self.PHOTO_LINK_SELECTOR))
                                 button.click()
-                                time.sleep(2)
+                                # 載入更多不會換頁，等到照片數量增加為止
+                                self._wait_for_condition(
+                                    lambda driver: len(driver.find_elements(By.CSS_SELECTOR, self.PHOTO_LINK_SELECTOR)) > photo_count,
+                                    replaced_sleep=2
+                                )
                                 return True
                 except (NoSuchElementException, Exception):
                     continue
@@ -721,41 +1070,49 @@ class BrowserHandler:
                     current_page = int(match.group(1))
                     next_page_url = current_url.replace(f"pageIndex={current_page}", f"pageIndex={current_page + 1}")
                     
-                    self.driver.get(next_page_url)
-                    time.sleep(1)
+                    self._get_page(next_page_url)
+                    self._wait_for_page(self.PHOTO_LINK_SELECTOR, replaced_sleep=1)
                     
                     # 快速檢查是否有照片
-                    page_photos = self.driver.find_elements(By.CSS_SELECTOR, "a.photo-gallery.albumbgphoto")
+                    page_photos = self.driver.find_elements(By.CSS_SELECTOR, self.PHOTO_LINK_SELECTOR)
                     return len(page_photos) > 0
             
             return False
         except Exception:
             return False
     
+    def _next_page_url(self, current_url: str) -> Optional[Tuple[str, int]]:
+        """依網址中的pageIndex參數計算下一頁網址
+        
+        Returns:
+            Tuple: (下一頁網址, 下一頁頁碼)；網址中沒有pageIndex參數時回傳 None
+        """
+        match = re.search(r'pageIndex=(\d+)', current_url)
+        if not match:
+            return None
+        current_page = int(match.group(1))
+        next_page_url = current_url.replace(f"pageIndex={current_page}", f"pageIndex={current_page + 1}")
+        return next_page_url, current_page + 1
+    
     def _go_to_next_page_by_url(self) -> bool:
         """透過修改URL參數前往下一頁（最安全的方式）"""
         try:
-            current_url = self.driver.current_url
+            next_page = self._next_page_url(self.driver.current_url)
             
-            if "pageIndex=" in current_url:
-                import re
-                match = re.search(r'pageIndex=(\d+)', current_url)
-                if match:
-                    current_page = int(match.group(1))
-                    next_page_url = current_url.replace(f"pageIndex={current_page}", f"pageIndex={current_page + 1}")
-                    
-                    log_message(f"嘗試前往第 {current_page + 1} 頁")
-                    self.driver.get(next_page_url)
-                    time.sleep(2)
-                    
-                    # 檢查新頁面是否有照片
-                    page_photos = self.driver.find_elements(By.CSS_SELECTOR, "a.photo-gallery.albumbgphoto")
-                    if page_photos:
-                        log_message(f"成功載入第 {current_page + 1} 頁，找到 {len(page_photos)} 張照片")
-                        return True
-                    else:
-                        log_message(f"第 {current_page + 1} 頁沒有照片")
-                        return False
+            if next_page:
+                next_page_url, next_page_number = next_page
+                log_message(f"嘗試前往第 {next_page_number} 頁")
+                self._get_page(next_page_url)
+                self._wait_for_page(self.PHOTO_LINK_SELECTOR, replaced_sleep=2)
+                
+                # 檢查新頁面是否有照片
+                page_photos = self.driver.find_elements(By.CSS_SELECTOR, self.PHOTO_LINK_SELECTOR)
+                if page_photos:
+                    log_message(f"成功載入第 {next_page_number} 頁，找到 {len(page_photos)} 張照片")
+                    return True
+                else:
+                    log_message(f"第 {next_page_number} 頁沒有照片")
+                    return False
             
             log_message("URL中沒有pageIndex參數，無法進行分頁")
             return False
@@ -958,8 +1315,18 @@ class BrowserHandler:
     def close(self):
         """關閉瀏覽器"""
         if self.driver:
+            self.log_page_wait_summary()
             try:
+                # 以 debuggerAddress 連接的瀏覽器不屬於 chromedriver，quit 只會中斷連線
                 self.driver.quit()
-                log_message("瀏覽器已關閉")
+                if self.attached:
+                    touch_lease()
+                    log_message("已中斷與常駐瀏覽器的連線")
+                else:
+                    log_message("瀏覽器已關閉")
             except Exception as e:
-                log_message(f"關閉瀏覽器時發生錯誤: {e}", "WARNING")
\ No newline at end of file
+                log_message(f"關閉瀏覽器時發生錯誤: {e}", "WARNING")
+            self.driver = None
+            self.attached = False
+        release_lock(self.daemon_lock)
+        self.daemon_lock = None
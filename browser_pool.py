@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+瀏覽器池模組
+
+維持多個已登入的 BrowserHandler（或 HttpScraper），讓多個相簿的照片清單可以
+同時擷取。每次取用前會檢查瀏覽器是否仍可操作，當掉的瀏覽器會關閉並換成
+新登入的實例；新實例會沿用登入狀態快取，不必每個都重新輸入帳號密碼。
+"""
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Callable, Optional
+from utils import log_message
+from browser_handler import BrowserHandler
+
+class BrowserPool:
+    """已登入瀏覽器的集合，介面與 BrowserHandler.get_album_photos 相同"""
+    
+    def __init__(self, size: int, handler_factory: Callable[[], BrowserHandler] = BrowserHandler,
+                 primary: Optional[BrowserHandler] = None):
+        """
+        Args:
+            size: 瀏覽器數量
+            handler_factory: 建立新瀏覽器實例的函數
+            primary: 已登入的瀏覽器，會直接加入池中
+        """
+        self.size = max(1, size)
+        self.handler_factory = handler_factory
+        self.primary = primary
+        self.handlers: List[BrowserHandler] = []
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+    
+    def start(self) -> bool:
+        """啟動並登入所有瀏覽器（同時進行）
+        
+        Returns:
+            bool: 至少有一個瀏覽器可用
+        """
+        if self.primary:
+            self._add(self.primary)
+        
+        missing = self.size - len(self.handlers)
+        if missing > 0:
+            log_message(f"正在啟動 {missing} 個額外的瀏覽器...")
+            with ThreadPoolExecutor(max_workers=missing) as executor:
+                for handler in executor.map(lambda _: self._create_handler(), range(missing)):
+                    if handler:
+                        self._add(handler)
+        
+        if not self.handlers:
+            log_message("瀏覽器池中沒有可用的瀏覽器", "ERROR")
+            return False
+        
+        self.size = len(self.handlers)
+        log_message(f"瀏覽器池已就緒，共 {self.size} 個瀏覽器")
+        return True
+    
+    def _add(self, handler: BrowserHandler):
+        """將瀏覽器加入池中"""
+        with self._lock:
+            self.handlers.append(handler)
+        self._idle.put(handler)
+    
+    def _create_handler(self) -> Optional[BrowserHandler]:
+        """建立並登入一個新的瀏覽器"""
+        handler = self.handler_factory()
+        try:
+            if handler.init_browser() and handler.login():
+                return handler
+        except Exception as e:
+            log_message(f"啟動瀏覽器失敗: {e}", "WARNING")
+        handler.close()
+        return None
+    
+    def _recycle(self, handler: BrowserHandler) -> Optional[BrowserHandler]:
+        """關閉失效的瀏覽器並換成新的實例"""
+        log_message("瀏覽器已失效，重新啟動...", "WARNING")
+        with self._lock:
+            self.handlers.remove(handler)
+        try:
+            handler.close()
+        except Exception:
+            pass
+        
+        replacement = self._create_handler()
+        if replacement:
+            with self._lock:
+                self.handlers.append(replacement)
+        return replacement
+    
+    def get_album_photos(self, album_url: str, history_manager=None, filter_duplicates: bool = True) -> List[str]:
+        """借用一個瀏覽器取得相簿照片；瀏覽器在過程中失效時換新並重試一次"""
+        handler = None
+        while handler is None:
+            if not self.handlers:
+                log_message("瀏覽器池中已沒有可用的瀏覽器", "ERROR")
+                return []
+            try:
+                handler = self._idle.get(timeout=1)
+            except queue.Empty:
+                continue
+        
+        try:
+            for _ in range(2):
+                if not handler.is_alive():
+                    handler = self._recycle(handler)
+                    if handler is None:
+                        return []
+                
+                photos = handler.get_album_photos(album_url, history_manager, filter_duplicates)
+                if photos or handler.is_alive():
+                    return photos
+            return []
+        finally:
+            if handler is not None:
+                self._idle.put(handler)
+            else:
+                # 無法補回瀏覽器，池的容量減少
+                with self._lock:
+                    self.size = max(1, len(self.handlers))
+    
+    def close(self):
+        """關閉池中所有瀏覽器"""
+        with self._lock:
+            handlers, self.handlers = self.handlers, []
+        for handler in handlers:
+            handler.close()
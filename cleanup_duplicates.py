@@ -190,16 +190,12 @@ def cleanup_duplicates(history_manager):
     if removed_records:
         log_message(f"從歷史記錄中移除 {len(removed_records)} 個條目...")
         
+        # 逐筆移除並同步更新索引，不必重建整個索引
         for file_key in removed_records:
-            if file_key in history_manager.history["downloads"]:
-                del history_manager.history["downloads"][file_key]
+            history_manager.remove_download_record(file_key)
         
-        # 重建雜湊值索引
-        log_message("重建雜湊值索引...")
-        history_manager._build_hash_index()
-        
-        # 儲存更新後的歷史記錄
-        history_manager.save_history()
+        # 儲存更新後的歷史記錄（寫成新的快照）
+        history_manager.compact()
     
     print(f"\n" + "=" * 80)
     print("清理完成統計:")
@@ -222,7 +218,8 @@ def main():
     args = parser.parse_args()
     
     # 檢查下載歷史檔案
-    if not os.path.exists(Config.DOWNLOAD_HISTORY_FILE):
+    if (not os.path.exists(Config.DOWNLOAD_HISTORY_FILE)
+            and not os.path.exists(f"{Config.DOWNLOAD_HISTORY_FILE}.journal")):
         print(f"錯誤: 找不到下載歷史檔案 {Config.DOWNLOAD_HISTORY_FILE}")
         sys.exit(1)
     
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+下載暫存模組
+
+照片下載時先寫入記憶體緩衝區並同時計算雜湊值，等驗證與重複檢查通過後
+才寫入下載目錄，讓重複的照片完全不需要寫入硬碟。
+
+未完成的下載存放在相簿資料夾的 `.partial/<物件名稱>.part`，並以同名的 `.part.json`
+記錄來源網址與 ETag。暫存檔以照片的 S3 物件名稱（取不到時為網址的雜湊值）命名，
+與照片的流水號檔名無關：下次執行重新編號、或網址簽章改變時仍能找到同一張照片的
+暫存檔。超過記憶體上限的大檔案下載時就轉存到暫存檔；一般照片則在下載中斷
+（重試失敗或程式被中止）時才把已收到的內容寫入暫存檔。下次下載時以 HTTP Range
+請求從中斷處續傳，完成後以 rename 原子性地移到最終路徑，不會留下不完整的照片。
+"""
+
+import io
+import os
+import re
+import json
+import hashlib
+from typing import BinaryIO, Dict, Mapping
+from config import Config
+from utils import log_message, DownloadHistoryManager
+
+PARTIAL_DIR = ".partial"
+
+def partial_path(filepath: str, url: str) -> str:
+    """照片的續傳暫存檔路徑（相簿資料夾中的 .partial/<物件名稱>.part）"""
+    key = DownloadHistoryManager.get_url_hash_from_url(url)
+    if not key:
+        key = hashlib.sha1(DownloadHistoryManager.normalize_url(url).encode("utf-8")).hexdigest()
+    return os.path.join(os.path.dirname(filepath), PARTIAL_DIR, f"{key}.part")
+
+class IncompleteDownloadError(Exception):
+    """接收到的資料少於伺服器宣告的大小"""
+
+class StagedDownload:
+    """暫存中的單張照片下載"""
+    
+    def __init__(self, filepath: str, url: str):
+        self.filepath = filepath
+        self.url = url
+        self.part_path = partial_path(filepath, url)
+        self.meta_path = f"{self.part_path}.json"
+        self.max_memory = getattr(Config, 'SPOOL_MAX_MEMORY', 16 * 1024 * 1024)
+        
+        self.buffer = io.BytesIO()
+        self.part_file = None
+        self.hasher = hashlib.md5()
+        self.size = 0
+        self.etag = None
+        self.total_size = None
+        
+        self._load_partial()
+    
+    def _load_partial(self):
+        """載入上次中斷時留下的 .part 檔案"""
+        if not os.path.exists(self.part_path):
+            return
+        
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except Exception:
+            meta = {}
+        
+        # 網址中的簽章每次都不同，以正規化後的網址比對
+        if DownloadHistoryManager.normalize_url(meta.get("url") or "") != DownloadHistoryManager.normalize_url(self.url):
+            # 不是同一張照片留下的暫存檔
+            self._remove_partial()
+            return
+        
+        self.part_file = open(self.part_path, 'r+b')
+        for chunk in iter(lambda: self.part_file.read(1024 * 1024), b""):
+            self.hasher.update(chunk)
+            self.size += len(chunk)
+        self.etag = meta.get("etag")
+        self.total_size = meta.get("total_size")
+        log_message(f"找到未完成的下載，將從 {self.size} bytes 續傳: {os.path.basename(self.filepath)}")
+    
+    def _write_meta(self):
+        """記錄續傳所需的驗證資訊"""
+        with open(self.meta_path, 'w', encoding='utf-8') as f:
+            json.dump({"url": self.url, "etag": self.etag, "total_size": self.total_size}, f)
+    
+    def _open_part_file(self):
+        """把記憶體中的內容轉存到暫存檔，之後的資料直接寫入檔案"""
+        os.makedirs(os.path.dirname(self.part_path), exist_ok=True)
+        self.part_file = open(self.part_path, 'w+b')
+        self.part_file.write(self.buffer.getbuffer())
+        self.buffer = io.BytesIO()
+        self._write_meta()
+    
+    def _remove_partial(self):
+        """刪除 .part 檔案與其記錄"""
+        for path in (self.part_path, self.meta_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self._remove_partial_dir()
+    
+    def _remove_partial_dir(self):
+        """相簿中已沒有未完成的下載時移除 .partial 資料夾"""
+        try:
+            os.rmdir(os.path.dirname(self.part_path))
+        except OSError:
+            pass
+    
+    def range_headers(self) -> Dict[str, str]:
+        """取得續傳用的請求標頭"""
+        if not self.size:
+            return {}
+        headers = {"Range": f"bytes={self.size}-"}
+        if self.etag:
+            headers["If-Range"] = self.etag
+        return headers
+    
+    def begin_response(self, status_code: int, headers: Mapping[str, str]) -> bool:
+        """依回應決定續傳或重新開始
+        
+        Returns:
+            bool: 回應內容可以直接接在目前資料之後；False 表示已清除暫存，需重新請求
+        """
+        etag = headers.get("etag")
+        
+        if status_code == 206 and self.size:
+            match = re.match(r"bytes (\d+)-\d+/(\d+)", headers.get("content-range", ""))
+            if (match and int(match.group(1)) == self.size
+                    and (not self.etag or etag == self.etag)
+                    and (self.total_size is None or int(match.group(2)) == self.total_size)):
+                self.total_size = int(match.group(2))
+                return True
+            log_message(f"續傳驗證失敗，重新下載: {os.path.basename(self.filepath)}", "WARNING")
+            self.reset()
+            return False
+        
+        # 完整回應（包含伺服器忽略 Range 的情況）
+        if self.size:
+            self.reset()
+        self.etag = etag
+        content_length = headers.get("content-length")
+        self.total_size = int(content_length) if content_length else None
+        return True
+    
+    def reset(self):
+        """清除已接收的內容"""
+        if self.part_file:
+            self.part_file.close()
+            self.part_file = None
+        self._remove_partial()
+        self.buffer = io.BytesIO()
+        self.hasher = hashlib.md5()
+        self.size = 0
+        self.etag = None
+        self.total_size = None
+    
+    def write(self, chunk: bytes):
+        """寫入一段資料並更新雜湊值，超過記憶體上限時轉存到 .part 檔案"""
+        if self.part_file:
+            self.part_file.write(chunk)
+        else:
+            self.buffer.write(chunk)
+            if self.buffer.tell() > self.max_memory:
+                self._open_part_file()
+        self.hasher.update(chunk)
+        self.size += len(chunk)
+    
+    @property
+    def is_complete(self) -> bool:
+        """是否已收到伺服器宣告的完整內容"""
+        return bool(self.size) and self.size == self.total_size
+    
+    def ensure_complete(self):
+        """確認已收到伺服器宣告的完整內容"""
+        if self.total_size is not None and self.size != self.total_size:
+            raise IncompleteDownloadError(f"只收到 {self.size}/{self.total_size} bytes")
+    
+    @property
+    def file_hash(self) -> str:
+        """目前已接收內容的 MD5 雜湊值"""
+        return self.hasher.hexdigest()
+    
+    def reader(self) -> BinaryIO:
+        """取得從頭讀取的暫存內容"""
+        source = self.part_file or self.buffer
+        source.flush()
+        source.seek(0)
+        return source
+    
+    def commit(self):
+        """將暫存內容原子性地移到最終路徑"""
+        if not self.part_file:
+            # 記憶體中的內容直接寫到最終路徑旁的暫存檔再 rename，不經過 .partial
+            temp_path = f"{self.filepath}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(self.buffer.getbuffer())
+            os.replace(temp_path, self.filepath)
+        else:
+            self.part_file.close()
+            self.part_file = None
+            os.replace(self.part_path, self.filepath)
+        self._remove_partial()
+        self.buffer = io.BytesIO()
+    
+    def discard(self):
+        """捨棄暫存內容（重複或無效的照片）"""
+        self.reset()
+    
+    def close(self):
+        """釋放記憶體；未完成的內容寫入暫存檔保留供下次續傳
+        
+        commit 或 discard 之後記憶體中已沒有資料，不會留下暫存檔。
+        """
+        if not self.part_file and self.buffer.getbuffer().nbytes:
+            try:
+                self._open_part_file()
+            except OSError as e:
+                log_message(f"無法保留未完成的下載: {e}", "WARNING")
+        if self.part_file:
+            self.part_file.close()
+            self.part_file = None
+        self.buffer = io.BytesIO()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -1,7 +1,14 @@
 import os
 import time
+import queue
+import threading
 import requests
-from typing import List, Dict, Any, Optional, Tuple
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeoutError
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse
+from typing import List, Dict, Any, Optional, Tuple, Union, BinaryIO
 from datetime import datetime
 from tqdm import tqdm
 from PIL import Image
@@ -17,22 +24,45 @@ from utils import (
     calculate_download_speed
 )
 from browser_handler import BrowserHandler
+from http_scraper import HttpScraper, HybridScraper
+from browser_pool import BrowserPool
 from sleep_preventer import SleepPreventer
+from async_downloader import AsyncDownloadEngine, ASYNC_ENGINE_AVAILABLE
+from download_stage import StagedDownload, IncompleteDownloadError
+from rate_limiter import AdaptiveRateLimiter, get_rate_limiter
+from scrape_cache import get_album_cache
+from run_checkpoint import RunCheckpoint
 
 class PhotoDownloader:
     """照片下載器"""
     
-    def __init__(self):
+    def __init__(self, max_workers: Optional[int] = None, engine: Optional[str] = None):
         self.session = None
+        # 同時下載數與每個主機的同時連線上限（未設定時不另外限制）
+        self.max_workers = max(1, max_workers or getattr(Config, 'DOWNLOAD_WORKERS', 4))
+        self.max_per_host = max(1, getattr(Config, 'MAX_CONNECTIONS_PER_HOST', None) or self.max_workers)
+        self.engine = engine or getattr(Config, 'DOWNLOAD_ENGINE', 'threaded')
+        if self.engine == "async" and not ASYNC_ENGINE_AVAILABLE:
+            log_message("未安裝 aiohttp，改用多執行緒下載引擎", "WARNING")
+            self.engine = "threaded"
+        # 非同步引擎的事件迴圈與連線池在整個執行期間共用
+        self.async_engine: Optional[AsyncDownloadEngine] = None
+        self._host_semaphores = {}
+        self._host_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
         self.history_manager = DownloadHistoryManager(Config.DOWNLOAD_HISTORY_FILE)
+        self.album_cache = get_album_cache()
+        self.checkpoint: Optional[RunCheckpoint] = None
         self.folder_manager = FolderManager(Config.BASE_DOWNLOAD_PATH)
         self.download_stats = {
             "total_albums": 0,
             "processed_albums": 0,
+            "failed_albums": 0,
             "total_photos": 0,
             "downloaded_photos": 0,
             "skipped_photos": 0,
             "failed_photos": 0,
+            "duplicate_photos": 0,
             "total_size": 0,
             "start_time": None,
             "end_time": None
@@ -50,10 +80,33 @@ class PhotoDownloader:
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
         })
+        
+        # 連線池大小需配合執行緒數，否則多出的連線會被丟棄而無法重用
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+    
+    def _get_host_semaphore(self, url: str) -> threading.BoundedSemaphore:
+        """取得指定主機的並行連線限制"""
+        host = urlparse(url).netloc
+        with self._host_lock:
+            if host not in self._host_semaphores:
+                self._host_semaphores[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._host_semaphores[host]
+    
+    def _add_stat(self, key: str, value: int = 1):
+        """執行緒安全地累加下載統計"""
+        with self._stats_lock:
+            self.download_stats[key] += value
     
     def download_albums(self, albums_data: Dict[str, List[Dict[str, Any]]], 
-                       browser: BrowserHandler, dry_run: bool = False) -> bool:
-        """下載相簿"""
+                       browser: BrowserHandler, dry_run: bool = False,
+                       run_signature: Optional[str] = None) -> bool:
+        """下載相簿
+        
+        提供 run_signature 時會定期寫入執行進度檢查點，以相同參數重新執行時
+        略過上次已完成的相簿。
+        """
         try:
             # 記錄開始時間
             self.download_stats["start_time"] = datetime.now()
@@ -78,30 +131,61 @@ class PhotoDownloader:
             # 確保目錄存在
             Config.ensure_directories()
             
-            # 使用相簿進度條
-            current_album_index = 0
+            # 攤平成依序處理的相簿清單
+            album_jobs = [
+                (album_type, album)
+                for album_type, albums in albums_data.items()
+                for album in albums
+            ]
+            
+            # 從上次中斷的地方繼續
+            if run_signature and not dry_run and getattr(Config, 'CHECKPOINT_ENABLED', True):
+                self.checkpoint = RunCheckpoint(run_signature)
+                remaining_jobs = [job for job in album_jobs if not self.checkpoint.is_completed(job[1])]
+                if len(remaining_jobs) < len(album_jobs):
+                    log_message(f"從上次中斷處繼續：略過 {len(album_jobs) - len(remaining_jobs)} 個已完成的相簿")
+                    album_jobs = remaining_jobs
+                    total_albums = len(album_jobs)
+            
+            # 瀏覽器在背景先取得下一個相簿的照片清單，同時下載目前的相簿
+            queue_size = max(1, getattr(Config, 'PIPELINE_QUEUE_SIZE', 2))
+            album_queue = queue.Queue(maxsize=queue_size)
+            stop_event = threading.Event()
+            scraper = threading.Thread(
+                target=self._scrape_album_photos,
+                args=(album_jobs, browser, album_queue, stop_event),
+                name="album-scraper",
+                daemon=True
+            )
+            scraper.start()
             
-            # 處理每種類型的相簿
-            for album_type, albums in albums_data.items():
-                if not albums:
-                    continue
-                
-                log_message(f"正在處理{album_type}...")
-                
-                for album in albums:
-                    current_album_index += 1
+            current_album_type = None
+            try:
+                for current_album_index in range(1, total_albums + 1):
+                    album_type, album, photos, scraped_at = self._next_scraped_album(album_queue, scraper)
+                    
+                    if album_type != current_album_type:
+                        log_message(f"正在處理{album_type}...")
+                        current_album_type = album_type
+                    
                     log_message(f"[{current_album_index}/{total_albums}] 正在處理相簿: {album['title']}")
                     
-                    success = self._download_single_album(album, album_type, browser, current_album_index, total_albums)
-                    self.download_stats["processed_albums"] += 1
+                    success = self._download_single_album(album, album_type, photos, current_album_index, total_albums,
+                                                          scraped_at)
+                    self._add_stat("processed_albums")
                     
                     if success:
                         log_message(f"✓ [{current_album_index}/{total_albums}] {album['title']} 下載完成")
                     else:
+                        self._add_stat("failed_albums")
                         log_message(f"✗ [{current_album_index}/{total_albums}] {album['title']} 下載失敗", "WARNING")
-                    
-                    # 相簿間暫停
-                    time.sleep(0.5)
+            finally:
+                # 通知擷取執行緒停止；正在擷取的相簿不必等它完成，關閉瀏覽器後擷取就會中止
+                stop_event.set()
+                scraper.join(timeout=getattr(Config, 'SCRAPER_STOP_TIMEOUT', 5))
+                self.album_cache.save()
+                # 中斷時保留目前的進度
+                self._save_checkpoint()
             
             # 記錄結束時間
             self.download_stats["end_time"] = datetime.now()
@@ -109,6 +193,11 @@ class PhotoDownloader:
             # 儲存下載歷史
             self.history_manager.save_history()
             
+            # 全部相簿都已處理，不需要再從中斷處繼續
+            if self.checkpoint:
+                self.checkpoint.clear()
+                self.checkpoint = None
+            
             # 顯示統計資訊
             self._show_download_summary()
             
@@ -149,8 +238,6 @@ class PhotoDownloader:
                     print(f"儲存路徑: {folder_path}")
                 
                 print("-" * 50)
-                
-                time.sleep(0.2)  # 避免過於頻繁的請求
         
         print(f"\n總計: {len(albums_data.get('校園相簿', []))} 個校園相簿, "
               f"{len(albums_data.get('班級相簿', []))} 個班級相簿")
@@ -158,19 +245,105 @@ class PhotoDownloader:
         
         return True
     
-    def _download_single_album(self, album: Dict[str, Any], album_type: str, 
-                              browser: BrowserHandler, current_index: int = 0, total_albums: int = 0) -> bool:
-        """下載單個相簿"""
+    def _next_scraped_album(self, album_queue: queue.Queue, scraper: threading.Thread) -> Tuple:
+        """從佇列取得下一個相簿的照片清單
+        
+        每隔一段時間確認擷取執行緒仍在執行，執行緒意外結束時不會一直等待；
+        等待期間也能立即回應 Ctrl-C。
+        """
+        while True:
+            try:
+                return album_queue.get(timeout=0.5)
+            except queue.Empty:
+                if scraper.is_alive():
+                    continue
+            # 執行緒結束前放入的項目可能在逾時之後才被看到
+            try:
+                return album_queue.get_nowait()
+            except queue.Empty:
+                raise RuntimeError("相簿擷取執行緒意外結束")
+    
+    def _scrape_album_photos(self, album_jobs: List[Tuple[str, Dict[str, Any]]], browser: BrowserHandler,
+                             album_queue: queue.Queue, stop_event: threading.Event):
+        """背景執行緒：取得各相簿的照片清單並依相簿順序放入佇列
+        
+        browser 為 BrowserPool 時會同時擷取多個相簿（最多 browser.size 個），
+        但仍按原本的相簿順序交給下載端。佇列有上限，下載端跟不上時會在此等待，
+        避免瀏覽器無限制地超前。每個相簿之間都會檢查 stop_event，下載端停止後
+        不再開始新的擷取，也不等待擷取中的相簿。
+        """
+        def scrape(album: Dict[str, Any]) -> Tuple[List[str], Optional[float]]:
+            """回傳照片清單與開始擷取的時間（略過擷取時為 None）"""
+            if stop_event.is_set():
+                return [], None
+            if self.album_cache.can_skip(album):
+                log_message(f"相簿照片先前已全部下載，略過擷取: {album['title']}")
+                return [], None
+            scraped_at = time.time()
+            try:
+                # 取得照片列表（包含預先過濾重複）
+                return browser.get_album_photos(album['link'], self.history_manager, filter_duplicates=True), scraped_at
+            except Exception as e:
+                log_message(f"取得相簿照片失敗: {album['title']}: {e}", "ERROR")
+                return [], None
+        
+        concurrency = max(1, getattr(browser, 'size', 1))
+        jobs = iter(album_jobs)
+        pending = deque()
+        
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="album-scraper")
+        try:
+            for album_type, album in islice(jobs, concurrency):
+                pending.append((album_type, album, executor.submit(scrape, album)))
+            
+            while pending and not stop_event.is_set():
+                album_type, album, future = pending.popleft()
+                while True:
+                    try:
+                        photos, scraped_at = future.result(timeout=0.5)
+                        break
+                    except FutureTimeoutError:
+                        if stop_event.is_set():
+                            return
+                
+                while not stop_event.is_set():
+                    try:
+                        album_queue.put((album_type, album, photos, scraped_at), timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+                
+                # 交出一個相簿後才開始擷取下一個，超前的數量維持在瀏覽器數量以內
+                for album_type, album in islice(jobs, 1):
+                    pending.append((album_type, album, executor.submit(scrape, album)))
+        except Exception as e:
+            # 執行緒結束後下載端會發現並停止等待
+            log_message(f"擷取相簿照片清單時發生錯誤: {e}", "ERROR")
+        finally:
+            # 停止時取消尚未開始的擷取，不等待擷取中的相簿
+            executor.shutdown(wait=not stop_event.is_set(), cancel_futures=True)
+    
+    def _download_single_album(self, album: Dict[str, Any], album_type: str, photos: List[str],
+                              current_index: int = 0, total_albums: int = 0,
+                              scraped_at: Optional[float] = None) -> bool:
+        """下載單個相簿（照片清單已由背景執行緒取得）
+        
+        scraped_at 為本次擷取照片清單的時間；相簿中的照片全部下載成功
+        （或確認為重複內容）時，會在相簿快取中標示為已完成。
+        """
         try:
             log_message(f"正在處理相簿: {album['title']}")
             
-            # 取得照片列表（包含預先過濾重複）
-            photos = browser.get_album_photos(album['link'], self.history_manager, filter_duplicates=True)
             if not photos:
                 log_message("相簿中沒有找到照片或所有照片都已存在", "WARNING")
+                # 擷取失敗或頁面沒有照片也會得到空清單；只有本次確實擷取到照片（全部已下載過）
+                # 或因已完成而略過擷取的相簿才算完成
+                if ((scraped_at is not None and self.album_cache.has_scraped_photos(album.get('album_id'), scraped_at))
+                        or self.album_cache.can_skip(album)):
+                    self._complete_album(album, scraped_at)
                 return True
             
-            self.download_stats["total_photos"] += len(photos)
+            self._add_stat("total_photos", len(photos))
             
             # 建立資料夾
             if not album['date']:
@@ -197,10 +370,13 @@ class PhotoDownloader:
             # 新照片從最大編號+1開始
             start_number = max(existing_files, default=0) + 1
             
-            # 下載照片
-            success_count = 0
+            # 下載照片（相簿依序處理，統計差值即為本相簿的結果）
+            failed_before = self.download_stats["failed_photos"]
+            duplicates_before = self.download_stats["duplicate_photos"]
             progress_desc = f"[{current_index}/{total_albums}] {album['title'][:20]}..." if total_albums > 0 else f"下載 {album['title'][:20]}..."
             with tqdm(total=len(photos), desc=progress_desc) as pbar:
+                # 先依照片順序決定檔名，確保並行下載時編號仍然固定
+                tasks = []
                 for i, photo_url in enumerate(photos):
                     extension = FileUtils.get_file_extension_from_url(photo_url)
                     filename = f"{album_date}_{start_number + i:03d}{extension}"
@@ -209,116 +385,228 @@ class PhotoDownloader:
                     # 簡單檢查檔案是否已存在（檔案系統層級）
                     if os.path.exists(filepath):
                         pbar.set_description(f"跳過已存在: {filename}")
-                        self.download_stats["skipped_photos"] += 1
+                        self._add_stat("skipped_photos")
                         pbar.update(1)
                         continue
                     
                     # 最後檢查 URL+檔名組合（防止極端情況）
                     if self.history_manager.is_downloaded(photo_url, filename):
                         pbar.set_description(f"跳過已下載: {filename}")
-                        self.download_stats["skipped_photos"] += 1
+                        self._add_stat("skipped_photos")
                         pbar.update(1)
                         continue
                     
-                    # 下載照片
-                    success = self._download_photo(photo_url, filepath, filename)
-                    if success:
-                        success_count += 1
-                        self.download_stats["downloaded_photos"] += 1
-                    else:
-                        self.download_stats["failed_photos"] += 1
-                    
-                    pbar.set_description(f"正在下載: {filename}")
-                    pbar.update(1)
-                    
-                    # 下載間隔
-                    time.sleep(Config.DOWNLOAD_DELAY)
+                    tasks.append((photo_url, filepath, filename))
+                
+                success_count = self._download_photos_concurrently(tasks, pbar)
             
             log_message(f"相簿下載完成: {success_count}/{len(photos)} 張照片成功")
+            
+            failures = ((self.download_stats["failed_photos"] - failed_before)
+                        - (self.download_stats["duplicate_photos"] - duplicates_before))
+            if failures == 0:
+                self._complete_album(album, scraped_at)
+            
             return success_count > 0
             
         except Exception as e:
             log_message(f"下載相簿失敗: {e}", "ERROR")
             return False
     
+    def _download_photos_concurrently(self, tasks: List[Tuple[str, str, str]], pbar: tqdm) -> int:
+        """以選定的下載引擎並行下載照片，回傳成功張數
+        
+        進度條與統計只在主執行緒依完成順序更新。
+        """
+        success_count = 0
+        if not tasks:
+            return success_count
+        
+        if self.engine == "async":
+            if self.async_engine is None:
+                self.async_engine = AsyncDownloadEngine(self)
+            return self.async_engine.download(tasks, pbar)
+        
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(tasks))) as executor:
+            futures = {
+                executor.submit(self._download_photo_limited, url, filepath, filename): filename
+                for url, filepath, filename in tasks
+            }
+            
+            for future in as_completed(futures):
+                filename = futures[future]
+                try:
+                    success = future.result()
+                except Exception as e:
+                    log_message(f"下載執行緒發生錯誤 {filename}: {e}", "ERROR")
+                    success = False
+                
+                if success:
+                    success_count += 1
+                self._record_photo_result(success, filename, pbar)
+        
+        return success_count
+    
+    def _record_photo_result(self, success: bool, filename: str, pbar: tqdm):
+        """更新單張照片完成後的統計與進度條"""
+        if success:
+            self._add_stat("downloaded_photos")
+        else:
+            self._add_stat("failed_photos")
+        
+        if self.checkpoint and self.checkpoint.photo_done():
+            self._save_checkpoint()
+        
+        pbar.set_description(f"已完成: {filename}")
+        pbar.update(1)
+    
+    def _complete_album(self, album: Dict[str, Any], scraped_at: Optional[float]):
+        """相簿的照片都已下載（或確認為重複）：更新相簿快取與執行進度"""
+        if scraped_at is not None:
+            self.album_cache.mark_completed(album.get('album_id'), scraped_at)
+        if self.checkpoint:
+            self.checkpoint.complete_album(album)
+            self._save_checkpoint()
+    
+    def _save_checkpoint(self):
+        """先同步下載歷史日誌再寫入檢查點，檢查點中的進度一定已經記錄在歷史中"""
+        if not self.checkpoint:
+            return
+        self.history_manager.save_history()
+        self.checkpoint.save()
+    
+    def _download_photo_limited(self, url: str, filepath: str, filename: str) -> bool:
+        """在主機並行上限內下載單張照片"""
+        with self._get_host_semaphore(url):
+            return self._download_photo(url, filepath, filename)
+    
     def _download_photo(self, url: str, filepath: str, filename: str) -> bool:
-        """下載單張照片"""
+        """下載單張照片（中斷時以 Range 請求續傳，請求速率由主機共用的限速器控制）"""
         retries = 0
+        limiter = get_rate_limiter(url)
         
-        while retries < Config.MAX_RETRIES:
-            try:
-                response = self.session.get(url, stream=True, timeout=30)
-                response.raise_for_status()
-                
-                # 檢查內容類型
-                content_type = response.headers.get('content-type', '')
-                if not content_type.startswith('image/'):
-                    log_message(f"URL 不是圖片: {url}", "WARNING")
-                    return False
-                
-                # 檢查檔案大小
-                content_length = response.headers.get('content-length')
-                if content_length:
-                    file_size = int(content_length)
-                    if file_size < 1024:  # 小於 1KB 可能是錯誤頁面
-                        log_message(f"檔案太小，可能是錯誤: {filename}", "WARNING")
+        with StagedDownload(filepath, url) as stage:
+            while retries < Config.MAX_RETRIES:
+                try:
+                    # 上次執行已完整下載但尚未移到最終路徑
+                    if stage.is_complete:
+                        return self._finalize_download(url, stage, filename)
+                    
+                    limiter.acquire()
+                    response = self.session.get(url, stream=True, timeout=30, headers=stage.range_headers())
+                    if AdaptiveRateLimiter.is_throttle_status(response.status_code):
+                        limiter.record_failure(
+                            AdaptiveRateLimiter.parse_retry_after(response.headers.get('retry-after'))
+                        )
+                    else:
+                        limiter.record_success(response.elapsed.total_seconds())
+                    
+                    if response.status_code == 416 and stage.size:
+                        # 續傳範圍無效，重新下載完整檔案
+                        response.close()
+                        stage.reset()
+                        continue
+                    response.raise_for_status()
+                    
+                    if not stage.begin_response(response.status_code, response.headers):
+                        response.close()
+                        continue
+                    
+                    if self._check_response_headers(
+                        url, filename,
+                        response.headers.get('content-type', ''),
+                        response.headers.get('content-length') if response.status_code == 200 else None
+                    ) is None:
+                        stage.discard()
                         return False
-                else:
-                    file_size = 0
-                
-                # 下載檔案
-                with open(filepath, 'wb') as f:
+                    
+                    # 下載到暫存區，同時計算雜湊值與實際大小
                     for chunk in response.iter_content(chunk_size=8192):
                         if chunk:
-                            f.write(chunk)
-                            if not file_size:
-                                file_size += len(chunk)
-                
-                # 驗證下載的圖片
-                if self._validate_image(filepath):
-                    # 計算檔案雜湊值，再次檢查是否重複
-                    file_hash = FileUtils.calculate_file_hash(filepath)
-                    if file_hash:
-                        is_duplicate, existing_files = self.history_manager.is_hash_downloaded(file_hash)
-                        if is_duplicate:
-                            # 下載後發現重複，刪除新下載的檔案
-                            os.remove(filepath)
-                            log_message(f"下載完成後發現重複內容，已刪除: {filename}")
-                            log_message(f"  重複檔案: {existing_files[0]['filepath']}")
-                            return False
+                            stage.write(chunk)
+                    stage.ensure_complete()
                     
-                    # 記錄下載歷史
-                    self.history_manager.add_download_record(
-                        url, filename, filepath, file_size
-                    )
-                    self.download_stats["total_size"] += file_size
-                    return True
-                else:
-                    # 刪除無效檔案
-                    if os.path.exists(filepath):
-                        os.remove(filepath)
-                    log_message(f"下載的檔案無效: {filename}", "WARNING")
-                    return False
+                    return self._finalize_download(url, stage, filename)
+                    
+                except (requests.exceptions.RequestException, IncompleteDownloadError) as e:
+                    retries += 1
+                    status_code = None
+                    if isinstance(e, requests.exceptions.HTTPError):
+                        status_code = e.response.status_code if e.response is not None else None
+                    else:
+                        # 連線中斷或逾時也視為伺服器壓力訊號
+                        limiter.record_failure()
+                    if status_code is not None and not AdaptiveRateLimiter.is_retryable_status(status_code):
+                        log_message(f"下載失敗（HTTP {status_code}），不再重試: {filename}", "ERROR")
+                        return False
+                    if retries < Config.MAX_RETRIES:
+                        log_message(f"下載失敗，重試 {retries}/{Config.MAX_RETRIES}: {e}", "WARNING")
+                        # 429 的等待時間由限速器（Retry-After 與降速）決定，其他錯誤以指數退避
+                        if status_code != 429:
+                            time.sleep(AdaptiveRateLimiter.retry_delay(retries))
+                    else:
+                        log_message(f"下載失敗，已達最大重試次數: {filename}", "ERROR")
+                        return False
                 
-            except requests.exceptions.RequestException as e:
-                retries += 1
-                if retries < Config.MAX_RETRIES:
-                    log_message(f"下載失敗，重試 {retries}/{Config.MAX_RETRIES}: {e}", "WARNING")
-                    time.sleep(2 ** retries)  # 指數退避
-                else:
-                    log_message(f"下載失敗，已達最大重試次數: {filename}", "ERROR")
+                except Exception as e:
+                    log_message(f"下載過程發生未預期錯誤: {e}", "ERROR")
                     return False
-            
-            except Exception as e:
-                log_message(f"下載過程發生未預期錯誤: {e}", "ERROR")
-                return False
         
         return False
     
-    def _validate_image(self, filepath: str) -> bool:
-        """驗證圖片檔案"""
+    def _check_response_headers(self, url: str, filename: str, content_type: str,
+                                content_length: Optional[str]) -> Optional[int]:
+        """檢查回應標頭，回傳預期檔案大小（未知時為 0），不符合時回傳 None"""
+        # 檢查內容類型
+        if not content_type.startswith('image/'):
+            log_message(f"URL 不是圖片: {url}", "WARNING")
+            return None
+        
+        # 檢查檔案大小
+        if content_length:
+            file_size = int(content_length)
+            if file_size < 1024:  # 小於 1KB 可能是錯誤頁面
+                log_message(f"檔案太小，可能是錯誤: {filename}", "WARNING")
+                return None
+            return file_size
+        return 0
+    
+    def _finalize_download(self, url: str, stage: StagedDownload, filename: str) -> bool:
+        """驗證暫存中的照片並檢查內容重複，通過後才移到下載目錄並記錄歷史"""
+        if not self._validate_image(stage.reader()):
+            stage.discard()
+            log_message(f"下載的檔案無效: {filename}", "WARNING")
+            return False
+        
+        # 鎖內只檢查並預留內容與 URL，寫入檔案時不佔用歷史記錄的鎖
+        reserved, existing_files = self.history_manager.reserve_download(url, stage.file_hash)
+        if not reserved:
+            # 重複內容直接捨棄，不寫入硬碟
+            stage.discard()
+            self._add_stat("duplicate_photos")
+            log_message(f"下載完成後發現重複內容，已略過: {filename}")
+            if existing_files:
+                log_message(f"  重複檔案: {existing_files[0]['filepath']}")
+            else:
+                log_message("  相同內容正由其他下載寫入")
+            return False
+        
         try:
-            with Image.open(filepath) as img:
+            stage.commit()
+            
+            # 記錄下載歷史
+            self.history_manager.add_download_record(
+                url, filename, stage.filepath, stage.size, stage.file_hash
+            )
+        finally:
+            self.history_manager.release_download(url, stage.file_hash)
+        self._add_stat("total_size", stage.size)
+        return True
+    
+    def _validate_image(self, source: Union[str, BinaryIO]) -> bool:
+        """驗證圖片檔案（可傳入路徑或已開啟的檔案物件）"""
+        try:
+            with Image.open(source) as img:
                 img.verify()
             return True
         except Exception:
@@ -336,6 +624,8 @@ class PhotoDownloader:
         print(f"成功下載: {stats['downloaded_photos']}")
         print(f"跳過(已存在): {stats['skipped_photos']}")
         print(f"下載失敗: {stats['failed_photos']}")
+        if stats['duplicate_photos']:
+            print(f"  其中重複內容(已略過): {stats['duplicate_photos']}")
         print(f"下載總大小: {format_file_size(stats['total_size'])}")
         
         # 時間統計
@@ -380,21 +670,41 @@ class PhotoDownloader:
     
     def close(self):
         """清理資源"""
+        if self.async_engine:
+            self.async_engine.close()
+            self.async_engine = None
         if self.session:
             self.session.close()
+        self.history_manager.close()
 
 class AlbumDownloadManager:
     """相簿下載管理器"""
     
-    def __init__(self, prevent_sleep: bool = True):
-        self.browser = BrowserHandler()
-        self.downloader = PhotoDownloader()
+    def __init__(self, prevent_sleep: bool = True, max_workers: Optional[int] = None,
+                 engine: Optional[str] = None, scraper: Optional[str] = None,
+                 browsers: Optional[int] = None, full_crawl: bool = False, daemon: bool = False):
+        scraper = scraper or getattr(Config, 'SCRAPER', 'browser')
+        scraper_classes = {"browser": BrowserHandler, "http": HttpScraper, "hybrid": HybridScraper}
+        self.scraper_class = scraper_classes.get(scraper, BrowserHandler)
+        self.browser = self.scraper_class()
+        self.browser.full_crawl = full_crawl
+        # 只有主要的瀏覽器連接常駐瀏覽器，瀏覽器池的其他瀏覽器仍各自啟動
+        self.browser.use_daemon = daemon
+        self.browser_count = max(1, browsers or getattr(Config, 'BROWSER_POOL_SIZE', 1))
+        self.browser_pool = None
+        self.downloader = PhotoDownloader(max_workers=max_workers, engine=engine)
         self.prevent_sleep = prevent_sleep
         self.sleep_preventer = None
     
     def download_albums_by_date_range(self, start_date: datetime, end_date: datetime,
-                                    album_types: List[str] = None, dry_run: bool = False, new_only: bool = False, keywords: List[str] = None) -> bool:
-        """根據日期範圍下載相簿"""
+                                    album_types: List[str] = None, dry_run: bool = False, new_only: bool = False, keywords: List[str] = None,
+                                    date_spec: Optional[str] = None) -> bool:
+        """根據日期範圍下載相簿
+        
+        date_spec 為使用者指定日期範圍的方式（例如 "days_back=7"），用於執行進度檢查點的簽章：
+        以天數指定時實際日期每天都不同，中斷後隔天重新執行仍要沿用同一個檢查點。
+        未提供時以實際的日期範圍計算簽章。
+        """
         # 啟動防睡眠模式
         if self.prevent_sleep:
             self.sleep_preventer = SleepPreventer()
@@ -428,8 +738,29 @@ class AlbumDownloadManager:
                 albums_data[album_type] = filtered_albums
                 log_message(f"{album_type}: 找到 {len(filtered_albums)} 個符合條件的相簿")
             
-            # 下載相簿
-            success = self.downloader.download_albums(albums_data, self.browser, dry_run)
+            # 多個瀏覽器同時擷取相簿照片清單
+            photo_source = self.browser
+            if self.browser_count > 1 and any(albums_data.values()):
+                self.browser_pool = BrowserPool(self.browser_count, self.scraper_class, primary=self.browser)
+                if self.browser_pool.start():
+                    photo_source = self.browser_pool
+            
+            # 下載相簿（相同參數重新執行時從中斷處繼續）
+            # 檢查點記錄的是已完成的相簿 ID，日期範圍隨天數推移時沿用仍然正確
+            date_range = date_spec or f"{start_date.strftime('%Y-%m-%d')}~{end_date.strftime('%Y-%m-%d')}"
+            run_signature = RunCheckpoint.make_signature(
+                date_range=date_range,
+                album_types=album_types,
+                new_only=new_only,
+                keywords=keywords
+            )
+            success = self.downloader.download_albums(albums_data, photo_source, dry_run, run_signature)
+            
+            # 列出的相簿都處理完畢才前進相簿列表的擷取狀態；乾跑或篩選過的執行
+            # 沒有處理所有列出的相簿，不能讓下次擷取略過這些頁面
+            if (success and not dry_run and not new_only and not keywords
+                    and not self.downloader.download_stats["failed_albums"]):
+                self.browser.crawl_state.commit()
             
             return success
             
@@ -448,6 +779,9 @@ class AlbumDownloadManager:
             self.sleep_preventer = None
         
         # 清理其他資源
+        if self.browser_pool:
+            self.browser_pool.close()
+            self.browser_pool = None
         self.browser.close()
         self.downloader.close()
     
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+ChromeDriver 路徑解析模組
+
+ChromeDriverManager().install() 每次都會向網路查詢版本，啟動多花數秒，
+沒有網路時甚至直接失敗。這裡將解析出的 chromedriver 路徑與對應的 Chrome 版本
+記錄在硬碟上，啟動時只讀取本機 Chrome 的版本（macOS 直接讀 Info.plist，
+不需啟動 Chrome），主版本相同就沿用快取；只有版本不一致時才重新解析。
+重新解析失敗（例如離線）時依序改用快取的舊驅動、PATH 中的 chromedriver，
+最後交給 Selenium 內建的 Selenium Manager。
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import plistlib
+import tempfile
+import subprocess
+from typing import Dict, Any, Optional
+from webdriver_manager.chrome import ChromeDriverManager
+from config import Config
+from utils import log_message, FileUtils
+
+# 各平台 Chrome 的常見安裝位置
+CHROME_CANDIDATES = {
+    "darwin": ["/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"],
+    "linux": ["google-chrome", "google-chrome-stable", "chromium", "chromium-browser"],
+    "win32": [r"C:\Program Files\Google\Chrome\Application\chrome.exe",
+              r"C:\Program Files (x86)\Google\Chrome\Application\chrome.exe"],
+}
+
+def _major_version(version: Optional[str]) -> Optional[str]:
+    """取得版本號的主版本（例如 126.0.6478.126 → 126）"""
+    if not version:
+        return None
+    return version.split(".")[0]
+
+def _run_version_command(binary: str) -> Optional[str]:
+    """執行「<binary> --version」並取出版本號"""
+    try:
+        output = subprocess.run([binary, "--version"], capture_output=True, text=True, timeout=10).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    match = re.search(r'(\d+\.\d+\.\d+\.\d+)', output)
+    return match.group(1) if match else None
+
+class DriverResolver:
+    """解析並快取 chromedriver 路徑"""
+    
+    def __init__(self, path: Optional[str] = None):
+        default_path = os.path.join(os.path.dirname(os.path.abspath(Config.DOWNLOAD_HISTORY_FILE)),
+                                    "driver_cache.json")
+        self.path = path or getattr(Config, 'DRIVER_CACHE_FILE', default_path)
+        self.chrome_binary = getattr(Config, 'CHROME_BINARY', None)
+        # 各階段耗時（秒），供啟動時輸出
+        self.timings: Dict[str, float] = {}
+    
+    def _load(self) -> Dict[str, Any]:
+        """載入快取的驅動資訊"""
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            log_message(f"讀取驅動快取失敗: {e}", "WARNING")
+            return {}
+    
+    def _save(self, data: Dict[str, Any]):
+        """儲存驅動資訊"""
+        try:
+            directory = os.path.dirname(self.path)
+            os.makedirs(directory, exist_ok=True)
+            # 瀏覽器池會同時啟動多個瀏覽器，各自使用不同的暫存檔
+            fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".driver_cache.", suffix=".tmp")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            FileUtils.copy_file_mode(temp_path, self.path)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            log_message(f"儲存驅動快取失敗: {e}", "WARNING")
+    
+    def detect_chrome_version(self) -> Optional[str]:
+        """取得本機 Chrome 版本
+        
+        macOS 讀取 App 的 Info.plist，不需要啟動任何程式；其他平台執行 --version。
+        """
+        candidates = [self.chrome_binary] if self.chrome_binary else CHROME_CANDIDATES.get(sys.platform, [])
+        for binary in candidates:
+            if ".app/Contents/" in binary:
+                plist_path = os.path.join(binary.split(".app/Contents/")[0] + ".app", "Contents", "Info.plist")
+                try:
+                    with open(plist_path, 'rb') as f:
+                        return plistlib.load(f).get("CFBundleShortVersionString")
+                except (OSError, plistlib.InvalidFileException):
+                    continue
+            
+            executable = binary if os.path.isabs(binary) else shutil.which(binary)
+            if executable and os.path.exists(executable):
+                version = _run_version_command(executable)
+                if version:
+                    return version
+        return None
+    
+    def _install(self) -> str:
+        """透過 webdriver-manager 下載（或找出已下載的）對應版本驅動"""
+        return ChromeDriverManager().install()
+    
+    def resolve(self) -> Optional[str]:
+        """取得 chromedriver 路徑
+        
+        Returns:
+            str: 驅動路徑；None 表示交給 Selenium Manager 自行處理
+        """
+        started = time.perf_counter()
+        chrome_version = self.detect_chrome_version()
+        self.timings["chrome_version"] = time.perf_counter() - started
+        
+        cached = self._load()
+        cached_path = cached.get("driver_path")
+        cached_usable = bool(cached_path and os.path.exists(cached_path))
+        
+        # 找不到 Chrome 版本時無從比較，直接信任快取
+        if cached_usable and (chrome_version is None
+                              or _major_version(cached.get("chrome_version")) == _major_version(chrome_version)):
+            self.timings["driver_resolve"] = time.perf_counter() - started
+            log_message(f"沿用快取的 ChromeDriver {cached.get('driver_version') or ''}"
+                        f"（Chrome {chrome_version or '版本未知'}）")
+            return cached_path
+        
+        if cached_usable:
+            log_message(f"Chrome 版本已變更（{cached.get('chrome_version')} → {chrome_version}），重新解析驅動")
+        
+        resolve_started = time.perf_counter()
+        try:
+            driver_path = self._install()
+        except Exception as e:
+            driver_path = None
+            log_message(f"解析 ChromeDriver 失敗（可能沒有網路）: {e}", "WARNING")
+        self.timings["driver_download"] = time.perf_counter() - resolve_started
+        
+        if driver_path:
+            self._save({
+                "driver_path": driver_path,
+                "driver_version": _run_version_command(driver_path),
+                "chrome_version": chrome_version,
+                "resolved_at": time.time()
+            })
+        elif cached_usable:
+            log_message(f"改用先前快取的驅動: {cached_path}", "WARNING")
+            driver_path = cached_path
+        else:
+            driver_path = shutil.which("chromedriver")
+            if driver_path:
+                log_message(f"改用 PATH 中的驅動: {driver_path}", "WARNING")
+            else:
+                log_message("找不到可用的驅動，交由 Selenium Manager 處理", "WARNING")
+        
+        self.timings["driver_resolve"] = time.perf_counter() - started
+        return driver_path
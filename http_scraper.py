@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+HTTP 相簿擷取模組
+
+不啟動瀏覽器，直接以 requests 送出登入表單並下載相簿列表與相簿頁面，
+再以 page_parser 解析 HTML。回傳的相簿資訊與照片連結格式與 BrowserHandler 相同，
+可直接交給 PhotoDownloader 使用；網站改版導致無法解析時，可改回 --scraper browser。
+"""
+
+import re
+import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+from urllib.parse import urlparse, urlsplit, urlunsplit
+from config import Config
+from utils import log_message
+from browser_handler import BrowserHandler
+from page_parser import extract_album_bricks, extract_photo_links, parse_login_form
+from rate_limiter import AdaptiveRateLimiter, get_rate_limiter
+from session_cache import apply_cookies, session_cookies, probe_session
+
+class SessionExpiredError(Exception):
+    """請求被導回登入頁面"""
+
+class HttpScraper(BrowserHandler):
+    """以 HTTP 請求取代瀏覽器操作的相簿擷取器"""
+    
+    def __init__(self):
+        super().__init__()
+        self.session = None
+        # 分頁下載執行緒各自的會話與最後一次回應
+        self._local = threading.local()
+        self._page_executor = None
+        self._page_sessions: List[requests.Session] = []
+        self._page_sessions_lock = threading.Lock()
+    
+    @property
+    def last_response(self) -> Optional[requests.Response]:
+        """目前執行緒最後一次收到的回應（供除錯儲存頁面內容）"""
+        return getattr(self._local, "last_response", None)
+    
+    @last_response.setter
+    def last_response(self, response: Optional[requests.Response]):
+        self._local.last_response = response
+    
+    def _current_session(self) -> requests.Session:
+        """目前執行緒使用的 HTTP 會話（分頁下載執行緒使用各自的會話）"""
+        return getattr(self._local, "session", None) or self.session
+    
+    def _init_page_thread(self):
+        """分頁下載執行緒的初始化：建立自己的會話
+        
+        requests.Session 的連線池不保證執行緒安全，每個執行緒各自建立會話；
+        Cookie jar（內部有鎖）與標頭則直接共用主會話的物件，登入狀態保持一致。
+        """
+        session = requests.Session()
+        session.headers = self.session.headers
+        session.cookies = self.session.cookies
+        self._local.session = session
+        with self._page_sessions_lock:
+            self._page_sessions.append(session)
+    
+    def _get_page_executor(self, batch_size: int) -> ThreadPoolExecutor:
+        """取得分頁下載用的執行緒池（跨相簿沿用，保留 keep-alive 連線）"""
+        if self._page_executor is None:
+            self._page_executor = ThreadPoolExecutor(max_workers=batch_size, thread_name_prefix="page-fetch",
+                                                     initializer=self._init_page_thread)
+        return self._page_executor
+    
+    def init_browser(self) -> bool:
+        """初始化 HTTP 會話"""
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': Config.USER_AGENT,
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'zh-TW,zh;q=0.9,en;q=0.8',
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive',
+            'Upgrade-Insecure-Requests': '1',
+        })
+        log_message("HTTP 會話初始化成功")
+        return True
+    
+    def _login(self) -> bool:
+        """送出登入表單"""
+        try:
+            log_message("正在登入網站（HTTP 模式）...")
+            
+            response = self._fetch(Config.LOGIN_URL)
+            form = parse_login_form(response.text, response.url)
+            if not form:
+                log_message("找不到登入表單", "ERROR")
+                self._save_page_source_for_debug()
+                return False
+            
+            data = dict(form["fields"])
+            data[form["username_field"]] = Config.USERNAME
+            data[form["password_field"]] = Config.PASSWORD
+            
+            response = self._fetch(form["action"], data=data, headers={"Referer": response.url})
+            log_message(f"登入後頁面: {response.url}")
+            
+            if "activity" in response.url.lower():
+                log_message("登入成功")
+                return True
+            
+            log_message(f"登入失敗 - 未跳轉到預期頁面，目前頁面: {response.url}", "ERROR")
+            self._save_page_source_for_debug()
+            return False
+        
+        except requests.RequestException as e:
+            log_message(f"登入失敗: {e}", "ERROR")
+            return False
+    
+    def is_alive(self) -> bool:
+        """HTTP 會話不會當掉，只要尚未關閉即可使用"""
+        return self.session is not None
+    
+    def import_cookies(self, cookies: List[Dict[str, Any]]):
+        """匯入瀏覽器格式的 Cookie（selenium get_cookies() 的結果）"""
+        apply_cookies(self.session, cookies)
+    
+    def _restore_cached_session(self) -> bool:
+        """將仍有效的快取登入狀態載入 HTTP 會話"""
+        cached = self.session_cache.load()
+        if not cached:
+            return False
+        
+        user_agent = self.session.headers['User-Agent']
+        if cached.get("user_agent"):
+            self.session.headers['User-Agent'] = cached["user_agent"]
+        self.import_cookies(cached["cookies"])
+        if probe_session(self.session):
+            return True
+        
+        log_message("快取的登入狀態已失效，重新登入")
+        self.session.cookies.clear()
+        self.session.headers['User-Agent'] = user_agent
+        self.session_cache.clear()
+        return False
+    
+    def _save_session(self):
+        """快取登入狀態供下次執行使用"""
+        self.session_cache.save(session_cookies(self.session), self.session.headers['User-Agent'])
+    
+    def _fetch(self, url: str, data: Optional[Dict[str, str]] = None,
+               headers: Optional[Dict[str, str]] = None) -> requests.Response:
+        """送出頁面請求，請求速率由網站共用的限速器控制"""
+        limiter = get_rate_limiter(url, "page")
+        limiter.acquire()
+        session = self._current_session()
+        try:
+            if data is None:
+                response = session.get(url, headers=headers, timeout=Config.BROWSER_TIMEOUT)
+            else:
+                response = session.post(url, data=data, headers=headers, timeout=Config.BROWSER_TIMEOUT)
+        except requests.RequestException:
+            limiter.record_failure()
+            raise
+        
+        if AdaptiveRateLimiter.is_throttle_status(response.status_code):
+            limiter.record_failure(AdaptiveRateLimiter.parse_retry_after(response.headers.get('retry-after')))
+        else:
+            limiter.record_success(response.elapsed.total_seconds())
+        
+        self.last_response = response
+        response.raise_for_status()
+        return response
+    
+    def _fetch_page(self, url: str) -> requests.Response:
+        """取得需要登入的頁面"""
+        response = self._fetch(url)
+        if urlparse(response.url).path == urlparse(Config.LOGIN_URL).path:
+            raise SessionExpiredError(f"登入狀態已失效: {url}")
+        return response
+    
+    def _save_page_source_for_debug(self):
+        """儲存最後一次回應的內容用於除錯"""
+        if self.last_response is None:
+            return
+        try:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            debug_file = f"/tmp/debug_page_{timestamp}.html"
+            with open(debug_file, 'w', encoding='utf-8') as f:
+                f.write(self.last_response.text)
+            log_message(f"頁面原始碼已儲存至: {debug_file}", "INFO")
+        except Exception as e:
+            log_message(f"無法儲存除錯檔案: {e}", "WARNING")
+    
+    def _load_albums_page(self, page_url: str, album_type: str) -> Optional[List[Dict[str, Any]]]:
+        """下載相簿列表頁面並解析相簿"""
+        try:
+            response = self._fetch_page(page_url)
+        except SessionExpiredError as e:
+            log_message(str(e), "ERROR")
+            return None
+        
+        element_htmls = extract_album_bricks(response.text)
+        log_message(f"找到 {len(element_htmls)} 個相簿磚塊")
+        return self._parse_album_bricks(element_htmls, album_type)
+    
+    def get_album_photos(self, album_url: str, history_manager=None, filter_duplicates: bool = True) -> List[str]:
+        """取得相簿中的照片連結（支援分頁）並可選擇性過濾重複
+        
+        分頁網址可以直接由 pageIndex 推算，因此每次同時下載 PAGE_FETCH_BATCH 頁，
+        遇到第一個沒有照片的頁面就停止，多抓的後續頁面直接捨棄。
+        網址中沒有 pageIndex 時（瀏覽器模式會被導向 pageIndex=1）先補上第 1 頁再推算；
+        網站忽略這個參數時各頁內容相同，會在第 2 頁停止。
+        預先取得的後續頁面請求失敗時視為分頁結束並保留已取得的照片，只有第 1 頁失敗才算相簿失敗。
+        """
+        try:
+            log_message("正在取得相簿照片...")
+            
+            max_pages = 30  # 照片分頁最大頁數
+            batch_size = max(1, getattr(Config, 'PAGE_FETCH_BATCH', 4))
+            album_url = self._normalize_album_url(album_url)
+            first_page = self._page_number(album_url)
+            
+            all_photo_urls = []
+            previous_photos = None
+            page_number = 1
+            finished = False
+            complete = True
+            
+            executor = self._get_page_executor(batch_size)
+            while page_number <= max_pages and not finished:
+                batch = range(page_number, min(page_number + batch_size, max_pages + 1))
+                page_urls = [self._page_url(album_url, first_page + n - 1) for n in batch]
+                
+                futures = [executor.submit(self._fetch_page_photos, page_url) for page_url in page_urls]
+                # 依頁碼順序處理結果
+                for number, future in zip(batch, futures):
+                    try:
+                        current_page_photos = future.result()
+                    except requests.RequestException as e:
+                        # 同一批預先取得的頁面可能超出最後一頁（404）或被限速（429/5xx），
+                        # 視為分頁結束並保留已取得的照片；只有第 1 頁失敗才算相簿失敗
+                        if number == 1:
+                            raise
+                        status_code = e.response.status_code if getattr(e, "response", None) is not None else None
+                        if status_code == 404:
+                            log_message(f"第 {number} 頁不存在，結束分頁處理")
+                        else:
+                            # 後面可能還有照片，不記錄到相簿快取，下次執行會重新擷取
+                            log_message(f"第 {number} 頁取得失敗，保留前 {number - 1} 頁的照片: {e}", "WARNING")
+                            complete = False
+                        finished = True
+                    else:
+                        if not current_page_photos:
+                            log_message(f"第 {number} 頁沒有找到照片，結束分頁處理")
+                            finished = True
+                        elif current_page_photos == previous_photos:
+                            # 超出範圍的頁碼被導回最後一頁
+                            log_message(f"第 {number} 頁與前一頁相同，結束分頁處理")
+                            finished = True
+                    
+                    if finished:
+                        discarded = batch.stop - number - 1
+                        if discarded:
+                            log_message(f"捨棄預先取得的 {discarded} 個後續頁面")
+                        break
+                    
+                    log_message(f"第 {number} 頁找到 {len(current_page_photos)} 張照片")
+                    all_photo_urls.extend(current_page_photos)
+                    previous_photos = current_page_photos
+                    page_number = number + 1
+            
+            return self._finalize_photo_list(all_photo_urls, page_number - 1, history_manager, filter_duplicates,
+                                             album_url if complete else None)
+        
+        except Exception as e:
+            log_message(f"取得相簿照片失敗: {e}", "ERROR")
+            return []
+    
+    def _fetch_page_photos(self, page_url: str) -> List[str]:
+        """下載一個相簿分頁並取得其中的照片連結"""
+        response = self._fetch_page(page_url)
+        return self._photo_urls_from_links(extract_photo_links(response.text, response.url))
+    
+    def _normalize_album_url(self, url: str) -> str:
+        """確保相簿網址帶有pageIndex參數（沒有時視為第 1 頁）"""
+        if self._page_number(url) is not None:
+            return url
+        parts = urlsplit(url)
+        query = f"{parts.query}&pageIndex=1" if parts.query else "pageIndex=1"
+        return urlunsplit(parts._replace(query=query))
+    
+    def _page_number(self, url: str) -> Optional[int]:
+        """取得網址中的pageIndex頁碼"""
+        match = re.search(r'pageIndex=(\d+)', url)
+        return int(match.group(1)) if match else None
+    
+    def _page_url(self, url: str, page_number: int) -> str:
+        """將網址中的pageIndex換成指定頁碼"""
+        return re.sub(r'pageIndex=\d+', f'pageIndex={page_number}', url, count=1)
+    
+    def close(self):
+        """關閉 HTTP 會話"""
+        if self._page_executor is not None:
+            self._page_executor.shutdown(wait=True)
+            self._page_executor = None
+        with self._page_sessions_lock:
+            for session in self._page_sessions:
+                session.close()
+            self._page_sessions = []
+        if self.session:
+            self.session.close()
+            self.session = None
+            log_message("HTTP 會話已關閉")
+
+class HybridScraper(HttpScraper):
+    """以瀏覽器登入，之後的頁面改用 HTTP 請求
+    
+    登入流程仍交給 Selenium 處理，登入完成後立即把 Cookie 交給 HTTP 會話並關閉瀏覽器，
+    相簿列表與照片分頁都以 keep-alive 連線直接下載，不再逐頁渲染。
+    快取的登入狀態仍有效時完全不會啟動瀏覽器。
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self.browser = BrowserHandler()
+    
+    def _login(self) -> bool:
+        """以瀏覽器登入，並將登入狀態移交給 HTTP 會話
+        
+        只有快取的登入狀態失效時才會執行，因此瀏覽器到這裡才啟動。
+        """
+        try:
+            if not self.browser.init_browser() or not self.browser._login():
+                return False
+            
+            cookies = self.browser.export_cookies()
+            self.import_cookies(cookies)
+            # 伺服器可能將登入狀態與 User-Agent 綁定
+            self.session.headers['User-Agent'] = self.browser.get_user_agent()
+            log_message(f"已將 {len(cookies)} 個登入 Cookie 移交給 HTTP 會話")
+            return True
+        
+        except Exception as e:
+            log_message(f"移交登入狀態失敗: {e}", "ERROR")
+            return False
+        
+        finally:
+            # 登入後不再需要瀏覽器，立即釋放記憶體
+            self.browser.close()
+    
+    def close(self):
+        """關閉瀏覽器（若仍在執行）與 HTTP 會話"""
+        self.browser.close()
+        super().close()
@@ -16,6 +16,10 @@
     python main.py --type class                         # 只下載班級相簿
     python main.py --new-only --key-word 企鵝,綿羊      # 只下載包含關鍵字的NEW相簿
     python main.py --dry-run                           # 乾跑模式
+    python main.py --workers 8                         # 同時下載 8 張照片
+    python main.py --scraper http                      # 不啟動瀏覽器，直接以 HTTP 擷取相簿
+    python main.py --browsers 4                        # 以 4 個瀏覽器同時擷取相簿照片清單
+    python main.py --daemon                            # 連接常駐瀏覽器（python browser_daemon.py start）
 """
 
 import argparse
@@ -40,6 +44,12 @@ def parse_arguments() -> argparse.Namespace:
   %(prog)s --type class                         # 只下載班級相簿
   %(prog)s --new-only --key-word 企鵝,綿羊      # 只下載包含關鍵字的NEW相簿
   %(prog)s --dry-run                           # 乾跑模式，不實際下載
+  %(prog)s --workers 8                         # 同時下載 8 張照片
+  %(prog)s --scraper http                      # 不啟動瀏覽器，直接以 HTTP 擷取相簿
+  %(prog)s --scraper hybrid                    # 以瀏覽器登入後改用 HTTP 擷取相簿
+  %(prog)s --browsers 4                        # 以 4 個瀏覽器同時擷取相簿照片清單
+  %(prog)s --all-albums --full-crawl           # 重新擷取所有相簿列表分頁（包含較舊的相簿）
+  %(prog)s --daemon                            # 連接常駐瀏覽器，連續執行時不必重新啟動 Chrome
         """
     )
     
@@ -103,6 +113,48 @@ def parse_arguments() -> argparse.Namespace:
         help="下載所有相簿（覆蓋--new-only預設值）"
     )
     
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=getattr(Config, 'DOWNLOAD_WORKERS', 4),
+        help=f"同時下載照片的執行緒數 (預設: {getattr(Config, 'DOWNLOAD_WORKERS', 4)})"
+    )
+    
+    parser.add_argument(
+        "--engine",
+        choices=["threaded", "async"],
+        default=getattr(Config, 'DOWNLOAD_ENGINE', 'threaded'),
+        help="照片下載引擎：threaded 多執行緒、async 非同步 (需安裝 aiohttp)"
+    )
+    
+    parser.add_argument(
+        "--scraper",
+        choices=["browser", "http", "hybrid"],
+        default=getattr(Config, 'SCRAPER', 'browser'),
+        help="相簿擷取方式：browser 使用 Chrome、http 直接送出 HTTP 請求 (較快，網站改版時可改回 browser)、"
+             "hybrid 以 Chrome 登入後改用 HTTP 擷取頁面"
+    )
+    
+    parser.add_argument(
+        "--browsers",
+        type=int,
+        default=getattr(Config, 'BROWSER_POOL_SIZE', 1),
+        help=f"同時擷取相簿照片清單的瀏覽器數量 (預設: {getattr(Config, 'BROWSER_POOL_SIZE', 1)})"
+    )
+    
+    parser.add_argument(
+        "--full-crawl",
+        action="store_true",
+        help="擷取所有相簿列表分頁（預設遇到整頁都是已擷取過的相簿就停止）"
+    )
+    
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        default=getattr(Config, 'USE_BROWSER_DAEMON', False),
+        help="連接常駐瀏覽器（不存在時自動在背景啟動），省去每次啟動 Chrome 與登入的時間"
+    )
+    
     parser.add_argument(
         "--key-word",
         type=str,
@@ -140,6 +192,12 @@ def validate_date_arguments(args: argparse.Namespace) -> Tuple[datetime, datetim
         log_message(f"日期參數錯誤: {e}", "ERROR")
         sys.exit(1)
 
+def describe_date_arguments(args: argparse.Namespace) -> str:
+    """使用者指定日期範圍的方式（執行進度檢查點以此判斷是否為同一個工作）"""
+    if args.start_date and args.end_date:
+        return f"{args.start_date}~{args.end_date}"
+    return f"days_back={args.days_back}"
+
 def get_album_types(type_arg: str) -> List[str]:
     """取得要下載的相簿類型"""
     type_mapping = {
@@ -220,14 +278,23 @@ def main():
         
         # 建立下載管理器（預設啟用防睡眠，除非用戶指定停用）
         prevent_sleep = not args.no_sleep_prevention
-        manager = AlbumDownloadManager(prevent_sleep=prevent_sleep)
+        manager = AlbumDownloadManager(
+            prevent_sleep=prevent_sleep,
+            max_workers=args.workers,
+            engine=args.engine,
+            scraper=args.scraper,
+            browsers=args.browsers,
+            full_crawl=args.full_crawl,
+            daemon=args.daemon
+        )
         success = manager.download_albums_by_date_range(
             start_date=start_date,
             end_date=end_date,
             album_types=album_types,
             dry_run=args.dry_run,
             new_only=new_only,
-            keywords=keywords
+            keywords=keywords,
+            date_spec=describe_date_arguments(args)
         )
         
         if success:
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+網頁解析模組
+
+以標準函式庫的 HTMLParser 單次掃描整份頁面 HTML，取出相簿磚塊、照片連結與
+登入表單，不需要瀏覽器即可解析網站頁面。
+"""
+
+from html.parser import HTMLParser
+from typing import List, Dict, Any, Optional, Tuple
+from urllib.parse import urljoin
+
+# 沒有結束標籤的 HTML 元素
+VOID_ELEMENTS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "param", "source", "track", "wbr"
+}
+
+class PageLinks:
+    """頁面中可能的照片連結來源，依優先順序排列"""
+    
+    def __init__(self):
+        self.gallery_links: List[str] = []   # a.photo-gallery.albumbgphoto
+        self.album_links: List[str] = []     # a.albumbgphoto
+        self.images: List[Tuple[Optional[str], Optional[str]]] = []  # img (src, data-src)
+
+class _PageScanner(HTMLParser):
+    """單次掃描頁面，收集相簿磚塊範圍、照片連結與表單欄位"""
+    
+    def __init__(self, html: str):
+        super().__init__(convert_charrefs=True)
+        self.html = html
+        self.line_offsets = [0]
+        for line in html.splitlines(keepends=True):
+            self.line_offsets.append(self.line_offsets[-1] + len(line))
+        
+        self.bricks: List[str] = []
+        self.links = PageLinks()
+        self.forms: List[Dict[str, Any]] = []
+        
+        self._depth = 0
+        self._brick_start = None
+        self._brick_depth = None
+        self._current_form = None
+    
+    def _offset(self) -> int:
+        """目前標籤在原始 HTML 中的位置"""
+        line, column = self.getpos()
+        return self.line_offsets[line - 1] + column
+    
+    def handle_starttag(self, tag, attrs):
+        attributes = dict(attrs)
+        classes = (attributes.get("class") or "").split()
+        
+        if "brick2" in classes and self._brick_start is None:
+            self._brick_start = self._offset()
+            self._brick_depth = self._depth
+        
+        if tag == "a" and "albumbgphoto" in classes and attributes.get("href"):
+            if "photo-gallery" in classes:
+                self.links.gallery_links.append(attributes["href"])
+            self.links.album_links.append(attributes["href"])
+        elif tag == "img":
+            self.links.images.append((attributes.get("src"), attributes.get("data-src")))
+        elif tag == "form":
+            self._current_form = {"action": attributes.get("action", ""), "inputs": []}
+            self.forms.append(self._current_form)
+        elif tag == "input" and self._current_form is not None:
+            self._current_form["inputs"].append(attributes)
+        
+        if tag not in VOID_ELEMENTS:
+            self._depth += 1
+    
+    def handle_startendtag(self, tag, attrs):
+        # 自我結束的標籤不影響巢狀深度
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS:
+            self._depth -= 1
+    
+    def handle_endtag(self, tag):
+        if tag in VOID_ELEMENTS:
+            return
+        self._depth = max(0, self._depth - 1)
+        
+        if tag == "form":
+            self._current_form = None
+        
+        if self._brick_start is not None and self._depth == self._brick_depth:
+            end = self.html.find(">", self._offset()) + 1
+            self.bricks.append(self.html[self._brick_start:end])
+            self._brick_start = None
+            self._brick_depth = None
+
+def scan_page(html: str) -> _PageScanner:
+    """掃描整份頁面並回傳結果"""
+    scanner = _PageScanner(html)
+    scanner.feed(html)
+    scanner.close()
+    return scanner
+
+def extract_album_bricks(html: str) -> List[str]:
+    """取出所有 .brick2 相簿磚塊的 HTML"""
+    return scan_page(html).bricks
+
+def extract_photo_links(html: str, base_url: str = "") -> PageLinks:
+    """取出頁面中的照片連結（相對網址會轉為絕對網址）"""
+    links = scan_page(html).links
+    if base_url:
+        links.gallery_links = [urljoin(base_url, href) for href in links.gallery_links]
+        links.album_links = [urljoin(base_url, href) for href in links.album_links]
+        links.images = [
+            (urljoin(base_url, src) if src else src, urljoin(base_url, data_src) if data_src else data_src)
+            for src, data_src in links.images
+        ]
+    return links
+
+def parse_login_form(html: str, base_url: str) -> Optional[Dict[str, Any]]:
+    """解析登入表單
+    
+    Returns:
+        Dict: {"action": 送出網址, "fields": 預設欄位值, "username_field": 帳號欄位名稱,
+               "password_field": 密碼欄位名稱}；找不到含密碼欄位的表單時回傳 None
+    """
+    for form in scan_page(html).forms:
+        password_field = None
+        username_field = None
+        fields = {}
+        
+        for attributes in form["inputs"]:
+            name = attributes.get("name")
+            if not name:
+                continue
+            input_type = (attributes.get("type") or "text").lower()
+            if input_type == "password":
+                password_field = name
+            elif input_type in ("text", "email") and username_field is None:
+                username_field = name
+            elif input_type in ("checkbox", "radio") and "checked" not in attributes:
+                continue
+            fields[name] = attributes.get("value") or ""
+        
+        if password_field and username_field:
+            return {
+                "action": urljoin(base_url, form["action"] or base_url),
+                "fields": fields,
+                "username_field": username_field,
+                "password_field": password_field
+            }
+    return None
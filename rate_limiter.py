@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+自適應請求速率控制模組
+
+以令牌桶控制每個主機的請求速率，並依回應狀況以 AIMD（加法增加、乘法減少）
+調整速率：回應快速時逐步提高速率，遇到 429/5xx、連線錯誤或延遲明顯上升時
+立即減半，藉此取得伺服器可承受的最大吞吐量，而不是固定的等待時間。
+
+同一個主機的所有下載執行緒、非同步任務與頁面請求共用同一個限速器。
+限速器只控制整體速率；單一請求失敗後的重試仍以指數退避等待（retry_delay），
+429 以外的 4xx 錯誤不會重試。
+"""
+
+import time
+import random
+import asyncio
+import threading
+from typing import Dict, Optional
+from urllib.parse import urlparse
+from config import Config
+
+class AdaptiveRateLimiter:
+    """令牌桶 + AIMD 自適應限速器"""
+    
+    # 延遲超過基準值的倍數（且至少增加指定秒數）時視為壅塞
+    LATENCY_TOLERANCE = 2.0
+    LATENCY_MIN_INCREASE = 0.1
+    # 基準延遲緩慢跟隨目前延遲，避免網路環境改變後一直被視為壅塞
+    BASELINE_DRIFT = 0.01
+    # 延遲平滑係數
+    LATENCY_SMOOTHING = 0.2
+    
+    def __init__(self, name: str, initial_rate: float, min_rate: float, max_rate: float,
+                 increase_step: float = 0.5, decrease_factor: float = 0.5, burst: float = 1.0):
+        self.name = name
+        self.rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.burst = burst
+        
+        self.tokens = burst
+        self.last_refill = time.monotonic()
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.latency_ewma = None
+        self.baseline_latency = None
+        self._lock = threading.Lock()
+    
+    def _refill(self, now: float):
+        """依經過時間補充令牌"""
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+    
+    def reserve(self) -> float:
+        """預約一個請求名額，回傳需要等待的秒數"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+            return max(wait, self.paused_until - now)
+    
+    def acquire(self):
+        """等待直到可以送出請求"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+    
+    async def acquire_async(self):
+        """等待直到可以送出請求（非同步版本）"""
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+    
+    def record_success(self, latency: float):
+        """記錄成功的請求與其延遲，並調整速率"""
+        with self._lock:
+            if self.latency_ewma is None:
+                self.latency_ewma = latency
+            else:
+                self.latency_ewma += self.LATENCY_SMOOTHING * (latency - self.latency_ewma)
+            
+            if self.baseline_latency is None or self.latency_ewma < self.baseline_latency:
+                self.baseline_latency = self.latency_ewma
+            else:
+                self.baseline_latency += self.BASELINE_DRIFT * (self.latency_ewma - self.baseline_latency)
+            
+            if (self.latency_ewma > self.baseline_latency * self.LATENCY_TOLERANCE
+                    and self.latency_ewma - self.baseline_latency > self.LATENCY_MIN_INCREASE):
+                self._decrease()
+            else:
+                # 加法增加
+                self.rate = min(self.max_rate, self.rate + self.increase_step)
+    
+    def record_failure(self, retry_after: Optional[float] = None):
+        """記錄失敗的請求（429/5xx 或連線錯誤），並降低速率"""
+        with self._lock:
+            self._decrease()
+            if retry_after:
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+    
+    def _decrease(self):
+        """乘法減少；每個延遲週期最多減少一次，避免同一波錯誤重複懲罰"""
+        now = time.monotonic()
+        window = max(self.latency_ewma or 0.0, 1.0 / self.rate)
+        if now - self.last_decrease < window:
+            return
+        self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+        self.last_decrease = now
+        # 降速後不保留累積的令牌
+        self.tokens = min(self.tokens, 0.0)
+    
+    @staticmethod
+    def is_throttle_status(status_code: int) -> bool:
+        """是否為需要降速的回應狀態"""
+        return status_code == 429 or status_code >= 500
+    
+    @staticmethod
+    def is_retryable_status(status_code: int) -> bool:
+        """失敗的回應是否值得重試（429 與 5xx；其他 4xx 重試也不會成功）"""
+        return AdaptiveRateLimiter.is_throttle_status(status_code)
+    
+    @staticmethod
+    def retry_delay(retries: int) -> float:
+        """第 retries 次重試前的等待秒數（指數退避，加上隨機抖動避免同時重試）"""
+        base = getattr(Config, 'RETRY_BACKOFF_BASE', 1.0)
+        cap = getattr(Config, 'RETRY_BACKOFF_MAX', 30.0)
+        delay = min(cap, base * 2 ** (retries - 1))
+        return delay * random.uniform(0.5, 1.0)
+    
+    @staticmethod
+    def parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """解析 Retry-After 標頭（僅支援秒數格式）"""
+        try:
+            return float(value) if value else None
+        except ValueError:
+            return None
+
+_limiters: Dict[str, AdaptiveRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter(url: str, kind: str = "download") -> AdaptiveRateLimiter:
+    """取得指定主機共用的限速器
+    
+    Args:
+        url: 請求網址或主機名稱
+        kind: "download" 為照片下載，"page" 為網站頁面請求，兩者的初始速率不同
+    """
+    host = urlparse(url).netloc or url
+    with _limiters_lock:
+        if host not in _limiters:
+            burst = getattr(Config, 'RATE_LIMIT_BURST', 2.0)
+            if kind == "page":
+                # HTTP 模式一次送出 PAGE_FETCH_BATCH 個分頁請求，初始速率與令牌數
+                # 至少要讓一整批同時送出，否則並行擷取會被限速器排成逐頁請求
+                batch_size = max(1, getattr(Config, 'PAGE_FETCH_BATCH', 4))
+                initial_rate = getattr(Config, 'PAGE_RATE_INITIAL', float(batch_size))
+                max_rate = getattr(Config, 'PAGE_RATE_MAX', 5.0 * batch_size)
+                burst = max(burst, float(batch_size))
+            else:
+                delay = getattr(Config, 'DOWNLOAD_DELAY', 0.5)
+                initial_rate = getattr(Config, 'DOWNLOAD_RATE_INITIAL', 1.0 / delay if delay > 0 else 10.0)
+                max_rate = getattr(Config, 'DOWNLOAD_RATE_MAX', 50.0)
+            _limiters[host] = AdaptiveRateLimiter(
+                name=host,
+                initial_rate=initial_rate,
+                min_rate=getattr(Config, 'RATE_LIMIT_MIN', 0.2),
+                max_rate=max_rate,
+                burst=burst
+            )
+        return _limiters[host]
+
+def reset_rate_limiters():
+    """清除所有限速器狀態（供效能測試在每輪之間重新開始）"""
+    with _limiters_lock:
+        _limiters.clear()
@@ -3,7 +3,7 @@
 重建雜湊值索引腳本
 
 用於為現有的 download_history.json 檔案建立雜湊值索引，
-以支援新的重複檔案檢測功能。
+以支援新的重複檔案檢測功能；同時重建下載前過濾用的遠端物件索引。
 
 使用方法:
     python rebuild_hash_index.py
@@ -11,7 +11,6 @@
 
 import os
 import sys
-import json
 from config import Config
 from utils import DownloadHistoryManager, log_message
 
@@ -24,31 +23,22 @@ def main():
     
     history_file = Config.DOWNLOAD_HISTORY_FILE
     
-    if not os.path.exists(history_file):
+    if not os.path.exists(history_file) and not os.path.exists(f"{history_file}.journal"):
         log_message("找不到下載歷史檔案，無需重建索引", "WARNING")
         return
     
-    # 備份原始檔案
+    # 備份原始檔案（只有日誌、尚未寫過快照時無需備份）
     backup_file = f"{history_file}.backup"
-    if not os.path.exists(backup_file):
+    if os.path.exists(history_file) and not os.path.exists(backup_file):
         log_message(f"建立備份檔案: {backup_file}")
         import shutil
         shutil.copy2(history_file, backup_file)
     
     log_message("載入下載歷史...")
     
-    # 直接載入 JSON 而不使用 DownloadHistoryManager，避免自動建立索引
-    try:
-        with open(history_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except Exception as e:
-        log_message(f"載入下載歷史失敗: {e}", "ERROR")
-        return
-    
-    if "downloads" not in data:
-        log_message("下載歷史格式不正確", "ERROR")
-        return
-    
+    # 透過 DownloadHistoryManager 載入，才會包含日誌中尚未併入快照的記錄
+    history_manager = DownloadHistoryManager(history_file)
+    data = history_manager.history
     downloads = data["downloads"]
     total_files = len(downloads)
     log_message(f"找到 {total_files} 個下載記錄")
@@ -88,7 +78,7 @@ def main():
                 file_hash = FileUtils.calculate_file_hash(filepath)
                 if file_hash:
                     # 更新記錄中的雜湊值
-                    record["file_hash"] = file_hash
+                    record.file_hash = file_hash
                     valid_hashes += 1
                 else:
                     continue
@@ -97,31 +87,25 @@ def main():
         else:
             valid_hashes += 1
         
-        # 建立索引
-        if file_hash not in hash_index:
-            hash_index[file_hash] = []
-        
-        hash_index[file_hash].append({
-            "file_key": file_key,
-            "filepath": record.get("filepath", ""),
-            "filename": record.get("filename", ""),
-            "url": record.get("url", "")
-        })
+        # 建立索引（索引項目直接引用記錄）
+        hash_index.setdefault(record.digest, []).append(record)
     
     print()  # 換行
     
     # 更新資料結構
     data["hash_index"] = hash_index
     
+    # 重建遠端物件索引（S3 物件名稱與正規化 URL，供下載前過濾已下載的照片）
+    log_message("正在重建遠端物件索引...")
+    history_manager._build_remote_index()
+    remote_index = data["remote_index"]
+    
     # 儲存更新後的檔案
     log_message("儲存更新後的下載歷史...")
-    try:
-        with open(history_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        log_message("雜湊值索引重建完成!")
-    except Exception as e:
-        log_message(f"儲存檔案失敗: {e}", "ERROR")
+    if not history_manager.compact():
+        log_message("儲存檔案失敗", "ERROR")
         return
+    log_message("雜湊值索引重建完成!")
     
     # 統計重複檔案
     duplicate_hashes = {h: files for h, files in hash_index.items() if len(files) > 1}
@@ -137,6 +121,7 @@ def main():
     print(f"缺少雜湊值: {missing_hashes}")
     print(f"檔案不存在: {invalid_files}")
     print(f"唯一檔案數: {len(hash_index)}")
+    print(f"遠端物件索引: {len(remote_index['objects'])} 個物件, {len(remote_index['urls'])} 個無物件名稱的 URL")
     print(f"重複檔案數: {duplicate_files_count} 個檔案 ({len(duplicate_hashes)} 組重複)")
     
     if len(duplicate_hashes) > 0:
@@ -159,8 +144,8 @@ def main():
         
         # 顯示部分重複檔案範例
         print("\n重複檔案範例 (前5組):")
-        for i, (file_hash, files) in enumerate(list(duplicate_hashes.items())[:5]):
-            print(f"  {i+1}. 雜湊值 {file_hash[:8]}... ({len(files)} 個檔案)")
+        for i, files in enumerate(list(duplicate_hashes.values())[:5]):
+            print(f"  {i+1}. 雜湊值 {files[0].file_hash[:8]}... ({len(files)} 個檔案)")
             for j, file_info in enumerate(files[:3]):  # 每組最多顯示3個
                 print(f"     - {file_info['filename']}")
                 if j == 2 and len(files) > 3:
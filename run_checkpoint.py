@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+執行進度檢查點模組
+
+下載過程中每完成 CHECKPOINT_EVERY_PHOTOS 張照片或每隔 CHECKPOINT_INTERVAL 秒，
+就把已完成的相簿與照片數寫到 run_checkpoint.json（暫存檔加 rename，不會留下
+寫到一半的檔案）。照片本身的下載記錄由下載歷史的日誌保存，寫入檢查點前會先
+同步日誌，因此檢查點記錄的進度一定已經在下載歷史中。
+
+以相同的參數（指定日期範圍的方式、相簿類型、篩選條件）重新執行時，會直接略過檢查點中
+已完成的相簿；整次執行順利完成後刪除檢查點。
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from typing import Dict, Any, Optional
+from config import Config
+from utils import log_message, FileUtils
+
+class RunCheckpoint:
+    """單次執行的下載進度"""
+    
+    def __init__(self, signature: str, path: Optional[str] = None):
+        """
+        Args:
+            signature: 執行參數的簽章（make_signature），不同參數的檢查點不會沿用
+            path: 檢查點檔案路徑
+        """
+        default_path = os.path.join(os.path.dirname(os.path.abspath(Config.DOWNLOAD_HISTORY_FILE)),
+                                    "run_checkpoint.json")
+        self.path = path or getattr(Config, 'RUN_CHECKPOINT_FILE', default_path)
+        self.every_photos = max(1, getattr(Config, 'CHECKPOINT_EVERY_PHOTOS', 50))
+        self.interval = getattr(Config, 'CHECKPOINT_INTERVAL', 30)
+        self.signature = signature
+        self.lock = threading.Lock()
+        
+        data = self._load()
+        resumed = data.get("signature") == signature
+        self.completed_albums = set(data.get("completed_albums", [])) if resumed else set()
+        self.photos_done = data.get("photos_done", 0) if resumed else 0
+        self._pending_photos = 0
+        self._last_save = time.monotonic()
+    
+    @staticmethod
+    def make_signature(**params: Any) -> str:
+        """以執行參數計算簽章"""
+        payload = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def album_key(album: Dict[str, Any]) -> str:
+        """相簿在檢查點中的識別值"""
+        return str(album.get("album_id") or album.get("link"))
+    
+    def _load(self) -> Dict[str, Any]:
+        """載入上次中斷時的檢查點"""
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            log_message(f"讀取執行進度檢查點失敗，將從頭開始: {e}", "WARNING")
+            return {}
+    
+    def is_completed(self, album: Dict[str, Any]) -> bool:
+        """相簿是否已在先前（同參數）的執行中完成"""
+        return self.album_key(album) in self.completed_albums
+    
+    def complete_album(self, album: Dict[str, Any]):
+        """記錄相簿已完成（呼叫端接著呼叫 save）"""
+        with self.lock:
+            self.completed_albums.add(self.album_key(album))
+    
+    def photo_done(self) -> bool:
+        """記錄完成一張照片
+        
+        Returns:
+            bool: 已達到寫入檢查點的張數或時間間隔
+        """
+        with self.lock:
+            self.photos_done += 1
+            self._pending_photos += 1
+            return (self._pending_photos >= self.every_photos
+                    or time.monotonic() - self._last_save >= self.interval)
+    
+    def save(self):
+        """以暫存檔加 rename 的方式寫入檢查點"""
+        with self.lock:
+            data = {
+                "signature": self.signature,
+                "updated_at": time.time(),
+                "completed_albums": sorted(self.completed_albums),
+                "photos_done": self.photos_done
+            }
+            temp_path = None
+            try:
+                directory = os.path.dirname(self.path)
+                os.makedirs(directory, exist_ok=True)
+                fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".run_checkpoint.", suffix=".tmp")
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False)
+                    # 先確保內容寫入硬碟再 rename，斷電後不會留下空的檢查點
+                    f.flush()
+                    os.fsync(f.fileno())
+                FileUtils.copy_file_mode(temp_path, self.path)
+                os.replace(temp_path, self.path)
+                self._pending_photos = 0
+                self._last_save = time.monotonic()
+            except Exception as e:
+                log_message(f"寫入執行進度檢查點失敗: {e}", "WARNING")
+                if temp_path and os.path.exists(temp_path):
+                    os.remove(temp_path)
+    
+    def clear(self):
+        """整次執行完成後刪除檢查點"""
+        with self.lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+擷取狀態快取模組
+
+- CrawlState：記錄每種相簿類型已看過的最大相簿 ID（high-water mark）與第一頁
+  列表的指紋。新相簿只會出現在列表最前面，因此擷取相簿列表時遇到整頁都是
+  已知相簿的頁面就可以停止，不必每次都重新擷取所有分頁。
+- AlbumPhotoCache：記錄各相簿的照片清單與是否已完整下載，已完成的相簿
+  不必再逐頁擷取照片清單。
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from typing import List, Dict, Any, Optional
+from config import Config
+from utils import log_message, FileUtils
+
+def _atomic_write_json(path: str, data: Any):
+    """以暫存檔加 rename 的方式寫入 JSON，避免中斷時留下損毀的檔案"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        FileUtils.copy_file_mode(temp_path, path)
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+class CrawlState:
+    """相簿列表的增量擷取狀態"""
+    
+    def __init__(self, path: Optional[str] = None):
+        default_path = os.path.join(os.path.dirname(os.path.abspath(Config.DOWNLOAD_HISTORY_FILE)),
+                                    "crawl_state.json")
+        self.path = path or getattr(Config, 'CRAWL_STATE_FILE', default_path)
+        self.state = self._load()
+        # 本次擷取到、尚未確認處理完畢的相簿列表：album_type → (第一頁相簿, 所有相簿)
+        self.pending: Dict[str, Any] = {}
+    
+    def _load(self) -> Dict[str, Any]:
+        """載入擷取狀態"""
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            log_message(f"讀取擷取狀態失敗，將完整擷取相簿列表: {e}", "WARNING")
+            return {}
+    
+    def save(self):
+        """儲存擷取狀態"""
+        try:
+            _atomic_write_json(self.path, self.state)
+        except Exception as e:
+            log_message(f"儲存擷取狀態失敗: {e}", "WARNING")
+    
+    @staticmethod
+    def fingerprint(albums: List[Dict[str, Any]]) -> str:
+        """計算一頁相簿列表的指紋（相簿 ID、標題與 NEW 標示）"""
+        digest = hashlib.sha1()
+        for album in albums:
+            digest.update(f"{album.get('album_id')}|{album.get('title')}|{album.get('is_new')}\n".encode("utf-8"))
+        return digest.hexdigest()
+    
+    def is_known_page(self, album_type: str, page_number: int, albums: List[Dict[str, Any]]) -> bool:
+        """頁面中的相簿是否全部都已在先前的擷取中看過"""
+        state = self.state.get(album_type)
+        if not state or not albums:
+            return False
+        
+        if page_number == 1 and self.fingerprint(albums) == state.get("first_page_fingerprint"):
+            return True
+        
+        max_album_id = state.get("max_album_id")
+        if max_album_id is None:
+            return False
+        return all(album.get("album_id") is not None and album["album_id"] <= max_album_id
+                   for album in albums)
+    
+    def stage(self, album_type: str, first_page_albums: List[Dict[str, Any]], albums: List[Dict[str, Any]]):
+        """暫存本次擷取到的相簿列表，等列出的相簿都處理完畢後再以 commit() 寫入
+        
+        擷取列表後就前進 high-water mark 的話，乾跑、篩選過或中途中斷的執行
+        會讓下次擷取在已知頁面停止，沒處理到的相簿就再也不會被列出。
+        """
+        self.pending[album_type] = (first_page_albums, albums)
+    
+    def commit(self):
+        """將暫存的相簿列表併入擷取狀態並儲存"""
+        if not self.pending:
+            return
+        for album_type, (first_page_albums, albums) in self.pending.items():
+            self.update(album_type, first_page_albums, albums)
+        self.pending = {}
+        self.save()
+    
+    def update(self, album_type: str, first_page_albums: List[Dict[str, Any]], albums: List[Dict[str, Any]]):
+        """以本次擷取到的相簿更新 high-water mark"""
+        state = self.state.setdefault(album_type, {})
+        album_ids = [album["album_id"] for album in albums if album.get("album_id") is not None]
+        if album_ids:
+            state["max_album_id"] = max(album_ids + [state.get("max_album_id") or 0])
+        if first_page_albums:
+            state["first_page_fingerprint"] = self.fingerprint(first_page_albums)
+
+class AlbumPhotoCache:
+    """相簿照片清單快取：album_id → 照片連結、分頁數、擷取時間與是否已完整下載
+    
+    已完整下載的相簿不必再擷取照片清單；標示為 NEW 的相簿可能仍在增加照片，
+    超過 ALBUM_CACHE_TTL 秒後會重新擷取一次。
+    """
+    
+    def __init__(self, path: Optional[str] = None):
+        default_path = os.path.join(os.path.dirname(os.path.abspath(Config.DOWNLOAD_HISTORY_FILE)),
+                                    "album_cache.json")
+        self.path = path or getattr(Config, 'ALBUM_CACHE_FILE', default_path)
+        self.ttl = getattr(Config, 'ALBUM_CACHE_TTL', 12 * 3600)
+        self.lock = threading.Lock()
+        self.albums = self._load()
+        self.dirty = False
+    
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """載入相簿快取"""
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            log_message(f"讀取相簿快取失敗，將重新擷取照片清單: {e}", "WARNING")
+            return {}
+    
+    def save(self):
+        """有變更時才寫入硬碟"""
+        with self.lock:
+            if not self.dirty:
+                return
+            try:
+                _atomic_write_json(self.path, self.albums)
+                self.dirty = False
+            except Exception as e:
+                log_message(f"儲存相簿快取失敗: {e}", "WARNING")
+    
+    @staticmethod
+    def album_id_from_url(album_url: str) -> Optional[int]:
+        """從相簿網址取得相簿 ID"""
+        match = re.search(r'albumId=(\d+)', album_url or "")
+        return int(match.group(1)) if match else None
+    
+    def record(self, album_id: Optional[int], photo_urls: List[str], page_count: int):
+        """記錄擷取到的照片清單；清單有變化時重設完成狀態
+        
+        沒有取得任何照片（頁面載入不完整、逾時或登入失效）時不記錄，
+        避免把空清單當成已完整下載的相簿。
+        """
+        if album_id is None or page_count <= 0 or not photo_urls:
+            return
+        key = str(album_id)
+        with self.lock:
+            entry = self.albums.get(key)
+            completed = bool(entry and entry.get("completed") and entry.get("urls") == photo_urls)
+            self.albums[key] = {
+                "urls": list(photo_urls),
+                "page_count": page_count,
+                "scraped_at": time.time(),
+                "completed": completed
+            }
+            self.dirty = True
+    
+    def mark_completed(self, album_id: Optional[int], scraped_after: float = 0):
+        """標示相簿的照片都已下載（或確認為重複）
+        
+        只有在 scraped_after 之後擷取、且至少有一頁與一張照片的清單才會被標示，
+        避免本次擷取失敗時誤將舊的或空的照片清單當成已完成。
+        """
+        with self.lock:
+            entry = self._scraped_entry(album_id, scraped_after)
+            if entry and not entry.get("completed"):
+                entry["completed"] = True
+                self.dirty = True
+    
+    def has_scraped_photos(self, album_id: Optional[int], scraped_after: float = 0) -> bool:
+        """scraped_after 之後是否擷取到這個相簿的照片（至少一頁、一張）"""
+        with self.lock:
+            return self._scraped_entry(album_id, scraped_after) is not None
+    
+    def _scraped_entry(self, album_id: Optional[int], scraped_after: float) -> Optional[Dict[str, Any]]:
+        """取得 scraped_after 之後擷取、內容不是空的記錄（呼叫端需持有 lock）"""
+        if album_id is None:
+            return None
+        entry = self.albums.get(str(album_id))
+        if (not entry or entry.get("page_count", 0) <= 0 or not entry.get("urls")
+                or entry.get("scraped_at", 0) < scraped_after):
+            return None
+        return entry
+    
+    def can_skip(self, album: Dict[str, Any]) -> bool:
+        """相簿是否已完整下載，可以略過照片清單擷取"""
+        album_id = album.get("album_id")
+        if album_id is None:
+            return False
+        with self.lock:
+            entry = self.albums.get(str(album_id))
+            # 舊版可能記錄了空清單，不能當成已完成
+            if not entry or not entry.get("completed") or not entry.get("urls"):
+                return False
+            # NEW 相簿可能仍在新增照片，快取超過 TTL 就重新確認
+            return not album.get("is_new") or time.time() - entry.get("scraped_at", 0) < self.ttl
+
+_album_cache: Optional[AlbumPhotoCache] = None
+_album_cache_lock = threading.Lock()
+
+def get_album_cache() -> AlbumPhotoCache:
+    """取得程式共用的相簿照片清單快取"""
+    global _album_cache
+    with _album_cache_lock:
+        if _album_cache is None:
+            _album_cache = AlbumPhotoCache()
+        return _album_cache
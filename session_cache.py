@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+登入狀態快取模組
+
+登入成功後將 Cookie 連同到期時間存到硬碟（權限 0600），下次執行時先以一個
+不跟隨轉址、不下載內容的請求確認登入狀態仍然有效，有效就直接沿用，
+只有確認失敗時才重新走完整的登入流程。
+
+Cookie 一律以 selenium get_cookies() 的格式保存，瀏覽器與 HTTP 會話可以共用。
+"""
+
+import os
+import json
+import time
+import tempfile
+import requests
+from typing import List, Dict, Any, Optional
+from config import Config
+from utils import log_message
+from rate_limiter import get_rate_limiter
+
+class SessionCache:
+    """硬碟上的登入 Cookie 快取"""
+    
+    def __init__(self, path: Optional[str] = None):
+        default_path = os.path.join(os.path.dirname(os.path.abspath(Config.DOWNLOAD_HISTORY_FILE)),
+                                    "session_cookies.json")
+        self.path = path or getattr(Config, 'SESSION_CACHE_FILE', default_path)
+        self.enabled = getattr(Config, 'SESSION_CACHE_ENABLED', True)
+        # 沒有到期時間的 Cookie 最多沿用的秒數
+        self.max_age = getattr(Config, 'SESSION_CACHE_MAX_AGE', 24 * 3600)
+    
+    def load(self) -> Optional[Dict[str, Any]]:
+        """讀取尚未過期的登入狀態
+        
+        Returns:
+            Dict: {"cookies": [...], "user_agent": ...}；沒有可用的快取時回傳 None
+        """
+        if not self.enabled or not os.path.exists(self.path):
+            return None
+        
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            log_message(f"讀取登入狀態快取失敗: {e}", "WARNING")
+            return None
+        
+        now = time.time()
+        if data.get("username") != Config.USERNAME or now - data.get("saved_at", 0) > self.max_age:
+            return None
+        
+        cookies = [cookie for cookie in data.get("cookies", [])
+                   if not cookie.get("expiry") or cookie["expiry"] > now]
+        if not cookies:
+            return None
+        
+        data["cookies"] = cookies
+        return data
+    
+    def save(self, cookies: List[Dict[str, Any]], user_agent: Optional[str] = None):
+        """儲存登入狀態（只有目前使用者可讀寫）"""
+        if not self.enabled or not cookies:
+            return
+        
+        data = {
+            "saved_at": time.time(),
+            "username": Config.USERNAME,
+            "user_agent": user_agent,
+            "cookies": cookies
+        }
+        try:
+            directory = os.path.dirname(self.path)
+            os.makedirs(directory, exist_ok=True)
+            # mkstemp 建立的檔案權限為 0600，且多個瀏覽器同時登入時不會互相覆寫暫存檔
+            fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".session_cookies.", suffix=".tmp")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            log_message(f"儲存登入狀態快取失敗: {e}", "WARNING")
+    
+    def clear(self):
+        """刪除已失效的登入狀態"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def apply_cookies(session: requests.Session, cookies: List[Dict[str, Any]]):
+    """將 selenium 格式的 Cookie 加入 requests 會話"""
+    for cookie in cookies:
+        session.cookies.set(
+            cookie["name"],
+            cookie["value"],
+            domain=cookie.get("domain", ""),
+            path=cookie.get("path", "/"),
+            secure=cookie.get("secure", False),
+            expires=cookie.get("expiry"),
+            rest={"HttpOnly": None} if cookie.get("httpOnly") else {}
+        )
+
+def session_cookies(session: requests.Session) -> List[Dict[str, Any]]:
+    """將 requests 會話的 Cookie 轉為 selenium 格式"""
+    cookies = []
+    for cookie in session.cookies:
+        item = {
+            "name": cookie.name,
+            "value": cookie.value,
+            "domain": cookie.domain,
+            "path": cookie.path,
+            "secure": bool(cookie.secure),
+            "httpOnly": cookie.has_nonstandard_attr("HttpOnly")
+        }
+        if cookie.expires:
+            item["expiry"] = cookie.expires
+        cookies.append(item)
+    return cookies
+
+def probe_session(session: requests.Session, url: Optional[str] = None) -> bool:
+    """以單一請求確認登入狀態是否有效
+    
+    不跟隨轉址也不下載頁面內容；被導向登入頁面（3xx）或請求失敗都視為無效。
+    """
+    url = url or Config.SCHOOL_ALBUMS_URL
+    get_rate_limiter(url, "page").acquire()
+    try:
+        response = session.get(url, allow_redirects=False, stream=True, timeout=10)
+        response.close()
+    except requests.RequestException as e:
+        log_message(f"確認登入狀態失敗: {e}", "WARNING")
+        return False
+    return response.status_code == 200
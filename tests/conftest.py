@@ -0,0 +1,49 @@
+"""
+測試共用設定
+
+config.py 含有登入資訊，不在版本控制中；測試時改用指向暫存目錄的設定，
+避免讀寫實際的下載歷史與快取。
+"""
+
+import os
+import sys
+import types
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class Config:
+    """測試用設定（各測試的路徑由 config fixture 指向 tmp_path）"""
+    
+    BASE_DOWNLOAD_PATH = ""
+    DOWNLOAD_HISTORY_FILE = ""
+    LOGIN_URL = "http://127.0.0.1:1/Login"
+    SCHOOL_ALBUMS_URL = "http://127.0.0.1:1/Activity/School-Album"
+    CLASS_ALBUMS_URL = "http://127.0.0.1:1/Activity/Class-Album"
+    USERNAME = "user"
+    PASSWORD = "password"
+    USER_AGENT = "pytest"
+    BROWSER_TIMEOUT = 5
+    DEFAULT_DAYS_BACK = 7
+    MAX_RETRIES = 3
+    DOWNLOAD_DELAY = 0
+    
+    @staticmethod
+    def ensure_directories():
+        os.makedirs(Config.BASE_DOWNLOAD_PATH, exist_ok=True)
+    
+    @staticmethod
+    def get_chrome_options():
+        return ["--headless"]
+
+sys.modules["config"] = types.SimpleNamespace(Config=Config)
+
+@pytest.fixture(autouse=True)
+def config(tmp_path, monkeypatch):
+    """每個測試使用獨立的下載目錄、歷史檔與快取"""
+    import scrape_cache
+    
+    monkeypatch.setattr(Config, "BASE_DOWNLOAD_PATH", str(tmp_path / "photos"), raising=False)
+    monkeypatch.setattr(Config, "DOWNLOAD_HISTORY_FILE", str(tmp_path / "download_history.json"), raising=False)
+    monkeypatch.setattr(scrape_cache, "_album_cache", None)
+    return Config
@@ -0,0 +1,58 @@
+"""相簿照片清單快取：只有確實擷取到照片並全部下載的相簿才會被略過"""
+
+from datetime import datetime
+from browser_handler import BrowserHandler
+from downloader import PhotoDownloader
+
+ALBUM_URL = "https://example.com/Activity/AlbumDetail?albumId=1600001&pageIndex=1"
+
+def photo_url(i: int) -> str:
+    return f"https://isai-prod-v2.s3.hicloud.net.tw/image_as0_albumId1600001_{i:032x}.jpg"
+
+class FakeBrowser(BrowserHandler):
+    """以固定內容取代相簿頁面，照片清單仍經過 _finalize_photo_list 處理"""
+    
+    def __init__(self, photos):
+        super().__init__()
+        self.photos = photos
+        self.calls = 0
+    
+    def get_album_photos(self, album_url, history_manager=None, filter_duplicates=True):
+        self.calls += 1
+        # 頁面有載入（1 頁），但可能沒有任何照片連結
+        return self._finalize_photo_list(list(self.photos), 1, history_manager, filter_duplicates, album_url)
+
+def make_album():
+    return {"album_id": 1600001, "title": "相簿", "link": ALBUM_URL, "date": datetime(2025, 1, 1),
+            "date_text": "2025-01-01", "is_new": False}
+
+def run(browser):
+    """執行一次下載；照片一律視為下載成功並寫入歷史"""
+    downloader = PhotoDownloader()
+    
+    def fake_download(tasks, pbar):
+        for url, filepath, filename in tasks:
+            downloader.history_manager.add_download_record(url, filename, filepath, 1, f"{hash(url) & 0xffff:032x}")
+            downloader._record_photo_result(True, filename, pbar)
+        return len(tasks)
+    
+    downloader._download_photos_concurrently = fake_download
+    assert downloader.download_albums({"校園相簿": [make_album()]}, browser)
+    downloader.close()
+
+def test_album_without_photos_is_offered_again():
+    browser = FakeBrowser([])
+    run(browser)
+    run(browser)
+    assert browser.calls == 2
+    
+    # 之後照片出現時仍會被擷取並下載
+    browser.photos = [photo_url(1), photo_url(2)]
+    run(browser)
+    assert browser.calls == 3
+
+def test_downloaded_album_is_skipped():
+    browser = FakeBrowser([photo_url(1), photo_url(2)])
+    run(browser)
+    run(browser)
+    assert browser.calls == 1
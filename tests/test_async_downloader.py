@@ -0,0 +1,80 @@
+"""非同步下載引擎：整個執行期間共用同一個事件迴圈與連線池"""
+
+import io
+import random
+import threading
+import pytest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from PIL import Image
+from tqdm import tqdm
+from downloader import PhotoDownloader
+from rate_limiter import reset_rate_limiters
+
+aiohttp = pytest.importorskip("aiohttp")
+
+def make_jpeg(seed: int) -> bytes:
+    rng = random.Random(seed)
+    image = Image.new("RGB", (64, 64))
+    image.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(64 * 64)])
+    output = io.BytesIO()
+    image.save(output, "JPEG", quality=95)
+    return output.getvalue()
+
+class PhotoHandler(BaseHTTPRequestHandler):
+    """回傳照片，並記錄每個請求使用的連線"""
+    
+    protocol_version = "HTTP/1.1"
+    
+    def do_GET(self):
+        self.server.connections.add(self.client_address)
+        body = make_jpeg(int(self.path.split("_")[-1].split(".")[0], 16) % 1000)
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), PhotoHandler)
+    httpd.connections = set()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    reset_rate_limiters()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+def album_tasks(server, tmp_path, album: int, count: int):
+    folder = tmp_path / f"album{album}"
+    folder.mkdir()
+    tasks = []
+    for i in range(count):
+        filename = f"{i + 1:03d}.jpg"
+        url = f"http://127.0.0.1:{server.server_port}/image_as0_albumId{album}_{album * 100 + i:032x}.jpg"
+        tasks.append((url, str(folder / filename), filename))
+    return tasks
+
+def test_albums_share_loop_and_connections(server, config, tmp_path):
+    downloader = PhotoDownloader(max_workers=1, engine="async")
+    downloader.init_session()
+    try:
+        with tqdm(total=6, disable=True) as pbar:
+            assert downloader._download_photos_concurrently(album_tasks(server, tmp_path, 1, 3), pbar) == 3
+            engine = downloader.async_engine
+            loop, session = engine._loop, engine._session
+            assert downloader._download_photos_concurrently(album_tasks(server, tmp_path, 2, 3), pbar) == 3
+        
+        assert downloader.async_engine is engine
+        assert engine._loop is loop and engine._session is session
+        # 只有一條連線，第二個相簿沿用第一個相簿的連線
+        assert len(server.connections) == 1
+        assert downloader.download_stats["downloaded_photos"] == 6
+    finally:
+        downloader.close()
+    
+    assert downloader.async_engine is None
+    assert not engine._thread and session.closed
@@ -0,0 +1,59 @@
+"""常駐瀏覽器的狀態檔權限與使用鎖"""
+
+import os
+import stat
+import browser_daemon
+from browser_daemon import BrowserDaemon, acquire_lock, release_lock
+
+class FakeHandler:
+    def __init__(self):
+        self.checks = 0
+    
+    def is_alive(self):
+        self.checks += 1
+        return True
+    
+    def browser_session_valid(self):
+        return True
+
+def test_state_file_is_private(config):
+    browser_daemon._write_state({"pid": os.getpid(), "status": "ready", "debugger_address": "localhost:45678"})
+    browser_daemon.touch_lease()
+    for path in (browser_daemon._state_path(), browser_daemon._lease_path()):
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+def test_health_check_waits_for_clients(config):
+    daemon = BrowserDaemon()
+    daemon.handler = FakeHandler()
+    
+    client_lock = acquire_lock(shared=True)
+    daemon._check_browser({})
+    assert daemon.handler.checks == 0
+    
+    release_lock(client_lock)
+    daemon._check_browser({})
+    assert daemon.handler.checks == 1
+
+def test_idle_shutdown_waits_for_clients(config):
+    daemon = BrowserDaemon()
+    daemon.idle_timeout = 60
+    browser_daemon.touch_lease()
+    # 租約已超過閒置時間，但仍有程序持有共享鎖（例如長時間處理同一頁面）
+    stale = os.path.getmtime(browser_daemon._lease_path()) - 120
+    os.utime(browser_daemon._lease_path(), (stale, stale))
+    
+    client_lock = acquire_lock(shared=True)
+    assert daemon._acquire_idle_shutdown() is None
+    
+    release_lock(client_lock)
+    shutdown_lock = daemon._acquire_idle_shutdown()
+    assert shutdown_lock is not None
+    # 關閉期間持有獨佔鎖，其他程序無法連接
+    assert acquire_lock(shared=True, blocking=False) is None
+    release_lock(shutdown_lock)
+
+def test_idle_shutdown_waits_for_timeout(config):
+    daemon = BrowserDaemon()
+    daemon.idle_timeout = 60
+    browser_daemon.touch_lease()
+    assert daemon._acquire_idle_shutdown() is None
@@ -0,0 +1,57 @@
+"""相簿列表的擷取狀態只在列出的相簿都處理完畢後才前進"""
+
+from datetime import datetime
+import pytest
+from browser_handler import BrowserHandler
+from downloader import AlbumDownloadManager
+from scrape_cache import CrawlState, AlbumPhotoCache
+
+def make_album(album_id: int, title: str):
+    return {"album_id": album_id, "title": title,
+            "link": f"https://example.com/Activity/AlbumDetail?albumId={album_id}&pageIndex=1",
+            "date": datetime(2025, 1, 1), "date_text": "2025-01-01", "is_new": False}
+
+class FakeBrowser(BrowserHandler):
+    """固定的相簿列表，每本相簿一張照片"""
+    
+    def init_browser(self):
+        return True
+    
+    def login(self):
+        return True
+    
+    def _load_albums_page(self, page_url, album_type):
+        return [make_album(1600002, "運動會"), make_album(1600001, "畢業典禮")]
+    
+    def get_album_photos(self, album_url, history_manager=None, filter_duplicates=True):
+        album_id = AlbumPhotoCache.album_id_from_url(album_url)
+        url = f"https://isai-prod-v2.s3.hicloud.net.tw/image_as0_albumId{album_id}_{album_id:032x}.jpg"
+        return self._finalize_photo_list([url], 1, history_manager, filter_duplicates, album_url)
+
+def run(fail=False, **kwargs):
+    manager = AlbumDownloadManager(prevent_sleep=False)
+    manager.browser = FakeBrowser()
+    downloader = manager.downloader
+    
+    def fake_download(tasks, pbar):
+        if fail:
+            for _, _, filename in tasks:
+                downloader._record_photo_result(False, filename, pbar)
+            return 0
+        for url, filepath, filename in tasks:
+            downloader.history_manager.add_download_record(url, filename, filepath, 1, f"{hash(url) & 0xffff:032x}")
+            downloader._record_photo_result(True, filename, pbar)
+        return len(tasks)
+    
+    downloader._download_photos_concurrently = fake_download
+    assert manager.download_albums_by_date_range(datetime(2025, 1, 1), datetime(2025, 1, 31),
+                                                 album_types=["校園相簿"], **kwargs)
+
+@pytest.mark.parametrize("kwargs", [{"dry_run": True}, {"keywords": ["運動"]}, {"new_only": True}, {"fail": True}])
+def test_partial_runs_do_not_advance_crawl_state(kwargs):
+    run(**kwargs)
+    assert "校園相簿" not in CrawlState().state
+
+def test_completed_run_advances_crawl_state():
+    run()
+    assert CrawlState().state["校園相簿"]["max_album_id"] == 1600002
@@ -0,0 +1,68 @@
+"""下載歷史：快照索引的驗證、日誌重播與快照寫入"""
+
+import os
+import json
+import stat
+from utils import DownloadHistoryManager
+
+def photo_url(i: int) -> str:
+    return f"https://isai-prod-v2.s3.hicloud.net.tw/image_as0_albumId1600001_{i:032x}.jpg?X-Amz-Signature=x"
+
+def test_stale_index_is_rebuilt_after_remove_and_add(config, tmp_path):
+    history_file = str(tmp_path / "download_history.json")
+    manager = DownloadHistoryManager(history_file)
+    for i in (1, 2):
+        manager.add_download_record(photo_url(i), f"{i:03d}.jpg", str(tmp_path / f"{i:03d}.jpg"), 1, f"{i:032x}")
+    assert manager.compact()
+    manager.close()
+    
+    # 舊版程式移除一筆又新增一筆後寫回：記錄數量不變，索引與 index_meta 原封不動
+    with open(history_file, encoding="utf-8") as f:
+        snapshot = json.load(f)
+    downloads = snapshot["downloads"]
+    removed_key = next(key for key in downloads if key.startswith("001.jpg|"))
+    del downloads[removed_key]
+    downloads[f"003.jpg|{photo_url(3)}"] = {
+        "url": photo_url(3), "filename": "003.jpg", "filepath": str(tmp_path / "003.jpg"),
+        "file_size": 1, "file_hash": f"{3:032x}", "download_time": "2025-01-01T00:00:00"
+    }
+    with open(history_file, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+    
+    manager = DownloadHistoryManager(history_file)
+    assert manager.filter_known_urls([photo_url(1), photo_url(2), photo_url(3)]) == [photo_url(1)]
+    assert manager.find_remote_record(photo_url(1)) is None
+    assert manager.find_remote_record(photo_url(3))["filename"] == "003.jpg"
+    assert manager.find_remote_record(photo_url(2))["filename"] == "002.jpg"
+    manager.close()
+
+def test_bad_journal_line_only_skips_that_entry(config, tmp_path):
+    history_file = str(tmp_path / "download_history.json")
+    manager = DownloadHistoryManager(history_file)
+    for i in (1, 2, 3):
+        manager.add_download_record(photo_url(i), f"{i:03d}.jpg", str(tmp_path / f"{i:03d}.jpg"), 1, f"{i:032x}")
+    manager.close()
+    
+    # 第二筆損毀，最後再接上一行寫到一半的記錄
+    with open(f"{history_file}.journal", "rb") as f:
+        lines = f.read().splitlines(keepends=True)
+    lines[1] = b'{"op":"add","key":\xff\n'
+    with open(f"{history_file}.journal", "wb") as f:
+        f.writelines(lines)
+        f.write(b'{"op":"add","key":"004.jpg|')
+    
+    manager = DownloadHistoryManager(history_file)
+    assert manager.filter_known_urls([photo_url(1), photo_url(2), photo_url(3)]) == [photo_url(2)]
+    manager.close()
+
+def test_compaction_keeps_file_mode(config, tmp_path):
+    history_file = str(tmp_path / "download_history.json")
+    manager = DownloadHistoryManager(history_file)
+    manager.add_download_record(photo_url(1), "001.jpg", str(tmp_path / "001.jpg"), 1, f"{1:032x}")
+    assert manager.compact()
+    os.chmod(history_file, 0o644)
+    
+    manager.add_download_record(photo_url(2), "002.jpg", str(tmp_path / "002.jpg"), 1, f"{2:032x}")
+    assert manager.compact()
+    assert stat.S_IMODE(os.stat(history_file).st_mode) == 0o644
+    manager.close()
@@ -0,0 +1,62 @@
+"""照片寫入下載目錄時不佔用歷史記錄的鎖，相同內容仍只會寫入一次"""
+
+import io
+import os
+import threading
+import time
+from PIL import Image
+from download_stage import StagedDownload
+from downloader import PhotoDownloader
+
+def make_jpeg() -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", (64, 64), (200, 30, 30)).save(output, "JPEG")
+    return output.getvalue()
+
+def photo_url(i: int) -> str:
+    return f"https://isai-prod-v2.s3.hicloud.net.tw/image_as0_albumId1600001_{i:032x}.jpg"
+
+def make_stage(album_dir, i: int, data: bytes) -> StagedDownload:
+    stage = StagedDownload(str(album_dir / f"2025-01-01_{i:03d}.jpg"), photo_url(i))
+    stage.write(data)
+    return stage
+
+def test_commit_runs_outside_history_lock(config, tmp_path, monkeypatch):
+    album_dir = tmp_path / "photos" / "album"
+    album_dir.mkdir(parents=True)
+    downloader = PhotoDownloader()
+    lock_free_during_commit = []
+    original_commit = StagedDownload.commit
+    
+    def check_lock():
+        lock = downloader.history_manager.lock
+        acquired = lock.acquire(timeout=1)
+        if acquired:
+            lock.release()
+        lock_free_during_commit.append(acquired)
+    
+    def slow_commit(stage):
+        # 寫入期間其他執行緒仍能查詢下載歷史
+        checker = threading.Thread(target=check_lock)
+        checker.start()
+        checker.join()
+        time.sleep(0.2)
+        original_commit(stage)
+    
+    monkeypatch.setattr(StagedDownload, "commit", slow_commit)
+    data = make_jpeg()
+    results = []
+    threads = [threading.Thread(target=lambda i=i: results.append(
+        downloader._finalize_download(photo_url(i), make_stage(album_dir, i, data), f"2025-01-01_{i:03d}.jpg")))
+        for i in (1, 2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert lock_free_during_commit == [True]
+    assert sorted(results) == [False, True]
+    assert downloader.download_stats["duplicate_photos"] == 1
+    assert len([name for name in os.listdir(album_dir) if name.endswith(".jpg")]) == 1
+    assert len(downloader.history_manager.history["downloads"]) == 1
+    downloader.close()
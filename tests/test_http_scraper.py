@@ -0,0 +1,112 @@
+"""HTTP 模式的相簿分頁：沒有 pageIndex 的網址也會分頁，各分頁執行緒使用自己的會話"""
+
+import re
+import threading
+import pytest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from http_scraper import HttpScraper
+from rate_limiter import reset_rate_limiters
+from scrape_cache import get_album_cache
+
+PAGES = 3
+PHOTOS_PER_PAGE = 2
+
+def photo_url(page: int, i: int) -> str:
+    return f"https://isai-prod-v2.s3.hicloud.net.tw/image_as0_albumId1600001_{page:016x}{i:016x}.jpg"
+
+class AlbumHandler(BaseHTTPRequestHandler):
+    """相簿頁面；沒有 pageIndex 時顯示第 1 頁，超出範圍時顯示最後一頁（或回應 server.past_end_status）；
+    server.failing_pages 中的頁面回應 500；沒有登入 Cookie 時導向登入頁"""
+    
+    def do_GET(self):
+        if "auth=1" not in (self.headers.get("Cookie") or ""):
+            self.send_response(302)
+            self.send_header("Location", "/Login")
+            self.end_headers()
+            return
+        
+        match = re.search(r"pageIndex=(\d+)", self.path)
+        requested = int(match.group(1)) if match else 1
+        with self.server.lock:
+            self.server.pages.append(match.group(1) if match else None)
+        status = 500 if requested in self.server.failing_pages else None
+        if requested > PAGES:
+            status = status or self.server.past_end_status
+        if status:
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        page = min(requested, PAGES)
+        links = "".join(f'<a class="photo-gallery albumbgphoto" href="{photo_url(page, i)}"></a>'
+                        for i in range(PHOTOS_PER_PAGE))
+        body = f"<html><body>{links}</body></html>".encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), AlbumHandler)
+    httpd.pages = []
+    httpd.past_end_status = None
+    httpd.failing_pages = set()
+    httpd.lock = threading.Lock()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    reset_rate_limiters()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+    reset_rate_limiters()
+
+def test_album_without_page_index_is_paginated(server, config, monkeypatch):
+    monkeypatch.setattr(config, "PAGE_FETCH_BATCH", 2, raising=False)
+    scraper = HttpScraper()
+    scraper.init_browser()
+    scraper.session.cookies.set("auth", "1", domain="127.0.0.1")
+    
+    album_url = f"http://127.0.0.1:{server.server_port}/Activity/AlbumDetail?albumId=1600001"
+    photos = scraper.get_album_photos(album_url, filter_duplicates=False)
+    
+    assert len(photos) == PAGES * PHOTOS_PER_PAGE
+    assert None not in server.pages
+    # 每個分頁執行緒各有一個會話，登入 Cookie 仍與主會話共用
+    assert 1 <= len(scraper._page_sessions) <= 2
+    assert all(session is not scraper.session and session.cookies is scraper.session.cookies
+               for session in scraper._page_sessions)
+    assert scraper.last_response is None
+    scraper.close()
+    assert scraper._page_sessions == []
+
+def make_scraper(config, monkeypatch):
+    monkeypatch.setattr(config, "PAGE_FETCH_BATCH", 4, raising=False)
+    scraper = HttpScraper()
+    scraper.init_browser()
+    scraper.session.cookies.set("auth", "1", domain="127.0.0.1")
+    return scraper
+
+def album_url(server):
+    return f"http://127.0.0.1:{server.server_port}/Activity/AlbumDetail?albumId=1600001&pageIndex=1"
+
+@pytest.mark.parametrize("status", [404, 500, 429])
+def test_error_past_last_page_keeps_collected_photos(server, config, monkeypatch, status):
+    server.past_end_status = status
+    scraper = make_scraper(config, monkeypatch)
+    photos = scraper.get_album_photos(album_url(server), filter_duplicates=False)
+    scraper.close()
+    
+    assert len(photos) == PAGES * PHOTOS_PER_PAGE
+    # 404 代表已經沒有下一頁；其他錯誤無法確定後面沒有照片，不記錄到相簿快取
+    assert (get_album_cache().albums.get("1600001") is not None) == (status == 404)
+
+def test_first_page_error_fails_album(server, config, monkeypatch):
+    server.failing_pages = {1}
+    scraper = make_scraper(config, monkeypatch)
+    assert scraper.get_album_photos(album_url(server), filter_duplicates=False) == []
+    scraper.close()
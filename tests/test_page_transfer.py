@@ -0,0 +1,40 @@
+"""瀏覽器頁面的資源封鎖規則與傳輸量統計"""
+
+import json
+import re
+from browser_handler import BrowserHandler
+
+def cdp_matches(pattern: str, url: str) -> bool:
+    """Network.setBlockedURLs 的比對方式：* 可代表任意字元，其餘字元照字面比對整個網址"""
+    return re.fullmatch(".*".join(map(re.escape, pattern.split("*"))), url) is not None
+
+def blocked(url: str) -> bool:
+    return any(cdp_matches(pattern, url) for pattern in BrowserHandler.BLOCKED_RESOURCE_PATTERNS)
+
+def test_block_patterns_match_urls_with_query_strings():
+    assert blocked("https://isai-prod-v2.s3.hicloud.net.tw/image_as0_albumId1_ab.jpg?X-Amz-Signature=abc")
+    assert blocked("https://example.com/Content/site.css?v=20250101")
+    assert blocked("https://example.com/Content/site.css")
+    assert not blocked("https://example.com/Activity/AlbumDetail?albumId=1600001&pageIndex=1")
+
+class FakeDriver:
+    def __init__(self, events):
+        self.events = events
+    
+    def get_log(self, log_type):
+        assert log_type == "performance"
+        events, self.events = self.events, []
+        return [{"message": json.dumps({"message": event})} for event in events]
+
+def test_transfer_counts_cross_origin_resources():
+    browser = BrowserHandler()
+    browser.measure_transfer = True
+    browser.driver = FakeDriver([
+        {"method": "Network.responseReceived", "params": {"requestId": "1"}},
+        {"method": "Network.loadingFinished", "params": {"requestId": "1", "encodedDataLength": 5000}},
+        # 跨來源的 S3 照片：Resource Timing 的 transferSize 為 0，CDP 仍回報實際大小
+        {"method": "Network.loadingFinished", "params": {"requestId": "2", "encodedDataLength": 120000.0}},
+    ])
+    assert browser._read_page_transfer() == {"bytes": 125000, "resources": 2}
+    assert browser._read_page_transfer() == {"bytes": 0, "resources": 0}
+    browser.driver = None
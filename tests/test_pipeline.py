@@ -0,0 +1,62 @@
+"""擷取照片清單的背景執行緒結束或下載端中止時，兩邊都不會無限期等待"""
+
+import threading
+import time
+from datetime import datetime
+import pytest
+from browser_handler import BrowserHandler
+from downloader import PhotoDownloader
+
+def make_album(album_id: int):
+    return {"album_id": album_id, "title": f"相簿{album_id}",
+            "link": f"https://example.com/Activity/AlbumDetail?albumId={album_id}&pageIndex=1",
+            "date": datetime(2025, 1, 1), "date_text": "2025-01-01", "is_new": False}
+
+class SlowBrowser(BrowserHandler):
+    """第一本相簿立即回傳，之後每本相簿都要擷取很久"""
+    
+    def get_album_photos(self, album_url, history_manager=None, filter_duplicates=True):
+        if "albumId=1600001" not in album_url:
+            time.sleep(5)
+        return []
+
+def run_in_thread(target):
+    result = {}
+    
+    def runner():
+        try:
+            result["value"] = target()
+        except BaseException as e:
+            result["error"] = e
+    
+    thread = threading.Thread(target=runner, daemon=True)
+    started = time.monotonic()
+    thread.start()
+    thread.join(timeout=10)
+    assert not thread.is_alive(), "下載端沒有結束"
+    return result, time.monotonic() - started
+
+def test_dead_scraper_does_not_hang_download(config):
+    downloader = PhotoDownloader()
+    
+    def broken_can_skip(album):
+        raise RuntimeError("擷取執行緒發生錯誤")
+    
+    downloader.album_cache.can_skip = broken_can_skip
+    result, _ = run_in_thread(lambda: downloader.download_albums(
+        {"校園相簿": [make_album(1600001), make_album(1600002)]}, BrowserHandler()))
+    assert result["value"] is False
+    downloader.close()
+
+def test_interrupt_does_not_wait_for_current_scrape(config, monkeypatch):
+    downloader = PhotoDownloader()
+    
+    def interrupted(*args, **kwargs):
+        raise KeyboardInterrupt
+    
+    monkeypatch.setattr(downloader, "_download_single_album", interrupted)
+    albums = [make_album(1600001 + i) for i in range(3)]
+    result, elapsed = run_in_thread(lambda: downloader.download_albums({"校園相簿": albums}, SlowBrowser()))
+    assert isinstance(result["error"], KeyboardInterrupt)
+    assert elapsed < 3
+    downloader.close()
@@ -0,0 +1,94 @@
+"""中斷的下載在下次執行（重新編號、網址簽章不同）時仍會以 Range 請求續傳"""
+
+import io
+import os
+import random
+import threading
+import pytest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from PIL import Image
+from rate_limiter import reset_rate_limiters
+from downloader import PhotoDownloader
+
+def make_jpeg() -> bytes:
+    rng = random.Random(1)
+    image = Image.new("RGB", (200, 200))
+    image.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(200 * 200)])
+    output = io.BytesIO()
+    image.save(output, "JPEG", quality=95)
+    return output.getvalue()
+
+class PhotoHandler(BaseHTTPRequestHandler):
+    """支援 Range 的照片伺服器；drop_first 為 True 時第一次回應只送出一半就中斷連線"""
+    
+    def do_GET(self):
+        data = self.server.data
+        range_header = self.headers.get("Range")
+        self.server.ranges.append(range_header)
+        
+        if range_header:
+            start = int(range_header.split("=")[1].split("-")[0])
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+            body = data[start:]
+        else:
+            self.send_response(200)
+            body = data
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", '"photo"')
+        self.end_headers()
+        
+        if self.server.drop_first:
+            self.server.drop_first = False
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), PhotoHandler)
+    httpd.data = make_jpeg()
+    httpd.ranges = []
+    httpd.drop_first = True
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    reset_rate_limiters()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+def test_interrupted_download_resumes_after_renumbering(server, config, tmp_path, monkeypatch):
+    base = f"http://127.0.0.1:{server.server_port}/image_as0_albumId1_{'ab' * 16}.jpg"
+    album_dir = tmp_path / "photos" / "album"
+    album_dir.mkdir(parents=True)
+    
+    # 第一次執行：連線中斷且不再重試，程式結束
+    monkeypatch.setattr(config, "MAX_RETRIES", 1)
+    downloader = PhotoDownloader()
+    downloader.init_session()
+    first_path = str(album_dir / "2025-01-01_001.jpg")
+    assert not downloader._download_photo(f"{base}?X-Amz-Signature=a", first_path, "2025-01-01_001.jpg")
+    assert not os.path.exists(first_path)
+    partials = os.listdir(album_dir / ".partial")
+    assert f"{'ab' * 16}.part" in partials
+    received = os.path.getsize(album_dir / ".partial" / f"{'ab' * 16}.part")
+    assert 0 < received < len(server.data)
+    downloader.close()
+    
+    # 下次執行：照片被重新編號，網址簽章也不同
+    downloader = PhotoDownloader()
+    downloader.init_session()
+    second_path = str(album_dir / "2025-01-01_005.jpg")
+    assert downloader._download_photo(f"{base}?X-Amz-Signature=b", second_path, "2025-01-01_005.jpg")
+    downloader.close()
+    
+    assert server.ranges[-1] == f"bytes={received}-"
+    with open(second_path, "rb") as f:
+        assert f.read() == server.data
+    assert not os.path.exists(album_dir / ".partial")
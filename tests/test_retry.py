@@ -0,0 +1,91 @@
+"""照片下載的重試：4xx 不重試，5xx 以指數退避重試；頁面限速器不拖慢並行分頁"""
+
+import io
+import random
+import threading
+import pytest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from PIL import Image
+from downloader import PhotoDownloader
+from rate_limiter import AdaptiveRateLimiter, get_rate_limiter, reset_rate_limiters
+
+def make_jpeg() -> bytes:
+    rng = random.Random(2)
+    image = Image.new("RGB", (64, 64))
+    image.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(64 * 64)])
+    output = io.BytesIO()
+    image.save(output, "JPEG", quality=95)
+    return output.getvalue()
+
+class StatusHandler(BaseHTTPRequestHandler):
+    """依序回應 server.statuses 中的狀態碼，用完後回傳照片"""
+    
+    def do_GET(self):
+        self.server.requests += 1
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        body = self.server.data if status == 200 else b"error"
+        self.send_response(status)
+        self.send_header("Content-Type", "image/jpeg" if status == 200 else "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StatusHandler)
+    httpd.data = make_jpeg()
+    httpd.requests = 0
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    reset_rate_limiters()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+@pytest.fixture
+def backoffs(monkeypatch):
+    """記錄每次重試前的退避，不實際等待"""
+    recorded = []
+    
+    def retry_delay(retries):
+        recorded.append(retries)
+        return 0.0
+    
+    monkeypatch.setattr(AdaptiveRateLimiter, "retry_delay", staticmethod(retry_delay))
+    return recorded
+
+def download(server, tmp_path):
+    downloader = PhotoDownloader()
+    downloader.init_session()
+    url = f"http://127.0.0.1:{server.server_port}/image_as0_albumId1_{'cd' * 16}.jpg"
+    try:
+        return downloader._download_photo(url, str(tmp_path / "001.jpg"), "001.jpg")
+    finally:
+        downloader.close()
+
+def test_not_found_is_not_retried(server, config, tmp_path, backoffs):
+    server.statuses = [404]
+    assert not download(server, tmp_path)
+    assert server.requests == 1
+    assert backoffs == []
+
+def test_server_error_is_retried_with_backoff(server, config, tmp_path, backoffs, monkeypatch):
+    monkeypatch.setattr(config, "MAX_RETRIES", 3)
+    server.statuses = [503, 500]
+    assert download(server, tmp_path)
+    assert server.requests == 3
+    assert backoffs == [1, 2]
+
+def test_retry_delay_grows_exponentially():
+    assert all(0.5 <= AdaptiveRateLimiter.retry_delay(1) <= 1.0 for _ in range(20))
+    assert all(2.0 <= AdaptiveRateLimiter.retry_delay(3) <= 4.0 for _ in range(20))
+
+def test_page_limiter_lets_a_whole_batch_through(config, monkeypatch):
+    monkeypatch.setattr(config, "PAGE_FETCH_BATCH", 4, raising=False)
+    reset_rate_limiters()
+    limiter = get_rate_limiter("https://example.com/Activity/AlbumDetail", "page")
+    assert [limiter.reserve() for _ in range(4)] == [0.0] * 4
+    reset_rate_limiters()
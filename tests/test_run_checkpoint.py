@@ -0,0 +1,46 @@
+"""執行進度檢查點：以天數指定日期範圍時隔天重新執行仍沿用，寫入時先 fsync"""
+
+import os
+from datetime import datetime
+import run_checkpoint
+from browser_handler import BrowserHandler
+from downloader import AlbumDownloadManager
+from run_checkpoint import RunCheckpoint
+
+class FakeBrowser(BrowserHandler):
+    def init_browser(self):
+        return True
+    
+    def login(self):
+        return True
+    
+    def _load_albums_page(self, page_url, album_type):
+        return []
+
+def run_signature(start_date, end_date, date_spec):
+    """執行一次下載管理器，回傳交給 download_albums 的檢查點簽章"""
+    manager = AlbumDownloadManager(prevent_sleep=False)
+    manager.browser = FakeBrowser()
+    signatures = []
+    manager.downloader.download_albums = lambda albums_data, browser, dry_run, signature: signatures.append(signature) or True
+    assert manager.download_albums_by_date_range(start_date, end_date, album_types=["校園相簿"], date_spec=date_spec)
+    return signatures[0]
+
+def test_days_back_run_keeps_signature_across_days(config):
+    today = run_signature(datetime(2025, 3, 1, 23, 0), datetime(2025, 3, 8, 23, 0), "days_back=7")
+    tomorrow = run_signature(datetime(2025, 3, 2, 8, 0), datetime(2025, 3, 9, 8, 0), "days_back=7")
+    assert today == tomorrow
+    assert today != run_signature(datetime(2025, 3, 2), datetime(2025, 3, 9), "days_back=14")
+
+def test_save_syncs_before_replace(config, monkeypatch):
+    calls = []
+    original_fsync = os.fsync
+    original_replace = os.replace
+    monkeypatch.setattr(run_checkpoint.os, "fsync", lambda fd: calls.append("fsync") or original_fsync(fd))
+    monkeypatch.setattr(run_checkpoint.os, "replace", lambda src, dst: calls.append("replace") or original_replace(src, dst))
+    
+    checkpoint = RunCheckpoint("signature")
+    checkpoint.complete_album({"album_id": 1600001})
+    checkpoint.save()
+    assert calls == ["fsync", "replace"]
+    assert RunCheckpoint("signature").completed_albums == {"1600001"}
@@ -1,12 +1,22 @@
 import os
+import gc
+import sys
 import json
 import re
+import stat
 import hashlib
+import time
+import tempfile
+import threading
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional, Tuple
-from urllib.parse import urlparse, unquote
+from urllib.parse import urlparse, urlsplit, unquote
 import unicodedata
 
+# 載入模組時（尚未啟動其他執行緒）讀取 umask，之後不必再暫時改動行程的 umask
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
 class DateUtils:
     """日期處理工具類"""
     
@@ -81,14 +91,173 @@ class FileUtils:
             return hash_md5.hexdigest()
         except Exception:
             return ""
+    
+    @staticmethod
+    def copy_file_mode(temp_path: str, path: str):
+        """讓 mkstemp 建立的暫存檔（權限固定為 0600）沿用原檔案的權限
+        
+        原檔案不存在時使用一般新建檔案的權限（0666 扣除 umask）。
+        """
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            mode = 0o666 & ~_UMASK
+        os.chmod(temp_path, mode)
+
+class DownloadRecord:
+    """單筆下載記錄
+    
+    以 __slots__ 保存欄位：MD5 存成 16 位元組，檔案路徑拆成資料夾與檔名，
+    資料夾字串經 sys.intern 後由同一資料夾的記錄共用（檔名與 filename 相同時不另外保存）。
+    get() 與 [] 的用法與原本的 dict 記錄相同，另外可用 "file_key" 取得記錄的鍵值，
+    因此雜湊值索引可以直接引用記錄本身。
+    """
+    
+    __slots__ = ("key", "url", "filename", "_directory", "_basename", "file_size", "download_time", "_digest")
+    FIELDS = ("url", "filename", "filepath", "file_size", "download_time", "file_hash")
+    
+    def __init__(self, key: str, url: str, filename: str, filepath: str, file_size: int,
+                 download_time: str, file_hash: Optional[str]):
+        self.key = key
+        self.url = url
+        self.filename = filename
+        self.filepath = filepath
+        self.file_size = file_size
+        self.download_time = download_time
+        self.file_hash = file_hash
+    
+    @classmethod
+    def from_dict(cls, key: str, data: Dict[str, Any]) -> "DownloadRecord":
+        """由歷史檔或日誌中的 dict 記錄建立"""
+        return cls(key, data.get("url", ""), data.get("filename", ""), data.get("filepath") or "",
+                   data.get("file_size", 0), data.get("download_time", ""), data.get("file_hash"))
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """轉成寫入歷史檔的 dict 格式"""
+        return {name: getattr(self, name) for name in self.FIELDS}
+    
+    @staticmethod
+    def to_digest(file_hash: Optional[str]):
+        """MD5 十六進位字串轉成 16 位元組；空字串或其他格式的值原樣保留"""
+        if isinstance(file_hash, str) and len(file_hash) == 32:
+            try:
+                return bytes.fromhex(file_hash)
+            except ValueError:
+                pass
+        return file_hash
+    
+    @property
+    def digest(self):
+        """雜湊值索引使用的鍵值"""
+        return self._digest
+    
+    @property
+    def file_hash(self) -> Optional[str]:
+        """MD5 十六進位字串"""
+        digest = self._digest
+        return digest.hex() if isinstance(digest, bytes) else digest
+    
+    @file_hash.setter
+    def file_hash(self, file_hash: Optional[str]):
+        self._digest = self.to_digest(file_hash)
+    
+    @property
+    def filepath(self) -> str:
+        """完整檔案路徑"""
+        return self._directory + (self.filename if self._basename is None else self._basename)
+    
+    @filepath.setter
+    def filepath(self, filepath: str):
+        # 分隔符號留在資料夾字串中，組回的路徑與原本完全相同
+        cut = max(filepath.rfind("/"), filepath.rfind(os.sep)) + 1
+        self._directory = sys.intern(filepath[:cut])
+        basename = filepath[cut:]
+        self._basename = None if basename == self.filename else basename
+    
+    def __getitem__(self, name: str) -> Any:
+        """以 dict 記錄的欄位名稱取值"""
+        if name == "file_key":
+            return self.key
+        if name in self.FIELDS:
+            return getattr(self, name)
+        raise KeyError(name)
+    
+    def get(self, name: str, default: Any = None) -> Any:
+        """與 dict.get 相同"""
+        try:
+            return self[name]
+        except KeyError:
+            return default
 
 class DownloadHistoryManager:
-    """下載歷史管理器"""
+    """下載歷史管理器
+    
+    歷史檔為快照；新增或移除記錄時只在日誌檔（<歷史檔>.journal）附加一行 JSON，
+    累積 JOURNAL_FSYNC_BATCH 筆或超過 JOURNAL_FSYNC_INTERVAL 秒才 fsync 一次。
+    載入時先讀快照再重播日誌，日誌超過 JOURNAL_COMPACT_THRESHOLD 筆時才重寫快照。
+    
+    建構時不讀取任何檔案，第一次使用 history 時才載入；快照中保存遠端物件索引
+    （index_meta 記錄索引對應的記錄數），載入時直接沿用，不再重建。
+    
+    記憶體中的記錄為 DownloadRecord，索引中保存的是記錄本身的參照。寫入快照時
+    記錄轉回原本的 dict 格式，遠端物件索引只寫記錄在 downloads 中的位置；
+    雜湊值索引由記錄中已解析的 MD5 直接分組，不寫入快照。
+    """
+    
+    JOURNAL_FSYNC_BATCH = 50
+    JOURNAL_FSYNC_INTERVAL = 2.0
+    JOURNAL_COMPACT_THRESHOLD = 5000
+    INDEX_VERSION = 2
     
     def __init__(self, history_file: str):
         self.history_file = history_file
-        self.history = self._load_history()
-        self._build_hash_index()
+        self.journal_file = f"{history_file}.journal"
+        # 多執行緒下載時保護歷史記錄與索引的一致性
+        self.lock = threading.RLock()
+        self._journal = None
+        self._journal_entries = 0  # 日誌中尚未併入快照的筆數
+        self._unsynced_entries = 0
+        self._last_sync = time.monotonic()
+        self._history = None
+        self._loaded = False
+        # 已通過重複檢查、正在寫入下載目錄的照片（內容雜湊值與遠端物件）
+        self._reserved = set()
+    
+    @property
+    def history(self) -> Dict[str, Any]:
+        """下載歷史（第一次使用時才載入）"""
+        if not self._loaded:
+            with self.lock:
+                # 載入過程中（同一執行緒）重播日誌也會用到 history，此時直接回傳載入中的資料
+                if self._history is None:
+                    self._load()
+        return self._history
+    
+    def _load(self):
+        """載入快照、沿用或重建索引並重播日誌（呼叫端需持有 lock）"""
+        # 載入時會建立大量物件，暫停垃圾回收避免反覆掃描
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            self._history = self._load_history()
+            read_time = time.perf_counter() - started
+            
+            started = time.perf_counter()
+            indexes_reused = self._load_indexes()
+            index_time = time.perf_counter() - started
+        finally:
+            if gc_enabled:
+                gc.enable()
+        
+        started = time.perf_counter()
+        self._replay_journal()
+        replay_time = time.perf_counter() - started
+        self._loaded = True
+        
+        log_message(f"已載入下載歷史: {len(self._history['downloads'])} 筆記錄"
+                    f"（讀取 {read_time:.2f} 秒，索引{'沿用' if indexes_reused else '重建'} {index_time:.2f} 秒，"
+                    f"重播 {self._journal_entries} 筆日誌 {replay_time:.2f} 秒）")
     
     def _load_history(self) -> Dict[str, Any]:
         """載入下載歷史"""
@@ -101,6 +270,10 @@ class DownloadHistoryManager:
                         data["downloads"] = {}
                     if "hash_index" not in data:
                         data["hash_index"] = {}
+                    # 逐筆換成 DownloadRecord，原本的 dict 隨即釋放
+                    downloads = data["downloads"]
+                    for file_key, record in downloads.items():
+                        downloads[file_key] = DownloadRecord.from_dict(file_key, record)
                     return data
             except Exception as e:
                 print(f"載入下載歷史失敗: {e}")
@@ -108,86 +281,426 @@ class DownloadHistoryManager:
         return {"downloads": {}, "hash_index": {}}
     
     def _build_hash_index(self):
-        """建立雜湊值索引"""
-        self.history["hash_index"] = {}
-        for file_key, record in self.history["downloads"].items():
-            file_hash = record.get("file_hash")
-            if file_hash:
-                if file_hash not in self.history["hash_index"]:
-                    self.history["hash_index"][file_hash] = []
-                self.history["hash_index"][file_hash].append({
-                    "file_key": file_key,
-                    "filepath": record.get("filepath", ""),
-                    "filename": record.get("filename", ""),
-                    "url": record.get("url", "")
-                })
+        """建立雜湊值索引（雜湊值 → 記錄清單）"""
+        hash_index = {}
+        for record in self.history["downloads"].values():
+            if record.digest:
+                hash_index.setdefault(record.digest, []).append(record)
+        self.history["hash_index"] = hash_index
     
-    def save_history(self):
-        """儲存下載歷史"""
+    @staticmethod
+    def normalize_url(url: str) -> str:
+        """正規化照片 URL（去除查詢字串與錨點，主機名稱轉小寫）"""
+        parts = urlsplit(url)
+        return f"{parts.scheme.lower()}://{parts.netloc.lower()}{parts.path}"
+    
+    @classmethod
+    def build_remote_index(cls, downloads: Dict[str, DownloadRecord]) -> Dict[str, Any]:
+        """由下載記錄建立遠端物件索引
+        
+        objects: URL 中 S3 檔名的雜湊值 → 記錄清單
+        urls: 正規化後的 URL → 記錄清單（只收錄取不到 S3 物件名稱的 URL；
+              取得到的 URL 路徑本身就包含物件名稱，查 objects 即可）
+        """
+        objects = {}
+        urls = {}
+        for record in downloads.values():
+            url = record.url
+            if not url:
+                continue
+            object_key = cls.get_url_hash_from_url(url)
+            if object_key:
+                objects.setdefault(object_key, []).append(record)
+            else:
+                urls.setdefault(cls.normalize_url(url), []).append(record)
+        return {"objects": objects, "urls": urls, "record_count": len(downloads)}
+    
+    @staticmethod
+    def _keys_digest(downloads: Dict[str, Any]) -> str:
+        """下載記錄鍵值（依檔案中的順序）的摘要，用來確認保存的索引對應的正是這些記錄"""
+        hasher = hashlib.blake2b(digest_size=16)
+        for file_key in downloads:
+            hasher.update(file_key.encode("utf-8", "surrogatepass"))
+            hasher.update(b"\n")
+        return hasher.hexdigest()
+    
+    def _load_indexes(self) -> bool:
+        """沿用快照中保存的索引；快照由舊版寫入或索引與下載記錄不符時重新建立
+        
+        記錄數相同不代表記錄相同（舊版程式或退版後的程式會保留不認得的欄位，
+        移除一筆又新增一筆後寫回的快照仍帶著舊索引），因此以所有鍵值的摘要比對。
+        
+        Returns:
+            bool: 沿用了快照中的索引
+        """
+        meta = self.history.get("index_meta")
+        remote_index = self.history.get("remote_index")
+        downloads = self.history["downloads"]
+        if (isinstance(meta, dict) and meta.get("version") == self.INDEX_VERSION
+                and meta.get("record_count") == len(downloads)
+                and meta.get("keys_digest") == self._keys_digest(downloads)
+                and isinstance(remote_index, dict) and "objects" in remote_index and "urls" in remote_index):
+            # 快照中的遠端物件索引只有記錄的位置，換成記錄的參照
+            records = list(downloads.values())
+            try:
+                for name in ("objects", "urls"):
+                    remote_index[name] = {
+                        key: [records[position] for position in positions]
+                        for key, positions in remote_index[name].items()
+                    }
+                self._build_hash_index()
+                return True
+            except (IndexError, TypeError, AttributeError):
+                log_message("快照中的索引與下載記錄不一致，重新建立", "WARNING")
+        elif isinstance(meta, dict):
+            log_message("下載記錄在索引寫入後被修改過，重新建立索引", "WARNING")
+        
+        self._build_hash_index()
+        self._build_remote_index()
+        return False
+    
+    def _build_remote_index(self):
+        """重新建立遠端物件索引"""
+        self.history["remote_index"] = self.build_remote_index(self.history["downloads"])
+    
+    def _replay_journal(self):
+        """重播上次快照之後的日誌（損毀的行會被略過）"""
+        if not os.path.exists(self.journal_file):
+            return
+        
         try:
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(self.history, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"儲存下載歷史失敗: {e}")
+            with open(self.journal_file, 'rb') as f:
+                lines = f.read().split(b"\n")
+        except OSError as e:
+            print(f"重播下載歷史日誌失敗: {e}")
+            return
+        
+        # 檔案以換行結尾時最後一段是空字串；沒有換行結尾的最後一行可能是寫入到一半中斷的記錄
+        replayed = skipped = 0
+        for line_number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            # 每一行各自處理，損毀的行只略過該行，不影響後面的記錄
+            try:
+                entry = json.loads(line.decode('utf-8'))
+                if entry.get("op") == "add":
+                    self._insert_record(DownloadRecord.from_dict(entry["key"], entry["record"]))
+                elif entry.get("op") == "remove":
+                    self._delete_record(entry["key"])
+                else:
+                    raise ValueError(f"未知的操作: {entry.get('op')}")
+                replayed += 1
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                if line_number == len(lines):
+                    log_message("下載歷史日誌最後一行沒有寫完（上次執行中斷），已略過", "WARNING")
+                    continue
+                skipped += 1
+                log_message(f"下載歷史日誌第 {line_number} 行損毀，已略過: {e}", "WARNING")
+        
+        self._journal_entries = replayed
+        if skipped:
+            print(f"下載歷史日誌中有 {skipped} 行損毀，已略過")
+    
+    def _append_journal(self, entry: Dict[str, Any]):
+        """附加一筆變更到日誌（呼叫端需持有 lock）"""
+        try:
+            if self._journal is None:
+                # 上次中斷時最後一行可能沒有換行，避免與新記錄接在同一行
+                needs_newline = False
+                if os.path.exists(self.journal_file) and os.path.getsize(self.journal_file) > 0:
+                    with open(self.journal_file, 'rb') as f:
+                        f.seek(-1, os.SEEK_END)
+                        needs_newline = f.read(1) != b"\n"
+                self._journal = open(self.journal_file, 'a', encoding='utf-8')
+                if needs_newline:
+                    self._journal.write("\n")
+            
+            self._journal.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+            self._journal_entries += 1
+            self._unsynced_entries += 1
+            if (self._unsynced_entries >= self.JOURNAL_FSYNC_BATCH
+                    or time.monotonic() - self._last_sync >= self.JOURNAL_FSYNC_INTERVAL):
+                self._sync_journal()
+        except OSError as e:
+            print(f"寫入下載歷史日誌失敗: {e}")
+    
+    def _sync_journal(self):
+        """將日誌寫入硬碟（呼叫端需持有 lock）"""
+        if self._journal is not None and self._unsynced_entries:
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+        self._unsynced_entries = 0
+        self._last_sync = time.monotonic()
+    
+    def save_history(self):
+        """儲存下載歷史：寫入日誌，日誌累積過多時才重寫快照"""
+        with self.lock:
+            try:
+                self._sync_journal()
+            except OSError as e:
+                print(f"儲存下載歷史失敗: {e}")
+            if self._journal_entries >= self.JOURNAL_COMPACT_THRESHOLD:
+                self.compact()
+    
+    def compact(self) -> bool:
+        """將目前的完整狀態寫成新的快照並清空日誌
+        
+        快照先寫到暫存檔再以 rename 取代，中斷時舊快照與日誌仍然完整；
+        日誌中已併入快照的記錄重播時會覆寫成相同內容，不會重複。
+        """
+        with self.lock:
+            directory = os.path.dirname(os.path.abspath(self.history_file))
+            temp_path = None
+            try:
+                fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".download_history.", suffix=".tmp")
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(self._snapshot(), f, ensure_ascii=False, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                FileUtils.copy_file_mode(temp_path, self.history_file)
+                os.replace(temp_path, self.history_file)
+                temp_path = None
+                
+                if self._journal is not None:
+                    self._journal.close()
+                    self._journal = None
+                if os.path.exists(self.journal_file):
+                    os.remove(self.journal_file)
+                self._journal_entries = 0
+                self._unsynced_entries = 0
+                return True
+            except Exception as e:
+                print(f"儲存下載歷史失敗: {e}")
+                if temp_path and os.path.exists(temp_path):
+                    os.remove(temp_path)
+                return False
+    
+    def _snapshot(self) -> Dict[str, Any]:
+        """轉成寫入快照的格式（呼叫端需持有 lock）
+        
+        記錄轉回 dict；遠端物件索引只保存記錄在 downloads 中的位置；雜湊值索引不寫入。
+        """
+        history = self.history
+        positions = {id(record): position for position, record in enumerate(history["downloads"].values())}
+        
+        def as_positions(index: Dict[str, List[DownloadRecord]]) -> Dict[str, List[int]]:
+            return {key: [positions[id(record)] for record in records] for key, records in index.items()}
+        
+        remote_index = history["remote_index"]
+        snapshot = {key: value for key, value in history.items() if key != "hash_index"}
+        snapshot.update({
+            "downloads": {file_key: record.to_dict() for file_key, record in history["downloads"].items()},
+            "remote_index": {
+                "objects": as_positions(remote_index["objects"]),
+                "urls": as_positions(remote_index["urls"]),
+                "record_count": remote_index["record_count"]
+            },
+            # 標記索引與記錄一致，下次載入時直接沿用
+            "index_meta": {
+                "version": self.INDEX_VERSION,
+                "record_count": len(history["downloads"]),
+                "keys_digest": self._keys_digest(history["downloads"])
+            }
+        })
+        return snapshot
+    
+    def close(self):
+        """寫入日誌並關閉檔案"""
+        with self.lock:
+            self.save_history()
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
     
     def is_downloaded(self, url: str, filename: str) -> bool:
         """檢查檔案是否已下載（基於 URL + 檔名）"""
         file_key = f"{filename}|{url}"
-        return file_key in self.history["downloads"]
+        with self.lock:
+            return file_key in self.history["downloads"]
     
-    def is_hash_downloaded(self, file_hash: str) -> Tuple[bool, List[Dict[str, str]]]:
+    def is_hash_downloaded(self, file_hash: str) -> Tuple[bool, List[DownloadRecord]]:
         """檢查檔案雜湊值是否已存在
         
         Returns:
-            Tuple[bool, List[Dict]]: (是否重複, 重複檔案清單)
+            Tuple[bool, List[DownloadRecord]]: (是否重複, 重複檔案清單)
         """
-        if not file_hash or file_hash not in self.history["hash_index"]:
-            return False, []
-        
-        duplicate_files = self.history["hash_index"][file_hash]
+        digest = DownloadRecord.to_digest(file_hash)
+        with self.lock:
+            if not digest or digest not in self.history["hash_index"]:
+                return False, []
+            
+            duplicate_files = list(self.history["hash_index"][digest])
         # 檢查檔案是否仍然存在
         existing_files = []
         for file_info in duplicate_files:
-            if os.path.exists(file_info["filepath"]):
+            if os.path.exists(file_info.filepath):
                 existing_files.append(file_info)
         
         return len(existing_files) > 0, existing_files
     
-    def get_url_hash_from_url(self, url: str) -> str:
-        """從 URL 中提取檔案雜湊值（用於快速檢測）"""
+    def reserve_download(self, url: str, file_hash: str) -> Tuple[bool, List[DownloadRecord]]:
+        """預留即將寫入的照片內容與 URL，避免兩個執行緒同時寫入相同的照片
+        
+        鎖內只做字典查詢與預留；已有記錄的檔案是否仍然存在在鎖外檢查，
+        寫入檔案也在鎖外進行，完成後以 add_download_record 記錄並 release_download 釋放。
+        
+        Returns:
+            Tuple[bool, List[DownloadRecord]]: (是否已預留, 重複檔案清單)；
+            相同內容或 URL 正由其他執行緒寫入時回傳 (False, [])
+        """
+        keys = self._reservation_keys(url, file_hash)
+        digest = DownloadRecord.to_digest(file_hash)
+        with self.lock:
+            if any(key in self._reserved for key in keys):
+                return False, []
+            candidates = list(self.history["hash_index"].get(digest, ())) if digest else []
+            self._reserved.update(keys)
+        
+        existing_files = [record for record in candidates if os.path.exists(record.filepath)]
+        if existing_files:
+            self.release_download(url, file_hash)
+            return False, existing_files
+        return True, []
+    
+    def release_download(self, url: str, file_hash: str):
+        """釋放 reserve_download 預留的照片"""
+        keys = self._reservation_keys(url, file_hash)
+        with self.lock:
+            self._reserved.difference_update(keys)
+    
+    def _reservation_keys(self, url: str, file_hash: str) -> List[Tuple[str, Any]]:
+        """預留用的鍵值：內容雜湊值與遠端物件（取不到物件名稱時為正規化 URL）"""
+        keys = [("url", self.get_url_hash_from_url(url) or self.normalize_url(url))]
+        digest = DownloadRecord.to_digest(file_hash)
+        if digest:
+            keys.append(("hash", digest))
+        return keys
+    
+    @staticmethod
+    def get_url_hash_from_url(url: str) -> str:
+        """從 URL 中提取 S3 物件名稱的雜湊值（與檔案內容的 MD5 無關）"""
         # URL 格式：https://isai-prod-v2.s3.hicloud.net.tw/image_as0_sid1456_uid605772_albumId1602647_f4e54a16ad37443b96df2a124ba1b6c0.jpg
         # 提取最後的雜湊部分
-        import re
         match = re.search(r'_([a-f0-9]{32,})\.', url)
         if match:
             return match.group(1)
         return ""
     
-    def add_download_record(self, url: str, filename: str, filepath: str, file_size: int):
-        """新增下載記錄"""
+    def find_remote_record(self, url: str) -> Optional[DownloadRecord]:
+        """以遠端物件索引查詢 URL 是否已下載過（依 S3 物件名稱或正規化 URL）
+        
+        Returns:
+            DownloadRecord: 已下載的記錄；未下載過時回傳 None
+        """
+        object_key = self.get_url_hash_from_url(url)
+        with self.lock:
+            remote_index = self.history["remote_index"]
+            records = remote_index["objects"].get(object_key) if object_key else None
+            if not records:
+                records = remote_index["urls"].get(self.normalize_url(url))
+            return records[0] if records else None
+    
+    def filter_known_urls(self, urls: List[str]) -> List[str]:
+        """批次過濾已下載過的 URL，回傳尚未下載的 URL（維持原本順序）
+        
+        整批只取得一次鎖，每個 URL 最多兩次字典查詢，與歷史記錄數量無關。
+        """
+        with self.lock:
+            remote_index = self.history["remote_index"]
+            objects = remote_index["objects"]
+            known_urls = remote_index["urls"]
+            unknown = []
+            for url in urls:
+                object_key = self.get_url_hash_from_url(url)
+                if (object_key and objects.get(object_key)) or known_urls.get(self.normalize_url(url)):
+                    continue
+                unknown.append(url)
+            return unknown
+    
+    def add_download_record(self, url: str, filename: str, filepath: str, file_size: int,
+                            file_hash: Optional[str] = None):
+        """新增下載記錄
+        
+        若已在下載時計算好雜湊值可直接傳入 file_hash，避免重新讀取檔案。
+        """
         file_key = f"{filename}|{url}"
-        file_hash = FileUtils.calculate_file_hash(filepath)
+        if file_hash is None:
+            file_hash = FileUtils.calculate_file_hash(filepath)
+        
+        with self.lock:
+            self._add_record(file_key, url, filename, filepath, file_size, file_hash)
+    
+    def _add_record(self, file_key: str, url: str, filename: str, filepath: str,
+                    file_size: int, file_hash: str):
+        """寫入記錄、更新索引並附加到日誌（呼叫端需持有 lock）"""
+        record = DownloadRecord(file_key, url, filename, filepath, file_size,
+                                datetime.now().isoformat(), file_hash)
+        self._insert_record(record)
+        self._append_journal({"op": "add", "key": file_key, "record": record.to_dict()})
+    
+    def _insert_record(self, record: DownloadRecord):
+        """寫入記錄並更新索引（呼叫端需持有 lock）"""
+        # 覆寫既有記錄時先移除舊的索引項目
+        if record.key in self.history["downloads"]:
+            self._delete_record(record.key)
         
         # 新增到下載記錄
-        self.history["downloads"][file_key] = {
-            "url": url,
-            "filename": filename,
-            "filepath": filepath,
-            "file_size": file_size,
-            "download_time": datetime.now().isoformat(),
-            "file_hash": file_hash
-        }
+        self.history["downloads"][record.key] = record
         
         # 更新雜湊值索引
-        if file_hash:
-            if file_hash not in self.history["hash_index"]:
-                self.history["hash_index"][file_hash] = []
-            self.history["hash_index"][file_hash].append({
-                "file_key": file_key,
-                "filepath": filepath,
-                "filename": filename,
-                "url": url
-            })
+        if record.digest:
+            self.history["hash_index"].setdefault(record.digest, []).append(record)
+        
+        # 更新遠端物件索引
+        remote_index = self.history["remote_index"]
+        url = record.url
+        if url:
+            object_key = self.get_url_hash_from_url(url)
+            if object_key:
+                remote_index["objects"].setdefault(object_key, []).append(record)
+            else:
+                remote_index["urls"].setdefault(self.normalize_url(url), []).append(record)
+        remote_index["record_count"] = len(self.history["downloads"])
+    
+    def remove_download_record(self, file_key: str) -> bool:
+        """移除下載記錄並同步更新雜湊值索引與遠端物件索引
+        
+        Returns:
+            bool: 記錄存在並已移除
+        """
+        with self.lock:
+            if self._delete_record(file_key) is None:
+                return False
+            self._append_journal({"op": "remove", "key": file_key})
+            return True
+    
+    def _delete_record(self, file_key: str) -> Optional[DownloadRecord]:
+        """移除記錄並更新索引（呼叫端需持有 lock），回傳被移除的記錄"""
+        record = self.history["downloads"].pop(file_key, None)
+        if record is None:
+            return None
+        
+        entries = self.history["hash_index"].get(record.digest) if record.digest else None
+        if entries is not None:
+            entries[:] = [entry for entry in entries if entry is not record]
+            if not entries:
+                del self.history["hash_index"][record.digest]
+        
+        url = record.url
+        remote_index = self.history["remote_index"]
+        if url:
+            object_key = self.get_url_hash_from_url(url)
+            if object_key:
+                index, key = remote_index["objects"], object_key
+            else:
+                index, key = remote_index["urls"], self.normalize_url(url)
+            records = index.get(key)
+            if records and record in records:
+                records.remove(record)
+                if not records:
+                    del index[key]
+        remote_index["record_count"] = len(self.history["downloads"])
+        return record
     
     def get_download_stats(self) -> Dict[str, int]:
         """取得下載統計"""
@@ -206,19 +719,19 @@ class DownloadHistoryManager:
             "duplicate_hashes": len(duplicate_hashes)
         }
     
-    def get_duplicate_files_report(self) -> Dict[str, List[Dict]]:
-        """取得重複檔案報告"""
+    def get_duplicate_files_report(self) -> Dict[str, List[DownloadRecord]]:
+        """取得重複檔案報告（以十六進位雜湊值為鍵）"""
         duplicate_hashes = {}
-        for file_hash, files in self.history["hash_index"].items():
+        for files in self.history["hash_index"].values():
             if len(files) > 1:
                 # 檢查檔案是否仍存在
                 existing_files = []
                 for file_info in files:
-                    if os.path.exists(file_info["filepath"]):
+                    if os.path.exists(file_info.filepath):
                         existing_files.append(file_info)
                 
                 if len(existing_files) > 1:
-                    duplicate_hashes[file_hash] = existing_files
+                    duplicate_hashes[files[0].file_hash] = existing_files
         
         return duplicate_hashes
 